@@ -1,6 +1,6 @@
 import { useEffect, useState } from "react";
 import { Navigate, useParams } from 'react-router-dom';
-import { getLobbyRequest, getSessionRequest } from "../../utils/fetches";
+import { getLobbySnapshot, getSessionRequest } from "../../utils/fetches";
 import sessionInfoEquals from "../../utils/sessionInfoEquals";
 
 const MAXIMUM_LOBBY_AGE = 900000 // 15 minutes
@@ -18,11 +18,8 @@ const ConditionalLobbyRoute = (Component, destination) => {
         useEffect(() => {
             const fetchJoinable = async () => {
                 const sessionInfo = await getSessionRequest("info");
-                const sessions = await getLobbyRequest(lobbyID, "sessions");
-                const joinable = await getLobbyRequest(lobbyID, "joinable");
-                const timestamp = await getLobbyRequest(lobbyID, "timestamp");
+                const { sessions = [], joinable, timestamp, phase } = await getLobbySnapshot(lobbyID, ["sessions", "joinable", "timestamp", "phase"]) || {};
                 const alive = timestamp ? (new Date().getTime() - new Date(timestamp).getTime()) : MAXIMUM_LOBBY_AGE + 1;
-                const phase = await getLobbyRequest(lobbyID, "phase");
 
                 console.log(sessionInfo, sessions, joinable, timestamp, phase)
 
@@ -1,7 +1,8 @@
 import { useCallback, useContext, useEffect, useState } from "react"
 import { useLocation, useNavigate, useParams } from "react-router-dom";
 import { SocketContext } from '../../context/socket';
-import { getLobbyRequest, getSessionRequest, getYelpRequest, postLobbyRequest } from "../../utils/fetches";
+import { getLobbyRequest, getSessionRequest, getYelpRequest, postLobbyRequest, transitionLobbyRequest } from "../../utils/fetches";
+import { lobbyEventState } from "../../utils/lobbyEvents";
 import CategorySelectorInput from "../../components/CategorySelectorInput/CategorySelectorInput";
 import CategorySelectorOutput from "../../components/CategorySelectorOutput/CategorySelectorOutput";
 import CountdownTimer from "../../components/CountdownTimer/CountdownTimer";
@@ -45,9 +46,10 @@ function CategoriesPage() {
         socket.emit("LEAVE_ROOM_REQUEST", lobbyID, sessionInfo)
         navigate(`/home`, { state: { "errorMessage": "Host closed the room"}, replace: true }); 
     }, [socket, navigate]);
-    const handleCategoryChange = useCallback(async () => {
-        const categories = await getLobbyRequest(lobbyID, "categories");
-        setAllCategories(categories);
+    const handleCategoryChange = useCallback(async (payload) => {
+        const update = await lobbyEventState(lobbyID, ["categories"], payload);     // sent along w/ ROOM_CATEGORY_CHANGE
+        if (!update) { return; }
+        setAllCategories(update["categories"]);
     }, [lobbyID]);
     const handleCategoriesFinalized = useCallback((path, message = "") => { 
         let state = {};
@@ -114,13 +116,12 @@ function CategoriesPage() {
             // Then if there are enough businesses, update the database + communicate phase progression
             if (yelpSelection && yelpSelection.length === parseInt(numResults)) {
                 await postLobbyRequest(lobbyID, "businesses", yelpSelection);
-                await postLobbyRequest(lobbyID, "phase", "swiping");
+                await transitionLobbyRequest(lobbyID, "categories", "swiping");
                 socket.emit("LOBBY_NAVIGATION_UPDATE", lobbyID, `/lobby/${lobbyID}/swiping`, "");
             }
             // Otherwise, communicate phase regression and try again
             else {
-                await postLobbyRequest(lobbyID, "phase", "setup");
-                await postLobbyRequest(lobbyID, "joinable", true);
+                await transitionLobbyRequest(lobbyID, "categories", "setup", { "joinable": true });
                 socket.emit("LOBBY_NAVIGATION_UPDATE", lobbyID, `/lobby/${lobbyID}/setup`, "Not enough results, please adjust parameters")
             }
         }
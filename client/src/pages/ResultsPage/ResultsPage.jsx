@@ -1,7 +1,8 @@
-import { useCallback, useContext, useEffect, useState } from 'react';
+import { useCallback, useContext, useEffect, useRef, useState } from 'react';
 import { useLocation, useNavigate, useParams } from 'react-router-dom';
 import { SocketContext } from '../../context/socket';
 import { getLobbyRequest, getSessionRequest, postLobbyRequest } from '../../utils/fetches';
+import { lobbyEventState } from '../../utils/lobbyEvents';
 import useHostChecker from '../../hooks/useHostChecker';
 import Podium from '../../components/Podium/Podium';
 import toast from 'react-hot-toast';
@@ -18,6 +19,7 @@ function ResultsPage() {
     const [sessionInfo, setSessionInfo] = useState()
     const [isLoading, setIsLoading] = useState(true);
     const [businesses, setBusinesses] = useState([]);
+    const deck = useRef();     // fixed once swiping is over, so only fetched once
 
     /* ~ Teardown for lobby's database entry + socket communication ~ */
     const lobbyEarlyTeardown = async () => {
@@ -44,12 +46,15 @@ function ResultsPage() {
         navigate(`/`, { state: { "errorMessage": "Host closed the room"}, replace: true }); 
     }, [socket, navigate]);
     
-    const handleLobbyVotes = useCallback(async () => {
+    const handleLobbyVotes = useCallback(async (payload) => {
         try {
-            // First, fetch the lobby's compiled votes
-            const votes = await getLobbyRequest(lobbyID, "votes");
+            // First, get the lobby's compiled votes (sent along w/ ROOM_VOTE_UPDATE)
+            const update = await lobbyEventState(lobbyID, ["votes"], payload);
+            if (update === null) { return; }    // older than the votes already shown
+            const { votes } = update || {};
             if (!votes) { console.log("ERROR: problem while getting lobby votes"); }
-            const lobbyBusinesses = await getLobbyRequest(lobbyID, "businesses");
+            if (!deck.current) { deck.current = await getLobbyRequest(lobbyID, "businesses"); }
+            const lobbyBusinesses = deck.current;
             if (!lobbyBusinesses) { console.log("ERROR: problem while getting lobby votes"); }
             
             // Then, process and organize the data into visual components
@@ -2,7 +2,8 @@ import { useCallback, useContext, useEffect, useRef, useState } from "react"
 import { useLocation, useNavigate, useParams } from "react-router-dom";
 import { getDropdownValues } from "../../utils/DropdownValues";
 import { SocketContext } from '../../context/socket';
-import { getLobbyRequest, getSessionRequest, postLobbyRequest, postSessionRequest } from "../../utils/fetches";
+import { getSessionRequest, postLobbyRequest, postSessionRequest, transitionLobbyRequest } from "../../utils/fetches";
+import { lobbyEventState } from "../../utils/lobbyEvents";
 
 import toast from 'react-hot-toast';
 import PlacesLoader from "../../components/PlacesLoader/PlacesLoader";
@@ -71,14 +72,18 @@ function SetupPage() {
         socket.emit("LEAVE_ROOM_REQUEST", lobbyID, sessionInfo)
         navigate(`/home`, { state: { "errorMessage": "Host closed the room"}, replace: true }); 
     }, [socket, navigate]);
-    const handleSocketsChange = useCallback(async () => {
-        const sessions = await getLobbyRequest(lobbyID, "sessions");
+    const handleSocketsChange = useCallback(async (payload) => {
+        const update = await lobbyEventState(lobbyID, ["sessions"], payload);     // sent along w/ JOIN/LEAVE_ROOM_ACCEPTED
+        if (!update) { return; }
+        const { sessions } = update;
         const nicknames = sessions.map(session => session["session_info"]["nickname"]);
         setSockets(nicknames);
     }, [lobbyID]);
-    const handlePreferencesChange = useCallback(async () => {
-        const updatedPreferences = await getLobbyRequest(lobbyID, "preferences");
-        if (!updatedPreferences) { console.log("Error: problem while receiving preferences") }  // TODO: catch error
+    const handlePreferencesChange = useCallback(async (payload) => {
+        const update = await lobbyEventState(lobbyID, ["preferences"], payload);   // sent along w/ ROOM_PREFERENCES_UPDATE
+        if (update === null) { return; }    // older than the preferences already shown
+        const { preferences: updatedPreferences } = update || {};
+        if (!updatedPreferences) { console.log("Error: problem while receiving preferences"); return; }  // TODO: catch error
         for (const [k, v] of Object.entries(updatedPreferences)) {
             if (k === "numResults") { setNumResults(v) }
             if (k === "priceRange") { setPriceRange(v) }
@@ -97,9 +102,7 @@ function SetupPage() {
     const readyBtnOnClick = () => {
         // Prepare and notify sockets to move to next phase
         const lobbyCategorySetup = async () => {
-            await postLobbyRequest(lobbyID, "timestamp", null);
-            await postLobbyRequest(lobbyID, "joinable", false);
-            await postLobbyRequest(lobbyID, "phase", "categories");
+            await transitionLobbyRequest(lobbyID, "setup", "categories", { "joinable": false, "refresh_timestamp": true });
             socket.emit("LOBBY_NAVIGATION_UPDATE", lobbyID, `/lobby/${lobbyID}/categories`, "")
         }
         if (coordinates.name !== "") { lobbyCategorySetup(); }
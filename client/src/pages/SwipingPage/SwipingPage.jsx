@@ -8,7 +8,7 @@ import CountdownTimer from '../../components/CountdownTimer/CountdownTimer';
 import useHostChecker from '../../hooks/useHostChecker';
 import toast from 'react-hot-toast';
 import styles from './SwipingPage.module.css';
-import { getLobbyRequest, getSessionRequest, postLobbyRequest, postSessionRequest, updateLobbySession } from '../../utils/fetches';
+import { getLobbyRequest, getSessionRequest, postLobbyRequest, postSessionRequest, transitionLobbyRequest, updateLobbySession } from '../../utils/fetches';
 
 function SwipingPage() {
     const socket = useContext(SocketContext);
@@ -130,8 +130,7 @@ function SwipingPage() {
             socket.emit("LATE_FINISHED_SWIPING", lobbyID)
         }
         if (isHost) {
-            await postLobbyRequest(lobbyID, "timestamp", null);
-            await postLobbyRequest(lobbyID, "phase", 'results')
+            await transitionLobbyRequest(lobbyID, "swiping", "results", { "refresh_timestamp": true });
             socket.emit("LOBBY_NAVIGATION_UPDATE", lobbyID, `/lobby/${lobbyID}/results`, "")
         }
     }, [isHost, lobbyID, socket, businesses, swipeIndex, votes]);
@@ -133,6 +133,21 @@ export const getLobbyRequest = async (lobby_ID, field) => {
     }
 }
 
+// Several lobby fields from one request/read; the server's ETag lets the browser revalidate w/ a bodiless 304
+export const getLobbySnapshot = async (lobby_ID, fields) => {
+    try {
+        const requestOptions = {
+            method: 'GET',
+            headers: { "Content-Type": "application/json" }
+        }
+        const requestData = await fetch(`${process.env.REACT_APP_SOCKET_ENDPOINT}lobby/get-lobby-snapshot?lobby-ID=${lobby_ID}&fields=${fields.join(",")}`, requestOptions);
+        const requestJSON = await requestData.json()
+        return requestJSON["lobby"];
+    } catch (error) {
+        console.log(error);
+    }
+}
+
 export const postLobbyRequest = async (lobby_ID, field, newData) => {
     try {
         const requestOptions = {
@@ -149,6 +164,25 @@ export const postLobbyRequest = async (lobby_ID, field, newData) => {
     }
 }
 
+// Moves the lobby between phases (+ joinable/timestamp) in one request; resolves to the new phase, or undefined if another client got there first
+export const transitionLobbyRequest = async (lobby_ID, fromPhase, toPhase, changes = {}) => {
+    try {
+        const requestOptions = {
+            method: 'POST',
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ 
+                "lobby_ID": lobby_ID, 
+                "from_phase": fromPhase,
+                "to_phase": toPhase,
+                ...changes })}
+        const requestData = await fetch(`${process.env.REACT_APP_SOCKET_ENDPOINT}lobby/transition-lobby-phase`, requestOptions);
+        const requestJSON = await requestData.json();
+        return requestJSON["updated_phase"];
+    } catch (error) {
+        console.log("error:", error);
+    }
+}
+
 export const getSessionRequest = async (field) => {
     try {
         const requestOptions = {
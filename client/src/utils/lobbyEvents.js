@@ -0,0 +1,18 @@
+import { getLobbySnapshot } from "./fetches";
+
+/* ~ Room events carry { lobby_ID, seq, version, lobby } w/ the full state of the fields they changed (see server/api/lobby/broadcasts.py) ~ */
+const lastSeen = {};    // "<lobbyID>:<fields>" -> { seq, version } of the last payload applied
+
+// The fields an event is about: straight from its payload, or fetched (one snapshot request) when there's no payload, e.g. on page load.
+// Resolves to null for a payload older than one already applied, which callers should ignore
+export const lobbyEventState = async (lobbyID, fields, payload) => {
+    const key = `${lobbyID}:${fields.join(",")}`;
+    if (payload && payload.lobby) {
+        const last = lastSeen[key];
+        if (last && payload.version < last.version) { return null; }
+        if (last && payload.seq > last.seq + 1) { console.log(`missed ${payload.seq - last.seq - 1} update(s) of ${fields}, caught up`); }
+        lastSeen[key] = { seq: payload.seq, version: payload.version };
+        return payload.lobby;
+    }
+    return await getLobbySnapshot(lobbyID, fields);
+}
@@ -0,0 +1,4 @@
+from .cooperative import enable
+
+# Has to happen before the rest of the package imports requests/boto3/redis
+enable()
@@ -1,22 +1,35 @@
+import redis
 from flask import Flask
 from flask_cors import CORS
 from flask_bcrypt import Bcrypt
 from flask_session import Session
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from .config import Config
+from .cooperative import async_mode
 from .repositories.lobby_repository import LobbyRepository
+from .repositories.lobby_backends import LOBBY_BACKENDS, create_lobby_repository
 from .repositories.fusion_repository import FusionRepository
+from .selection.prefetcher import Prefetcher
+from .images.image_cache import ImageCache
+from .lobby.sweeper import LobbySweeper
+from .lobby.id_pool import LobbyIDPool
+from .lobby.broadcasts import RoomBroadcasts
 
 bcrypt = Bcrypt()
 cors = CORS()
 server_session = Session()
-socketio = SocketIO()
+socketio = SocketIO(async_mode=async_mode())
 
 # TODO: setup CORS on frontend
 
-def create_app(lr: LobbyRepository=LobbyRepository(), fr: FusionRepository=FusionRepository()):
+def create_app(lr: LobbyRepository=None, fr: FusionRepository=None):
     app = Flask(__name__)
     app.config.from_object(Config)
+    # Built here, not as default arguments or in Config, so importing the app doesn't construct (or connect) anything.
+    # None of these touch the network until first used
+    app.config.setdefault("SESSION_REDIS", redis.from_url(app.config["REDIS_URL"]))
+    lr = lr if lr is not None else create_lobby_repository(app.config["LOBBY_BACKEND"])
+    fr = fr if fr is not None else FusionRepository()
 
     # Instantiate objects w/ current Flask Application
     bcrypt.init_app(app)
@@ -24,9 +37,12 @@ def create_app(lr: LobbyRepository=LobbyRepository(), fr: FusionRepository=Fusio
     server_session.init_app(app)   # enables server-sided sessions for flask's "session" var
 
     socketio.init_app(app, cors_allowed_origins="*")
+    app.extensions["lobby_cache"] = lr.cache    # socket events invalidate cached lobbies (see lobby/events.py)
+    # ... and push the state they changed to the room (see lobby/broadcasts.py)
+    broadcasts = app.extensions["room_broadcasts"] = RoomBroadcasts(lr)
 
     # Import Socket.io events if not a test instance
-    if type(lr) == LobbyRepository and type(fr) == FusionRepository:
+    if type(lr) in LOBBY_BACKENDS.values() and type(fr) == FusionRepository:
         from .lobby import events
 
         @socketio.on("JOIN_ROOM_REQUEST")   # The following events require LobbyRepository, so I'm putting them here :c
@@ -35,7 +51,7 @@ def create_app(lr: LobbyRepository=LobbyRepository(), fr: FusionRepository=Fusio
             join_room(lobby_ID)
             
             lr.add_session(lobby_ID=lobby_ID, session=session)
-            emit("JOIN_ROOM_ACCEPTED", to=lobby_ID, broadcast=True)
+            emit("JOIN_ROOM_ACCEPTED", broadcasts.payload(lobby_ID, ["sessions"]), to=lobby_ID, broadcast=True)
             
             @socketio.on("disconnect")
             def disconnect():
@@ -47,24 +63,44 @@ def create_app(lr: LobbyRepository=LobbyRepository(), fr: FusionRepository=Fusio
                     lr.update_host(lobby_ID=lobby_ID, host="")
                     emit("LEAVE_ROOM_EARLY", to=lobby_ID, broadcast=True)
                 else:
-                    emit("LEAVE_ROOM_ACCEPTED", to=lobby_ID, broadcast=True)
+                    emit("LEAVE_ROOM_ACCEPTED", broadcasts.payload(lobby_ID, ["sessions"]), to=lobby_ID, broadcast=True)
 
 
         @socketio.on("LEAVE_ROOM_REQUEST")
         def exit_room(lobby_ID, session):
-            emit("LEAVE_ROOM_ACCEPTED", to=lobby_ID, broadcast=True)
-            leave_room(lobby_ID)
             lr.remove_sessions(lobby_ID=lobby_ID, session=session)
+            # After the write, so the sessions sent out no longer include the leaver
+            emit("LEAVE_ROOM_ACCEPTED", broadcasts.payload(lobby_ID, ["sessions"]), to=lobby_ID, broadcast=True)
+            leave_room(lobby_ID)
+
+    # Warms FusionRepository's search cache while a lobby is still picking categories
+    prefetcher = Prefetcher(fr)
+    # Proxies + caches business card images, prefetched as soon as a lobby's deck is stored
+    ic = ImageCache()
+
+    # Bulk-deletes expired lobbies in the background (only if LOBBY_SWEEP_INTERVAL is set)
+    LobbySweeper(lr).start()
+    # Pre-validated lobby IDs for create-lobby (only if LOBBY_ID_POOL_SIZE is set)
+    id_pool = LobbyIDPool(lr)
+    id_pool.start()
+
+    @app.cli.command("create-tables")
+    def create_tables():
+        """provisions the lobby backend's tables (run once per environment, before serving)"""
+        lr.create_tables()
 
     # Import route blueprints for necessary API calls
     from .data_persistence.routes import create_blueprint as session_bp
     app.register_blueprint(session_bp(), url_prefix='/session')
 
     from .selection.routes import create_blueprint as selection_bp
-    app.register_blueprint(selection_bp(fr=fr), url_prefix='/selection')
+    app.register_blueprint(selection_bp(fr=fr, prefetcher=prefetcher), url_prefix='/selection')
 
     from .lobby.routes import create_blueprint as lobby_bp
-    app.register_blueprint(lobby_bp(lr=lr), url_prefix='/lobby')
+    app.register_blueprint(lobby_bp(lr=lr, prefetcher=prefetcher, ic=ic, id_pool=id_pool), url_prefix='/lobby')
+
+    from .images.routes import create_blueprint as images_bp
+    app.register_blueprint(images_bp(ic=ic), url_prefix='/images')
 
     return app
 
@@ -1,5 +1,4 @@
 import os
-import redis
 from dotenv import load_dotenv, find_dotenv
 
 load_dotenv(find_dotenv())
@@ -8,8 +7,10 @@ class Config:
     SECRET_KEY = os.environ.get("FLASK_SECRET_KEY")
 
     SESSION_TYPE = 'redis'
-    SESSION_REDIS = redis.from_url(os.environ.get("REDIS_URL"))
+    REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379")    # SESSION_REDIS is built from it in create_app
     SESSION_PERMANENT = False
     SESSION_USE_SIGNER = True
     SESSION_COOKIE_SAMESITE = "None"
     SESSION_COOKIE_SECURE = True
+
+    LOBBY_BACKEND = os.environ.get("LOBBY_BACKEND", "dynamodb")    # dynamodb, redis (LOBBY_REDIS_URL or REDIS_URL) or memory
@@ -0,0 +1,55 @@
+import os
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv, find_dotenv
+
+# This is the package's first import (see api/__init__.py), so .env has to be loaded here for its settings to count -
+# COOPERATIVE_IO below, and the settings read as every later module is imported. Real environment variables win
+load_dotenv(find_dotenv())
+
+# NOTE: Cooperative I/O mode - eventlet monkey patches the standard library so that every blocking socket call
+# (Yelp via requests, DynamoDB via boto3, Redis) yields to the Socket.IO event loop instead of stalling the worker
+COOPERATIVE_IO = os.environ.get("COOPERATIVE_IO", "false").lower() == "true"
+MAX_OUTBOUND_CONCURRENCY = int(os.environ.get("MAX_OUTBOUND_CONCURRENCY", 256))
+
+_outbound_slots = None
+_outbound_lock = threading.Lock()
+
+
+def enable() -> bool:
+    """patches the standard library when COOPERATIVE_IO is set. Must run before requests/boto3/redis are imported"""
+    if COOPERATIVE_IO:
+        import eventlet
+        eventlet.monkey_patch()
+    return COOPERATIVE_IO
+
+def async_mode() -> str:
+    """Socket.IO async mode matching the I/O mode (None lets Flask-SocketIO pick)"""
+    return 'eventlet' if COOPERATIVE_IO else None
+
+@contextmanager
+def outbound_slot():
+    """caps the number of concurrent outbound calls (per worker) at MAX_OUTBOUND_CONCURRENCY"""
+    global _outbound_slots
+    if _outbound_slots is None:
+        # Created lazily so that it's a green semaphore once the standard library is patched
+        with _outbound_lock:
+            if _outbound_slots is None:
+                _outbound_slots = threading.BoundedSemaphore(MAX_OUTBOUND_CONCURRENCY)
+    with _outbound_slots:
+        yield
+
+
+class OutboundLimited:
+    """Proxy that runs every method call of the wrapped client (e.g. a boto3 Table) inside an outbound_slot()"""
+    def __init__(self, target: object) -> None:
+        self._target = target
+
+    def __getattr__(self, name: str) -> object:
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        def limited(*args: object, **kwargs: object) -> object:
+            with outbound_slot():
+                return attr(*args, **kwargs)
+        return limited
@@ -0,0 +1,271 @@
+import io
+import os
+import hashlib
+import tempfile
+import requests
+from threading import Lock
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit, parse_qs
+from ..repositories.http_client import HttpClient
+from ..repositories.single_flight import SingleFlight
+
+# Pillow is in requirements.txt, but optional - without it, images are proxied + cached at their original size
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+IMAGE_PROXY_URL = os.environ.get("IMAGE_PROXY_URL")     # public base URL of this API; unset disables rewriting
+IMAGE_PROXY_PATH = '/images/proxy'
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "groupgrub-images"))
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+ALLOWED_IMAGE_HOSTS = os.environ.get("ALLOWED_IMAGE_HOSTS", ".fl.yelpcdn.com").split(',')
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+VARIANT_CONTENT_TYPE = 'image/jpeg'     # downscaled variants are always re-encoded as JPEG
+CARD_WIDTH = 600        # px, wide enough for a BusinessCard on high-DPI phones
+VALID_WIDTHS = [300, CARD_WIDTH, 900]    # bounded, so clients can't fill the cache w/ arbitrary variants
+PREFETCH_WORKERS = 4
+
+
+def proxy_image_url(url: str, proxy_url: str = IMAGE_PROXY_URL, width: int = CARD_WIDTH) -> str:
+    """rewrites an upstream image URL to go through the image proxy (unchanged if the proxy isn't configured)"""
+    if not proxy_url or not url:
+        return url
+    params = { 'src': url, 'w': width } if width else { 'src': url }
+    return proxy_url.rstrip('/') + IMAGE_PROXY_PATH + '?' + urlencode(params)
+
+def source_image_url(url: str) -> tuple[str, int]:
+    """inverse of proxy_image_url: (upstream URL, width or None)"""
+    parts = urlsplit(url)
+    if parts.path != IMAGE_PROXY_PATH:
+        return url, None
+    params = parse_qs(parts.query)
+    width = params.get('w', [None])[0]
+    return params.get('src', [''])[0], int(width) if width and width.isdigit() else None
+
+
+class ImageFetchError(Exception):
+    pass
+
+
+class ImageCache:
+    """
+    Bounded, content-addressed on-disk image cache:
+      objects/<xx>/<sha256 of the bytes>[-w<width>]   image data, shared by every URL w/ identical content
+      index/<sha256 of the URL>                        "<object digest> <content type>"
+    Objects are evicted least-recently-used once the cache grows past max_bytes.
+    Concurrent misses for the same URL (or variant) share one fetch (or resize)
+    """
+    def __init__(self,
+                 directory: str = IMAGE_CACHE_DIR,
+                 max_bytes: int = IMAGE_CACHE_MAX_BYTES,
+                 allowed_hosts: list[str] = ALLOWED_IMAGE_HOSTS,
+                 http: HttpClient = None) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.allowed_hosts = [host.strip() for host in allowed_hosts if host.strip()]
+        self.http = http if http is not None else HttpClient(max_retries=1)
+        self.executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='image-prefetch')
+
+        self._flights = SingleFlight()
+        self._lock = Lock()
+        self._objects = OrderedDict()   # object name -> size, least recently used first
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.prefetched = 0
+        self.undecodable = 0
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(directory, 'index'), exist_ok=True)
+        self._load()
+
+    def is_allowed(self, url: str) -> bool:
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            return False
+        return any(parts.hostname == host or (host.startswith('.') and parts.hostname.endswith(host))
+                   for host in self.allowed_hosts)
+
+    def get(self, url: str, width: int = None) -> tuple[str, str, str]:
+        """returns (path, etag, content type) of the cached image, fetching it first on a miss"""
+        if not self.is_allowed(url):
+            raise ImageFetchError(f"Image host not allowed: {url}")
+        width = width if Image is not None else None
+
+        cached = self._lookup(url, width)
+        if cached:
+            with self._lock:
+                self.hits += 1
+            return cached
+        with self._lock:
+            self.misses += 1
+
+        digest, content_type = self._flights.do(url, self._original, url)
+        if width:
+            try:
+                return self._flights.do((digest, width), self._variant, digest, width)
+            except ImageFetchError as e:    # e.g. SVG/HEIC or a truncated JPEG - the original is still servable
+                print("WARNING: serving original, no variant", url, e)
+                with self._lock:
+                    self.undecodable += 1
+        self._touch(digest)
+        return self._object_path(digest), digest, content_type
+
+    def prefetch(self, urls: list[str]) -> None:
+        """warms the cache in the background, e.g. as soon as a lobby's businesses are stored"""
+        for url in urls:
+            source, width = source_image_url(url)
+            if source and self.is_allowed(source):
+                self.executor.submit(self._prefetch_one, source, width)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "objects": len(self._objects),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "prefetched": self.prefetched,
+            "undecodable": self.undecodable,
+            "coalesced": self._flights.coalesced,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _prefetch_one(self, url: str, width: int) -> None:
+        try:
+            self.get(url, width)
+        except (ImageFetchError, OSError) as e:
+            print("WARNING: image prefetch failed", url, e)
+            return
+        with self._lock:
+            self.prefetched += 1
+
+    def _lookup(self, url: str, width: int) -> tuple[str, str, str]:
+        digest, content_type = self._read_index(url)
+        if digest is None:
+            return None
+        name = f'{digest}-w{width}' if width else digest
+        if not os.path.exists(self._object_path(name)):
+            return None
+        self._touch(name)
+        return self._object_path(name), name, VARIANT_CONTENT_TYPE if width else content_type
+
+    def _original(self, url: str) -> tuple[str, str]:
+        """(digest, content type) of the URL's stored object, fetching + storing it if it isn't on disk"""
+        digest, content_type = self._read_index(url)
+        if digest is None or not os.path.exists(self._object_path(digest)):
+            data, content_type = self._fetch(url)
+            digest = hashlib.sha256(data).hexdigest()
+            self._store(digest, data)
+            self._write_index(url, digest, content_type)
+        return digest, content_type
+
+    def _fetch(self, url: str) -> tuple[bytes, str]:
+        try:
+            response = self.http.get(url, stream=True)
+        except requests.exceptions.RequestException as e:
+            raise ImageFetchError(str(e))
+        with response:
+            content_type = response.headers.get('Content-Type', '').split(';')[0]
+            if response.status_code != 200 or not content_type.startswith('image/'):
+                raise ImageFetchError(f"Upstream returned {response.status_code} ({content_type or 'no content type'})")
+            data = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                data += chunk
+                if len(data) > MAX_IMAGE_BYTES:
+                    raise ImageFetchError("Image too large")
+        return bytes(data), content_type
+
+    def _variant(self, digest: str, width: int) -> tuple[str, str, str]:
+        """downscaled copy of an object, cached alongside it. Raises ImageFetchError if Pillow can't decode the object"""
+        name = f'{digest}-w{width}'
+        path = self._object_path(name)
+        if not os.path.exists(path):
+            buffer = io.BytesIO()
+            try:
+                with open(self._object_path(digest), 'rb') as f:
+                    image = Image.open(f)
+                    image.load()
+                if image.width > width:
+                    image.thumbnail((width, width * image.height // image.width))
+                image.convert('RGB').save(buffer, format='JPEG', quality=80, optimize=True)
+            except FileNotFoundError:
+                raise   # evicted meanwhile, the route looks it up again
+            except (OSError, Image.DecompressionBombError) as e:    # UnidentifiedImageError is an OSError, as is truncation
+                raise ImageFetchError(f"Can't resize image: {e}")
+            self._store(name, buffer.getvalue())
+        self._touch(name)
+        return path, name, VARIANT_CONTENT_TYPE
+
+    def _store(self, name: str, data: bytes) -> None:
+        path = self._object_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._write_atomic(path, data)
+        with self._lock:
+            self.current_bytes += len(data) - self._objects.pop(name, 0)
+            self._objects[name] = len(data)
+            self._evict()
+
+    def _touch(self, name: str) -> None:
+        with self._lock:
+            if name in self._objects:
+                self._objects.move_to_end(name)
+
+    def _evict(self) -> None:
+        while self.current_bytes > self.max_bytes and len(self._objects) > 1:
+            name, size = self._objects.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._object_path(name))
+            except FileNotFoundError:
+                pass
+
+    def _load(self) -> None:
+        """rebuilds the LRU order from disk (oldest modification first) after a restart"""
+        objects = []
+        for root, _, files in os.walk(os.path.join(self.directory, 'objects')):
+            for file in files:
+                if file.endswith('.tmp'):
+                    continue
+                stat = os.stat(os.path.join(root, file))
+                objects.append((stat.st_mtime, file, stat.st_size))
+        for _, name, size in sorted(objects):
+            self._objects[name] = size
+            self.current_bytes += size
+        self._evict()
+
+    def _read_index(self, url: str) -> tuple[str, str]:
+        try:
+            with open(self._index_path(url)) as f:
+                digest, content_type = f.read().split()
+            return digest, content_type
+        except (FileNotFoundError, ValueError):
+            return None, None
+
+    def _write_index(self, url: str, digest: str, content_type: str) -> None:
+        self._write_atomic(self._index_path(url), f'{digest} {content_type}'.encode())
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        """writes through a temp file unique to this call, then renames it, so readers never see a partial file"""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def _object_path(self, name: str) -> str:
+        return os.path.join(self.directory, 'objects', name[:2], name)
+
+    def _index_path(self, url: str) -> str:
+        return os.path.join(self.directory, 'index', hashlib.sha256(url.encode()).hexdigest())
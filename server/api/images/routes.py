@@ -0,0 +1,54 @@
+from flask import Blueprint, request, jsonify, send_file
+from .image_cache import ImageCache, ImageFetchError, VALID_WIDTHS
+
+CACHE_MAX_AGE = 31536000    # 1 year - cached objects are content-addressed, so they never change
+
+def create_blueprint(ic: ImageCache)->Blueprint:
+    bp = Blueprint('images', __name__)
+
+    @bp.route("/proxy", methods=["GET"])
+    def proxy_image():
+        src = request.args.get('src', '')
+        width = request.args.get('w')
+        if not ic.is_allowed(src):
+            return jsonify({
+                "status": "ERROR",
+                "error": "Invalid image source provided"
+            }), 400
+        if width is not None:
+            if not width.isdigit() or int(width) not in VALID_WIDTHS:
+                return jsonify({
+                    "status": "ERROR",
+                    "error": "Invalid image width requested"
+                }), 400
+            width = int(width)
+
+        for _ in range(2):  # the object can be evicted between lookup and send, so look it up again once
+            try:
+                path, etag, content_type = ic.get(src, width)
+                response = send_file(path, mimetype=content_type, etag=etag, max_age=CACHE_MAX_AGE, conditional=True)
+                break
+            except FileNotFoundError:
+                continue
+            except ImageFetchError as e:
+                print("WARNING: image proxy failed", e)
+                return jsonify({
+                    "status": "ERROR",
+                    "error": "Image unavailable"
+                }), 502
+        else:
+            return jsonify({
+                "status": "ERROR",
+                "error": "Image unavailable"
+            }), 502
+        response.headers['Cache-Control'] = f'public, max-age={CACHE_MAX_AGE}, immutable'
+        return response
+
+    @bp.route("/get-image-stats", methods=["GET"])
+    def get_image_stats():
+        return jsonify({
+            "status": "SUCCESS",
+            "stats": ic.stats()
+        })
+
+    return bp
@@ -0,0 +1,61 @@
+from collections import OrderedDict
+from threading import Lock
+from ..repositories.lobby_repository import LobbyRepository
+from ..serialization import dumps, loads
+
+ROOM_SEQ_MAX_ROOMS = 4096    # rooms whose counters are kept, least recently broadcast to dropped first
+
+
+def lobby_state(lr: LobbyRepository, lobby_ID: str, fields: list[str], consistent: bool = False) -> tuple[int, dict]:
+    """
+    (version, { field: value }) for the named lobby fields, from one read plus get_votes if votes are asked for
+    (they may be spread over vote shards), or None if the lobby doesn't exist
+    """
+    state = lr.get_attributes(lobby_ID=lobby_ID, attributes=[field for field in fields if field != "votes"] + ["version"],
+                              consistent=consistent)
+    if state is None:
+        return None
+    version = int(state.pop("version") or 0)
+    if "votes" in fields:
+        state["votes"] = lr.get_votes(lobby_ID=lobby_ID) or []
+    return version, state
+
+
+class RoomBroadcasts:
+    """
+    Lobby state for room events, read once here and pushed to everyone in the room instead of every client
+    refetching it over HTTP. A payload is { lobby_ID, seq, version, lobby }, where:
+      - lobby holds the full current value of the fields the event is about (read consistently, right after the write)
+      - version is the lobby's version as of that read, comparable w/ /lobby/get-lobby-snapshot's
+      - seq counts the room's payloads of those same fields (1, 2, ...), so a client can tell when it missed one.
+        Since lobby is full state, applying the next payload already resyncs those fields; version orders payloads
+        against each other and against snapshots, so a late one never overwrites newer state.
+        Socket.IO rooms live in this one process (there's no message queue), so seq is a plain counter
+    """
+    def __init__(self, lr: LobbyRepository, max_rooms: int = ROOM_SEQ_MAX_ROOMS) -> None:
+        self.lr = lr
+        self.max_rooms = max_rooms
+        self._seqs = OrderedDict()    # lobby_ID -> { fields: last seq }, least recently used first
+        self._lock = Lock()
+
+    def payload(self, lobby_ID: str, fields: list[str]) -> dict:
+        """the next payload of these fields, or None if the lobby no longer exists (clients then refetch and get a 404)"""
+        state = lobby_state(self.lr, lobby_ID, fields, consistent=True)
+        if state is None:
+            return None
+        version, lobby = state
+        return {
+            "lobby_ID": lobby_ID,
+            "seq": self._next_seq(lobby_ID, ",".join(fields)),
+            "version": version,
+            "lobby": loads(dumps(lobby)),    # plain JSON types (DynamoDB hands back Decimals) for Socket.IO's encoder
+        }
+
+    def _next_seq(self, lobby_ID: str, stream: str) -> int:
+        with self._lock:
+            seqs = self._seqs.pop(lobby_ID, {})
+            self._seqs[lobby_ID] = seqs
+            seqs[stream] = seqs.get(stream, 0) + 1
+            while len(self._seqs) > self.max_rooms:
+                self._seqs.popitem(last=False)
+            return seqs[stream]
@@ -1,7 +1,17 @@
-from flask import request
+from flask import request, current_app
 from flask_socketio import emit, leave_room
 from __main__ import socketio
 
+def invalidate_lobby(lobbyID):
+    """room events follow lobby changes, so drop this worker's cached copy before clients re-read it"""
+    cache = current_app.extensions.get("lobby_cache")
+    if cache is not None:
+        cache.invalidate(lobbyID)
+
+def room_payload(lobbyID, fields):
+    """the changed fields, read once and sent to the whole room (see lobby/broadcasts.py) so clients needn't refetch"""
+    return current_app.extensions["room_broadcasts"].payload(lobbyID, fields)
+
 @socketio.on("USER_ONLINE")
 def connected(userID):
     """event listener when client connects to the server"""
@@ -16,36 +26,43 @@ def disconnected():
 @socketio.on("ROOM_CLOSE_EARLY")
 def disconnected(lobbyID):
     """event listener when client disconnects from the server"""
+    invalidate_lobby(lobbyID)
     leave_room(lobbyID)
     emit("LEAVE_ROOM_EARLY", to=lobbyID, broadcast=True, include_self=False)
 
 @socketio.on("ROOM_PREFERENCES_CHANGE")
 def room_preferences_change(lobbyID):
     """event listener for when host changes LobbyDropdown Component value"""
-    emit("ROOM_PREFERENCES_UPDATE", to=lobbyID, broadcast=True, include_self=False)
+    invalidate_lobby(lobbyID)
+    emit("ROOM_PREFERENCES_UPDATE", room_payload(lobbyID, ["preferences"]), to=lobbyID, broadcast=True, include_self=False)
 
 @socketio.on("ROOM_CATEGORY_CHANGE")
 def room_category_change(lobbyID):
     """event listener for when client is leaving a specific room"""
-    emit("ROOM_CATEGORY_CHANGE", to=lobbyID, broadcast=True, include_self=False)
+    invalidate_lobby(lobbyID)
+    emit("ROOM_CATEGORY_CHANGE", room_payload(lobbyID, ["categories"]), to=lobbyID, broadcast=True, include_self=False)
 
 @socketio.on("ROOM_BUSINESSES_SEND")
 def room_businesses_send(lobbyID):
     """event listener for when room's host receives yelp businesses"""
-    emit("ROOM_BUSINESSES_RECEIVED", to=lobbyID, broadcast=True, include_self=False)
+    invalidate_lobby(lobbyID)
+    emit("ROOM_BUSINESSES_RECEIVED", room_payload(lobbyID, ["businesses"]), to=lobbyID, broadcast=True, include_self=False)
 
 @socketio.on("LOBBY_FINISHED_SWIPING")
 def lobby_finished_swiping(lobbyID):
     """event listener for when room's host receives yelp businesses"""
+    invalidate_lobby(lobbyID)
     emit("LOBBY_FINISHED_SWIPING", to=lobbyID, broadcast=True, include_self=False)
 
 @socketio.on("LATE_FINISHED_SWIPING")
 def late_finished_swiping(lobbyID):
     """event listener for when room's host receives yelp businesses"""
-    emit("ROOM_VOTE_UPDATE", to=lobbyID, broadcast=True, include_self=False)
+    invalidate_lobby(lobbyID)
+    emit("ROOM_VOTE_UPDATE", room_payload(lobbyID, ["votes"]), to=lobbyID, broadcast=True, include_self=False)
 
 @socketio.on("LOBBY_NAVIGATION_UPDATE")
 def lobby_navigation_update(lobbyID, path, message):
     """event listener for when room's host updates phase"""
+    invalidate_lobby(lobbyID)
     print("navigation update")
     emit("ROOM_PROGRESS_NAVIGATION", (path, message), to=lobbyID, broadcast=True)
\ No newline at end of file
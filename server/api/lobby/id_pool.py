@@ -0,0 +1,113 @@
+import os
+import time
+from collections import deque
+from threading import Event, Lock, Thread
+from nanoid import generate
+from ..repositories.lobby_repository import BATCH_GET_LIMIT, LobbyRepository, is_reusable
+
+LOBBY_ID_ALPHABET = '23456789abcdefghjkmnpqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ'
+LOBBY_ID_LENGTH = 4
+LOBBY_ID_POOL_SIZE = int(os.environ.get("LOBBY_ID_POOL_SIZE", 0))    # 0 disables the pool
+
+
+def generate_lobby_ID() -> str:
+    return generate(LOBBY_ID_ALPHABET, LOBBY_ID_LENGTH)
+
+
+class LobbyIDPool:
+    """
+    Keeps up to `size` lobby IDs that were free (or reusable) when last checked, refilled in the background
+    w/ one batched lookup (a BatchGetItem on DynamoDB) per 100 candidates. Creating a lobby then takes an ID that
+    almost certainly isn't taken, however full the keyspace gets, instead of probing random IDs one round trip at a time.
+    IDs are still claimed w/ a conditional put, so a stale pooled ID just costs one retry
+    """
+    def __init__(self, lr: LobbyRepository, size: int = LOBBY_ID_POOL_SIZE, generate_ID=generate_lobby_ID) -> None:
+        self.lr = lr
+        self.size = size
+        self.low_watermark = size // 2
+        self.generate_ID = generate_ID
+        self._lock = Lock()
+        self._IDs = deque()
+        self._needs_refill = Event()
+        self._stopped = Event()
+        self._thread = None
+        self.taken = 0
+        self.generated = 0     # pool empty/disabled, fell back to a random ID
+        self.checked = 0
+        self.rejected = 0
+
+    def start(self) -> bool:
+        """starts refilling in the background, unless disabled (size <= 0) or already running"""
+        with self._lock:
+            if self.size <= 0 or self._thread is not None:
+                return False
+            self._stopped.clear()
+            self._thread = Thread(target=self._loop, name='lobby-id-pool', daemon=True)
+        self._needs_refill.set()
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._needs_refill.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def take(self) -> str:
+        """a pre-validated ID if one is pooled, otherwise a random one"""
+        with self._lock:
+            lobby_ID = self._IDs.popleft() if self._IDs else None
+            if lobby_ID is None:
+                self.generated += 1
+            else:
+                self.taken += 1
+            if len(self._IDs) < self.low_watermark:
+                self._needs_refill.set()
+        return lobby_ID if lobby_ID is not None else self.generate_ID()
+
+    def refill(self) -> int:
+        """tops the pool up to `size`, returning how many IDs were added"""
+        added = 0
+        while len(self._IDs) < self.size and not self._stopped.is_set():
+            with self._lock:
+                candidates = { self.generate_ID() for _ in range(BATCH_GET_LIMIT) } - set(self._IDs)
+            free = self._free(candidates)
+            if not free:    # keyspace (nearly) full - try again on the next take() rather than spin
+                break
+            with self._lock:
+                for lobby_ID in free[:self.size - len(self._IDs)]:
+                    self._IDs.append(lobby_ID)
+                    added += 1
+        return added
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "available": len(self._IDs),
+            "taken": self.taken,
+            "generated": self.generated,
+            "checked": self.checked,
+            "rejected": self.rejected,
+        }
+
+    def _free(self, candidates: set[str]) -> list[str]:
+        now = int(time.time())
+        taken = { lobby_ID for lobby_ID, expires_at in self.lr.get_expiries(candidates).items()
+                  if not is_reusable(expires_at, now=now) }
+        with self._lock:
+            self.checked += len(candidates)
+            self.rejected += len(taken)
+        return [lobby_ID for lobby_ID in candidates if lobby_ID not in taken]
+
+    def _loop(self) -> None:
+        while not self._stopped.is_set():
+            self._needs_refill.wait()
+            self._needs_refill.clear()
+            try:
+                self.refill()
+            except Exception as e:
+                print("WARNING: lobby ID pool refill failed", e)
+                self._stopped.wait(1)
+                self._needs_refill.set()
@@ -1,21 +1,18 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, Response, request, jsonify, session
 from datetime import datetime, timezone
-from nanoid import generate
 from decimal import Decimal
-from ..repositories.lobby_repository import Lobby, LobbyRepository
+from ..repositories.lobby_repository import LOBBY_NOT_FOUND, Lobby, LobbyRepository
+from ..serialization import dumps, encode_businesses, json_response
+from ..selection.prefetcher import Prefetcher
+from ..images.image_cache import ImageCache
+from .id_pool import LobbyIDPool, generate_lobby_ID
+from .broadcasts import lobby_state
 
 TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
-MAXIMUM_LOBBY_AGE = 1800    # 1800s = 30min
+SNAPSHOT_FIELDS = ["host", "timestamp", "joinable", "phase", "sessions", "preferences", "categories", "businesses", "votes"]
 
 
-def isExpiredLobby(timestamp: str) -> bool:
-    format = '%Y-%m-%dT%H:%M:%SZ'   # JavaScript UTC Date format
-    start = datetime.strptime(timestamp, format)
-    now = datetime.now(timezone.utc)
-    delta = (now - start).total_seconds()
-    return delta >= MAXIMUM_LOBBY_AGE
-
-def create_blueprint(lr: LobbyRepository)->Blueprint:
+def create_blueprint(lr: LobbyRepository, prefetcher: Prefetcher=None, ic: ImageCache=None, id_pool: LobbyIDPool=None)->Blueprint:
     bp = Blueprint('lobby', __name__)
 
     ''' ~ Routes related to initial Lobby creation + lobby teardown ~ '''
@@ -26,13 +23,10 @@ def create_blueprint(lr: LobbyRepository)->Blueprint:
             return jsonify({
                 "status": "ERROR",
                 "error": "Invalid session_info provided" }), 400
-        lobby = None
         for _ in range(10):
-            lobby_ID = generate('23456789abcdefghjkmnpqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ', 4)
-            lobby = lr.get(lobby_ID=lobby_ID)
-            if not lobby or isExpiredLobby(lobby.timestamp):
-                lobby = Lobby(lobby_ID=lobby_ID, host=session_info, timestamp=None)
-                lr.add(**vars(lobby))
+            lobby_ID = id_pool.take() if id_pool else generate_lobby_ID()
+            # One conditional put per attempt - fails (instead of overwriting) if the ID is already taken
+            if lr.claim(Lobby(lobby_ID=lobby_ID, host=session_info, timestamp=None)):
                 return jsonify({
                     "status": "SUCCESS",
                     "lobby_ID": lobby_ID,
@@ -45,13 +39,13 @@ def create_blueprint(lr: LobbyRepository)->Blueprint:
     @bp.route("/join-lobby", methods=["POST"])
     def join_lobby():
         lobby_ID = request.json["lobby_ID"]
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        joinable = lr.get_attribute(lobby_ID=lobby_ID, attribute="joinable")
+        if joinable is LOBBY_NOT_FOUND:
             return jsonify({
                 "status": "ERROR",
                 "error": "Lobby does not exist"
             }), 404
-        if not lobby.joinable:
+        if not joinable:
             return jsonify({
                 "status": "ERROR",
                 "error": "Lobby already started"
@@ -65,42 +59,70 @@ def create_blueprint(lr: LobbyRepository)->Blueprint:
     @bp.route("/delete-lobby", methods=["DELETE"])
     def delete_lobby():
         lobby_ID = request.args.get('lobby_ID')
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        if lr.delete(lobby_ID=lobby_ID, must_exist=True) is LOBBY_NOT_FOUND:
             return jsonify({
                 "status": "ERROR",
                 "error": "Lobby does not exist"
             }), 404
-        lr.delete(lobby_ID=lobby_ID)
+        if prefetcher: prefetcher.cancel(lobby_ID)
         return jsonify({ "status": "SUCCESS" })
 
 
+    ''' ~ Snapshot route, any subset of the lobby's attributes in one request ~ '''
+    @bp.route("/get-lobby-snapshot", methods=["GET"])
+    def get_lobby_snapshot():
+        lobby_ID = request.args.get('lobby-ID')
+        fields = request.args.get('fields')
+        fields = fields.split(",") if fields else SNAPSHOT_FIELDS
+        unknown = [field for field in fields if field not in SNAPSHOT_FIELDS]
+        if unknown:
+            return jsonify({
+                "status": "ERROR",
+                "error": f"Unknown fields: {', '.join(unknown)}"
+            }), 400
+        state = lobby_state(lr, lobby_ID, fields)
+        if state is None:
+            return jsonify({
+                "status": "ERROR",
+                "error": "Lobby does not exist"
+            }), 404
+        version, snapshot = state
+        etag = str(version)
+        if "votes" in fields:
+            etag += f"-{sum(snapshot['votes'])}"     # sharded ballots don't bump the lobby's version, but only ever add
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = json_response(dumps({ "status": "SUCCESS", "version": version, "lobby": snapshot }))
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"     # always revalidate, it's the 304 that's cheap
+        return response
+
+
     ''' ~ Host related routes  ~ '''
     @bp.route("/get-lobby-host", methods=["GET"])
     def get_lobby_host():
         lobby_ID = request.args.get('lobby-ID')
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        host = lr.get_attribute(lobby_ID=lobby_ID, attribute="host")
+        if host is LOBBY_NOT_FOUND:
             return jsonify({
                 "status": "ERROR",
                 "error": "Lobby does not exist"
             }), 404
         return jsonify({
             "status": "SUCCESS",
-            "host": lobby.host
+            "host": host
         }) 
     
     @bp.route("/update-lobby-host", methods=["POST"])
     def update_lobby_host():
         lobby_ID = request.json["lobby_ID"]
         host = request.json["host"]
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        if lr.update_host(lobby_ID=lobby_ID, host=host, must_exist=True) is LOBBY_NOT_FOUND:
             return jsonify({
                 "status": "ERROR",
                 "error": "Lobby does not exist"
             }), 404
-        lr.update_host(lobby_ID=lobby_ID, host=host)
         return jsonify({ 
             "status": "SUCCESS",
             "updated_host": host
@@ -111,28 +133,26 @@ def create_blueprint(lr: LobbyRepository)->Blueprint:
     @bp.route("/get-lobby-timestamp", methods=["GET"])
     def get_lobby_timestamp():
         lobby_ID = request.args.get('lobby-ID')
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        timestamp = lr.get_attribute(lobby_ID=lobby_ID, attribute="timestamp")
+        if timestamp is LOBBY_NOT_FOUND:
             return jsonify({
                 "status": "ERROR",
                 "error": "Lobby does not exist"
             }), 404
         return jsonify({
             "status": "SUCCESS",
-            "timestamp": lobby.timestamp
+            "timestamp": timestamp
         }) 
     
     @bp.route("/update-lobby-timestamp", methods=["POST"])
     def update_lobby_timestamp():
         lobby_ID = request.json["lobby_ID"]
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        timestamp = datetime.now(timezone.utc).strftime(TIME_FORMAT)
+        if lr.update_timestamp(lobby_ID=lobby_ID, timestamp=timestamp, must_exist=True) is LOBBY_NOT_FOUND:
             return jsonify({
                 "status": "ERROR",
                 "error": "Lobby does not exist"
             }), 404
-        timestamp = datetime.now(timezone.utc).strftime(TIME_FORMAT)
-        lr.update_timestamp(lobby_ID=lobby_ID, timestamp=timestamp)
         return jsonify({ 
             "status": "SUCCESS",
             "updated_timestamp": timestamp
@@ -143,28 +163,26 @@ def create_blueprint(lr: LobbyRepository)->Blueprint:
     @bp.route("/get-lobby-joinable", methods=["GET"])
     def get_lobby_joinable():
         lobby_ID = request.args.get('lobby-ID')
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        joinable = lr.get_attribute(lobby_ID=lobby_ID, attribute="joinable")
+        if joinable is LOBBY_NOT_FOUND:
             return jsonify({
                 "status": "ERROR",
                 "error": "Lobby does not exist"
             }), 404
         return jsonify({
             "status": "SUCCESS",
-            "joinable": lobby.joinable
+            "joinable": joinable
         }) 
     
     @bp.route("/update-lobby-joinable", methods=["POST"])
     def update_lobby_joinable():
         lobby_ID = request.json["lobby_ID"]
         joinable = request.json["joinable"]
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        if lr.update_joinable(lobby_ID=lobby_ID, joinable=joinable, must_exist=True) is LOBBY_NOT_FOUND:
             return jsonify({
                 "status": "ERROR",
                 "error": "Lobby does not exist"
             }), 404
-        lr.update_joinable(lobby_ID=lobby_ID, joinable=joinable)
         return jsonify({ 
             "status": "SUCCESS",
             "updated_joinable": joinable
@@ -175,82 +193,98 @@ def create_blueprint(lr: LobbyRepository)->Blueprint:
     @bp.route("/get-lobby-phase", methods=["GET"])
     def get_lobby_phase():
         lobby_ID = request.args.get('lobby-ID')
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        phase = lr.get_attribute(lobby_ID=lobby_ID, attribute="phase")
+        if phase is LOBBY_NOT_FOUND:
             return jsonify({
                 "status": "ERROR",
                 "error": "Lobby does not exist"
             }), 404
         return jsonify({
             "status": "SUCCESS",
-            "phase": lobby.phase
+            "phase": phase
         }) 
     
     @bp.route("/update-lobby-phase", methods=["POST"])
     def update_lobby_phase():
         lobby_ID = request.json["lobby_ID"]
         phase = request.json["phase"]
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        if lr.update_phase(lobby_ID=lobby_ID, phase=phase, must_exist=True) is LOBBY_NOT_FOUND:
             return jsonify({
                 "status": "ERROR",
                 "error": "Lobby does not exist"
             }), 404
-        lr.update_phase(lobby_ID=lobby_ID, phase=phase)
         return jsonify({ 
             "status": "SUCCESS",
             "updated_phase": phase
         })
+
+    @bp.route("/transition-lobby-phase", methods=["POST"])
+    def transition_lobby_phase():
+        # Phase + joinable + timestamp in one conditional write, instead of a request per attribute
+        lobby_ID = request.json["lobby_ID"]
+        from_phase = request.json["from_phase"]
+        to_phase = request.json["to_phase"]
+        timestamp = datetime.now(timezone.utc).strftime(TIME_FORMAT) if request.json.get("refresh_timestamp") else None
+        changes = lr.transition(lobby_ID=lobby_ID, from_phase=from_phase, to_phase=to_phase,
+                                joinable=request.json.get("joinable"), timestamp=timestamp)
+        if changes is LOBBY_NOT_FOUND:
+            # Only read on failure, to tell a missing lobby from one another client already moved on
+            phase = lr.get_attribute(lobby_ID=lobby_ID, attribute="phase", consistent=True)
+            if phase is LOBBY_NOT_FOUND:
+                return jsonify({
+                    "status": "ERROR",
+                    "error": "Lobby does not exist"
+                }), 404
+            return jsonify({
+                "status": "ERROR",
+                "error": f"Lobby is not in phase {from_phase}",
+                "phase": phase
+            }), 409
+        return jsonify({
+            "status": "SUCCESS",
+            **{ f"updated_{name}": value for name, value in changes.items() if name != "expires_at" }
+        })
     
 
     ''' ~ Sessions related routes ~ '''
     @bp.route("/get-lobby-sessions", methods=["GET"])
     def get_lobby_sessions():
         lobby_ID = request.args.get('lobby-ID')
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        sessions = lr.get_attribute(lobby_ID=lobby_ID, attribute="sessions")
+        if sessions is LOBBY_NOT_FOUND:
             return jsonify({
                 "status": "ERROR",
                 "error": "Lobby does not exist"
             }), 404
         return jsonify({
             "status": "SUCCESS",
-            "sessions": lobby.sessions
+            "sessions": sessions
         }) 
     
     # Update session finished attribute + returns is_lobby_finished if all sessions are finished
     @bp.route("/update-lobby-session", methods=["POST"])
     def update_lobby_session():
         lobby_ID = request.json["lobby_ID"]
-        lobby = lr.get(lobby_ID=lobby_ID)
         session_info = request.json["session_info"]
-        if not lobby:
-            return jsonify({
-                "status": "ERROR",
-                "error": "Lobby does not exist"
-            }), 404
         if not session_info:
             return jsonify({
                 "status": "ERROR",
                 "error": "session_info is invalid"
             }), 400
         
-        ind, is_lobby_finished = -1, True
-        for i, cur in enumerate(lobby.sessions):
-            if ind != -1 and not is_lobby_finished:
-                break
-            cur_session_info = cur["session_info"]
-            cur_is_finished = cur["is_finished"]
-            if cur_session_info["session_ID"] == session_info["session_ID"]:
-                ind = i
-            elif cur_session_info["session_ID"] != session_info["session_ID"] and not cur_is_finished:
-                is_lobby_finished = False
-        
-        if ind != -1: lr.update_sessions(lobby_ID=lobby_ID, i=ind, new_session=session_info, is_finished=True)
+        sessions = lr.update_session(lobby_ID=lobby_ID, session=session_info, is_finished=True)
+        if sessions is LOBBY_NOT_FOUND:    # either no lobby, or a session that never joined it (nothing to update)
+            sessions = lr.get_attribute(lobby_ID=lobby_ID, attribute="sessions", consistent=True)
+        if sessions is LOBBY_NOT_FOUND:
+            return jsonify({
+                "status": "ERROR",
+                "error": "Lobby does not exist"
+            }), 404
         
         return jsonify({ 
             "status": "SUCCESS",
-            "is_lobby_finished": is_lobby_finished
+            "is_lobby_finished": all(cur["is_finished"] for cur in sessions
+                                     if cur["session_info"]["session_ID"] != session_info["session_ID"])
         })
     
 
@@ -258,15 +292,15 @@ def create_blueprint(lr: LobbyRepository)->Blueprint:
     @bp.route("/get-lobby-preferences", methods=["GET"])
     def get_lobby_preferences():
         lobby_ID = request.args.get('lobby-ID')
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        preferences = lr.get_attribute(lobby_ID=lobby_ID, attribute="preferences")
+        if preferences is LOBBY_NOT_FOUND:
             return jsonify({
                 "status": "ERROR",
                 "error": "lobby does not exist"
             }), 404
         return jsonify({
             "status": "SUCCESS",
-            "preferences": lobby.preferences
+            "preferences": preferences
         }) 
     
     @bp.route("/update-lobby-preferences", methods=["POST"])
@@ -282,13 +316,15 @@ def create_blueprint(lr: LobbyRepository)->Blueprint:
             })
         preferences["coordinates"]["latitude"] = Decimal(str(preferences["coordinates"]["latitude"]))
         preferences["coordinates"]["longitude"] = Decimal(str(preferences["coordinates"]["longitude"]))
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        # ALL_NEW hands back the lobby's categories for the prefetcher w/o a separate read
+        lobby = lr.update_preferences(lobby_ID=lobby_ID, preferences=preferences, must_exist=True,
+                                      return_values='ALL_NEW' if prefetcher else 'NONE')
+        if lobby is LOBBY_NOT_FOUND:
             return jsonify({
                 "status": "ERROR",
                 "error": "Lobby does not exist"
             }), 404
-        lr.update_preferences(lobby_ID=lobby_ID, preferences=preferences)
+        if prefetcher: prefetcher.schedule(lobby_ID, preferences, lobby["categories"], lobby["phase"])
         return jsonify({ 
             "status": "SUCCESS",
             "updated_preferences": preferences
@@ -299,13 +335,12 @@ def create_blueprint(lr: LobbyRepository)->Blueprint:
     @bp.route("/get-lobby-categories", methods=["GET"])
     def get_lobby_categories():
         lobby_ID = request.args.get('lobby-ID')
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        categories = lr.get_attribute(lobby_ID=lobby_ID, attribute="categories")
+        if categories is LOBBY_NOT_FOUND:
             return jsonify({
                 "status": "ERROR",
                 "error": "lobby does not exist"
             }), 404
-        categories = lobby.categories
         return jsonify({
             "status": "SUCCESS",
             "categories": categories
@@ -316,30 +351,17 @@ def create_blueprint(lr: LobbyRepository)->Blueprint:
         session_info = request.json["session_info"]
         lobby_ID = request.json["lobby_ID"]
         category = request.json["category"]
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        result = lr.add_category(lobby_ID=lobby_ID, category=category, session=session_info)
+        if result is LOBBY_NOT_FOUND:
             return jsonify({
                 "status": "ERROR",
                 "error": "lobby does not exist"
             }), 404
-        index, is_new = 0, True
-        categories = lobby.categories
-        for i, category_obj in enumerate(categories): # For now, at most O(30)
-            if category_obj["category"] == category:
-                category_obj["sessions"].append(session_info) 
-                categories[i] = category_obj
-                is_new = False
-                break
-            index += 1
-        if is_new:
-            categories.append({
-                "category": category,
-                "sessions": [session_info]
-            })
-        lr.update_categories(lobby_ID=lobby_ID, categories=categories)
+        lobby, is_new = result
+        if prefetcher: prefetcher.schedule(lobby_ID, lobby["preferences"], lobby["categories"], lobby["phase"])
         return jsonify({ 
             "status": "SUCCESS",
-            "updated_categories": categories,
+            "updated_categories": lobby["categories"],
             "is_new": is_new
         })
 
@@ -347,41 +369,26 @@ def create_blueprint(lr: LobbyRepository)->Blueprint:
     def remove_lobby_categories():
         session_info = request.json["session_info"]
         lobby_ID = request.json["lobby_ID"]
-        deletion_category = request.json["category"]
-        deletion_index = request.json["deletion_index"]
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
-            return jsonify({
-                "status": "ERROR",
-                "error": "Lobby does not exist"
-            }), 404
-        
-        if lobby.categories[deletion_index]["category"] != deletion_category:
-            for i, category in enumerate(lobby.categories):
-                if category["category"] == deletion_category:
-                    deletion_index = i
-                    break
-                
-        if deletion_index == -1:
+        deletion_category = request.json["category"]    # "deletion_index" is no longer needed, categories are keyed by name
+        lobby = lr.remove_category(lobby_ID=lobby_ID, category=deletion_category, session=session_info)
+        if lobby is LOBBY_NOT_FOUND:    # only now worth a read, to tell the client what was missing
+            categories = lr.get_attribute(lobby_ID=lobby_ID, attribute="categories", consistent=True)
+            if categories is LOBBY_NOT_FOUND:
+                error = "Lobby does not exist"
+            elif not any(category["category"] == deletion_category for category in categories):
+                error = "Category does not exist"
+            else:
+                error = "Session was not mapped to the category"
             return jsonify({
                 "status": "ERROR",
-                "error": "Category does not exist"
-            }), 404
-        if session_info not in lobby.categories[deletion_index]["sessions"]:
-            return jsonify({
-                "status": "ERROR",
-                "error": "Session was not mapped to the category"
+                "error": error
             }), 404
 
-        categories = lobby.categories
-        categories[deletion_index]["sessions"].remove(session_info)
-        is_unused = not categories[deletion_index]["sessions"]
-        if is_unused:  # Category no longer chosen by any sessions
-            del categories[deletion_index]
-        lr.update_categories(lobby_ID=lobby_ID, categories=categories)
+        is_unused = not any(category["category"] == deletion_category for category in lobby["categories"])
+        if prefetcher: prefetcher.schedule(lobby_ID, lobby["preferences"], lobby["categories"], lobby["phase"])
         return jsonify({ 
             "status": "SUCCESS",
-            "updated_categories": categories,
+            "updated_categories": lobby["categories"],
             "is_unused": is_unused
         })
     
@@ -390,28 +397,25 @@ def create_blueprint(lr: LobbyRepository)->Blueprint:
     @bp.route("/get-lobby-businesses", methods=["GET"])
     def get_lobby_businesses():
         lobby_ID = request.args.get('lobby-ID')
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        businesses = lr.get_attribute(lobby_ID=lobby_ID, attribute="businesses")
+        if businesses is LOBBY_NOT_FOUND:
             return jsonify({
                 "status": "ERROR",
                 "error": "lobby does not exist"
             }), 404
-        return jsonify({
-            "status": "SUCCESS",
-            "businesses": lobby.businesses
-        }) 
+        return json_response(b'{"status":"SUCCESS","businesses":' + encode_businesses(businesses) + b'}')
     
     @bp.route("/update-lobby-businesses", methods=["POST"])
     def update_lobby_businesses():
         lobby_ID = request.json["lobby_ID"]
         businesses = request.json["businesses"]
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        if lr.update_businesses(lobby_ID=lobby_ID, businesses=businesses, must_exist=True) is LOBBY_NOT_FOUND:
             return jsonify({
                 "status": "ERROR",
                 "error": "Lobby does not exist"
             }), 404
-        lr.update_businesses(lobby_ID=lobby_ID, businesses=businesses)
+        if prefetcher: prefetcher.cancel(lobby_ID)  # final search is done, anything pending is stale
+        if ic: ic.prefetch([business.get("image_url") for business in businesses if business.get("image_url")])
         return jsonify({ 
             "status": "SUCCESS",
             "updated_businesses": businesses
@@ -422,32 +426,40 @@ def create_blueprint(lr: LobbyRepository)->Blueprint:
     @bp.route("/get-lobby-votes", methods=["GET"])
     def get_lobby_votes():
         lobby_ID = request.args.get('lobby-ID')
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        votes = lr.get_votes(lobby_ID=lobby_ID)
+        if votes is None:
             return jsonify({
                 "status": "ERROR",
                 "error": "lobby does not exist"
             }), 404
         return jsonify({
             "status": "SUCCESS",
-            "votes": lobby.votes
+            "votes": votes
         }) 
 
     @bp.route("/update-lobby-votes", methods=["POST"])
     def update_lobby_votes():
         lobby_ID = request.json["lobby_ID"]
         votes = request.json["votes"]
-        lobby = lr.get(lobby_ID=lobby_ID)
-        if not lobby:
+        session_ID = (request.json.get("session_info") or {}).get("session_ID")    # optional, picks the vote shard
+        if lr.update_votes(lobby_ID=lobby_ID, votes=votes, must_exist=True, session_ID=session_ID) is LOBBY_NOT_FOUND:
             return jsonify({
                 "status": "ERROR",
                 "error": "Lobby does not exist"
             }), 404
-        lr.update_votes(lobby_ID=lobby_ID, votes=votes)
         return jsonify({ 
             "status": "SUCCESS",
             "updated_votes": votes 
         })
 
+
+    ''' ~ Diagnostics ~ '''
+    @bp.route("/get-lobby-cache-stats", methods=["GET"])
+    def get_lobby_cache_stats():
+        return jsonify({
+            "status": "SUCCESS",
+            "stats": lr.cache.stats()
+        })
+
     return bp
 
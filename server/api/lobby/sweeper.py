@@ -0,0 +1,67 @@
+import os
+import time
+from threading import Event, Lock, Thread
+from ..repositories.lobby_repository import LobbyRepository
+
+LOBBY_SWEEP_INTERVAL = float(os.environ.get("LOBBY_SWEEP_INTERVAL", 0))     # seconds between sweeps, 0 disables
+
+
+class LobbySweeper:
+    """
+    Optional background thread that bulk-deletes expired lobbies every `interval` seconds.
+    DynamoDB's TTL does the same eventually; the sweeper just keeps LobbyTable (and its scans) small in the meantime
+    """
+    def __init__(self, lr: LobbyRepository, interval: float = LOBBY_SWEEP_INTERVAL) -> None:
+        self.lr = lr
+        self.interval = interval
+        self._lock = Lock()
+        self._stopped = Event()
+        self._thread = None
+        self.sweeps = 0
+        self.deleted = 0
+        self.failed = 0
+        self.last_sweep = None
+
+    def start(self) -> bool:
+        """starts sweeping in the background, unless disabled (interval <= 0) or already running"""
+        with self._lock:
+            if self.interval <= 0 or self._thread is not None:
+                return False
+            self._stopped.clear()
+            self._thread = Thread(target=self._loop, name='lobby-sweeper', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stopped.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def sweep(self) -> int:
+        try:
+            deleted = self.lr.delete_expired()
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            print("WARNING: lobby sweep failed", e)
+            return 0
+        with self._lock:
+            self.sweeps += 1
+            self.deleted += deleted
+            self.last_sweep = time.time()
+        return deleted
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "sweeps": self.sweeps,
+            "deleted": self.deleted,
+            "failed": self.failed,
+            "last_sweep": self.last_sweep,
+        }
+
+    def _loop(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.sweep()
@@ -1,30 +1,74 @@
+import os
 import requests
-from dataclasses import dataclass
+from itertools import chain, zip_longest
+from concurrent.futures import ThreadPoolExecutor
+from ..serialization import dumps
+from ..images.image_cache import IMAGE_PROXY_URL, proxy_image_url
 from .repository import Repository
+from .search_cache import SearchCache, make_search_key
+from .http_client import HttpClient
+from .single_flight import SingleFlight
 from .templates.fusion_header import fusion_header
 
 # TODO: ensure that 'search?term=' suffix is correct    
-ENDPOINT = 'https://api.yelp.com/v3/businesses/search?term=food&categories='
+# NOTE: point FUSION_API_URL at standins/fusion_standin.py to benchmark/test without burning Yelp quota
+FUSION_API_URL = os.environ.get("FUSION_API_URL", "https://api.yelp.com")
+SEARCH_PATH = '/v3/businesses/search?term=food&categories='
+PAGE_SIZE = 50              # Maximum 'limit' accepted by the search API
+MAX_SEARCH_DEPTH = 1000     # 'offset' + 'limit' can't exceed this
+FAN_OUT = os.environ.get("FUSION_FAN_OUT", "false").lower() == "true"
+FAN_OUT_WORKERS = int(os.environ.get("FUSION_FAN_OUT_WORKERS", 8))
 
-@dataclass
 class Business:
-    name: str
-    categories: list[str]
-    url: str
-    image_url: str
-    price: int
-    address: str
-    phone: str
-
-    def __init__(self, name: str, categories: list[str], url: str, image_url: str, price: int, address: str, phone: str):
+    """Compact (__slots__) business card, built in one pass from a Yelp search result"""
+    __slots__ = ('id', 'name', 'categories', 'url', 'image_url', 'price', 'address', 'phone', '_json')
+    FIELDS = ('name', 'categories', 'url', 'image_url', 'price', 'address', 'phone', 'id')
+
+    def __init__(self, name: str, categories: list[dict], url: str, image_url: str, price: str, address: str, phone: str, id: str=""):
+        self.id = id
         self.name = name
         self.categories = categories
         self.url = url
-        self.image_url =image_url
+        self.image_url = image_url
         self.price = price
         self.address = address
         self.phone = phone
-    
+        self._json = None   # encoded lazily, then reused by every response that includes this business
+
+    @classmethod
+    def from_yelp(cls, obj: dict) -> 'Business':
+        # Join list of address lines to a singular string
+        address = obj['location']['display_address']
+        formatted_address = 'Address not provided'
+        if (address and all(isinstance(ele, str) for ele in address)):
+            formatted_address = '\n'.join(address)
+        return cls(
+            name=obj['name'],
+            categories=obj['categories'],
+            url=obj['url'],
+            image_url=obj['image_url'],
+            price=obj.get('price', ''),    # not every business has a price
+            address=formatted_address,
+            phone=obj['phone'],
+            id=obj['id'])
+
+    def to_dict(self) -> dict:
+        return { field: getattr(self, field) for field in self.FIELDS }
+
+    def to_json(self) -> bytes:
+        if self._json is None:
+            # orjson hands back bytes w/ a ~4 KiB allocation behind them - copy them down to size before caching
+            self._json = bytes(memoryview(dumps(self.to_dict())))
+        return self._json
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Business):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"Business(id={self.id!r}, name={self.name!r})"
+
     def __str__(self):
         return (
             "name: " + self.name + '\n' +
@@ -36,9 +80,33 @@ class Business:
         )
 
 
+def merge_businesses(per_category: list[list[Business]], num_results: int) -> list[Business]:
+    """fairly interleaves each category's results, dropping businesses already seen under another category"""
+    seen, merged = set(), []
+    for business in chain.from_iterable(zip_longest(*per_category)):
+        if business is None or business.id in seen:
+            continue
+        seen.add(business.id)
+        merged.append(business)
+        if len(merged) == num_results:
+            break
+    return merged
+
+
+class IncompleteResults(list):
+    """businesses from a search missing at least one failed request (empty for search's own error fallback) - never cached"""
+
+
 class FusionRepository(Repository[Business]):
-    def __init__(self):
+    def __init__(self, cache: SearchCache=None, http: HttpClient=None, fan_out: bool=FAN_OUT, max_workers: int=FAN_OUT_WORKERS, api_url: str=FUSION_API_URL, image_proxy_url: str=IMAGE_PROXY_URL):
         self.headers = fusion_header
+        self.endpoint = api_url.rstrip('/') + SEARCH_PATH
+        self.image_proxy_url = image_proxy_url
+        self.cache = cache if cache is not None else SearchCache()
+        self.http = http if http is not None else HttpClient()
+        self.flight = SingleFlight()
+        self.fan_out = fan_out
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fusion-search')
     
     def add(self, **kwargs: object) -> None:
         return NotImplementedError
@@ -46,7 +114,49 @@ class FusionRepository(Repository[Business]):
     def get(self, email: str) -> Business:
         return NotImplementedError
     
-    def get_all(self, geolocation: dict, categories: list[str], price: int, num_results: int, radius: int) -> list[Business]:
+    def get_all(self, geolocation: dict, categories: list[str], price: int, num_results: int, radius: int, fan_out: bool=None) -> list[Business]:
+        fan_out = self.fan_out if fan_out is None else fan_out
+
+        # Repeat searches (same neighborhood + preferences) are served from the cache instead of Yelp
+        key = make_search_key(geolocation, categories, price, num_results, radius, fan_out=fan_out)
+        businesses = self.cache.get(key)
+        if businesses is None:
+            # Identical searches arriving while one is in flight share its result
+            search = self.fan_out_search if fan_out else self.search
+            businesses = self.flight.do(key, self._search_and_cache, key, search, geolocation, categories, price, num_results, radius)
+        return list(businesses)
+
+    def _search_and_cache(self, key: tuple, search, *args: object) -> list[Business]:
+        businesses = search(*args)
+        if businesses and not isinstance(businesses, IncompleteResults):  # Don't cache failed, partial or empty searches
+            self.cache.put(key, businesses)
+        return businesses
+
+    def fan_out_search(self, geolocation: dict, categories: list[str], price: int, num_results: int, radius: int) -> list[Business]:
+        """
+        Searches every category (and every page needed to fill the deck) concurrently, then merges the results
+        round-robin across categories so that rarer categories aren't crowded out by popular ones
+        """
+        categories = categories if categories else [None]  # None -> a single, uncategorized search
+        if len(categories) == 1 and num_results <= PAGE_SIZE:
+            return self.search(geolocation, categories if categories[0] else [], price, num_results, radius)
+
+        pages = [(offset, min(PAGE_SIZE, num_results - offset))
+                 for offset in range(0, min(num_results, MAX_SEARCH_DEPTH), PAGE_SIZE)]
+        futures = {
+            category: [self.executor.submit(self.search, geolocation, [category] if category else [], price, limit, radius, offset)
+                       for offset, limit in pages]
+            for category in categories
+        }
+        # Pages of the same category are concatenated in order, then categories are interleaved
+        pages = [[future.result() for future in category_futures] for category_futures in futures.values()]
+        per_category = [list(chain.from_iterable(category_pages)) for category_pages in pages]
+        merged = merge_businesses(per_category, num_results)
+        if any(isinstance(page, IncompleteResults) for page in chain.from_iterable(pages)):
+            return IncompleteResults(merged)    # still worth serving, but a retry may fill the gap
+        return merged
+
+    def search(self, geolocation: dict, categories: list[str], price: int, num_results: int, radius: int, offset: int=0) -> list[Business]:
         latitude, longitude = geolocation['latitude'], geolocation['longitude']
 
         # build the query url
@@ -55,36 +165,33 @@ class FusionRepository(Repository[Business]):
         formatted_location = f'&latitude={latitude}&longitude={longitude}'
         formatted_radius = f'&radius={radius}'
         formatted_limiter = f'&sort_by=best_match&limit={num_results}'
-        formatted_url = ENDPOINT + formatted_cats + formatted_price + formatted_location + formatted_radius + formatted_limiter
+        if offset:
+            formatted_limiter += f'&offset={offset}'
+        formatted_url = self.endpoint + formatted_cats + formatted_price + formatted_location + formatted_radius + formatted_limiter
         # catch exceptions
         try:
-            r = requests.get(formatted_url, headers=self.headers)
-        except requests.exceptions.RequestException as e:
+            r = self.http.get(formatted_url, headers=self.headers)
+        except requests.exceptions.RequestException as e:  # includes CircuitOpenError
             print(e)
-            return []
+            return IncompleteResults()
+        if r.status_code != 200:
+            print("WARNING: fusion search failed with status", r.status_code)
+            return IncompleteResults()
 
         # extract businesses from json object, and convert objects into Business class
-        r = r.json()['businesses']
-        businesses = []
-        for obj in r:
-            # Join list of address lines to a singular string
-            address = obj['location']['display_address']
-            formatted_address = 'Address not provided'
-            if (address and all(isinstance(ele, str) for ele in address)):
-                formatted_address = '\n'.join(address)
-            data = {
-                'name': obj['name'],
-                'categories': obj['categories'], 
-                'url': obj['url'],
-                'image_url': obj['image_url'],
-                'price': obj['price'], 
-                'address': formatted_address,
-                'phone': obj['phone'], 
-            }  
-            businesses.append(Business(**data))
-        
+        businesses = [Business.from_yelp(obj) for obj in r.json()['businesses']]
+        if self.image_proxy_url:    # serve card images through our own cache instead of Yelp's CDN
+            for business in businesses:
+                business.image_url = proxy_image_url(business.image_url, self.image_proxy_url)
         return businesses
     
+    def stats(self) -> dict:
+        return {
+            "cache": self.cache.stats(),
+            "http": self.http.stats(),
+            "single_flight": self.flight.stats(),
+        }
+
     def update(self, email: str, **kwargs: object) -> None:
         return NotImplementedError
     
@@ -0,0 +1,169 @@
+import os
+import time
+import random
+import requests
+from threading import Lock
+from requests.adapters import HTTPAdapter
+from ..cooperative import outbound_slot
+
+# Defaults can be overridden through the environment (see .env)
+DEFAULT_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", 4))     # number of hosts kept alive
+DEFAULT_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", 16))            # connections per host
+DEFAULT_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 3.05))
+DEFAULT_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", 10))
+DEFAULT_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", 2))
+DEFAULT_BACKOFF_BASE = float(os.environ.get("HTTP_BACKOFF_BASE", 0.2))         # seconds
+DEFAULT_BACKOFF_CAP = float(os.environ.get("HTTP_BACKOFF_CAP", 2))             # seconds
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """raised instead of calling upstream while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Trips OPEN after `failure_threshold` consecutive failures, then fails fast until `reset_timeout` passes.
+    One trial request is let through while HALF_OPEN; its outcome closes or re-opens the circuit
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30, clock=time.monotonic) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+
+        self._lock = Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.consecutive_failures = 0
+        self.rejected = 0
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            self._refresh()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._trial_in_flight = False
+            self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self._state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.trips += 1
+                self._state = OPEN
+                self._opened_at = self.clock()
+            self._trial_in_flight = False
+
+    def release(self) -> None:
+        """gives back a HALF_OPEN trial that ended w/o an upstream outcome, so the next request can take it"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "rejected": self.rejected,
+            "trips": self.trips,
+        }
+
+    def _refresh(self) -> None:
+        if self._state == OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._trial_in_flight = False
+
+
+class HttpClient:
+    """Shared keep-alive session w/ bounded connection pools, timeouts, jittered retries and a circuit breaker"""
+    def __init__(self,
+                 pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_base: float = DEFAULT_BACKOFF_BASE,
+                 backoff_cap: float = DEFAULT_BACKOFF_CAP,
+                 breaker: CircuitBreaker = None,
+                 sleep=time.sleep) -> None:
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.sleep = sleep
+        self.requests = 0
+        self.retries = 0
+
+        # pool_block caps concurrent connections per host instead of opening throwaway ones
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=True)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, url: str, **kwargs: object) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs: object) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"circuit open, refusing {method} {url}")
+            self.requests += 1
+            try:
+                with outbound_slot():
+                    response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+            except requests.exceptions.RequestException:
+                # Not worth retrying (bad URL, too many redirects...), but still settles a HALF_OPEN trial
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                self.breaker.release()
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    self.breaker.record_success()
+                    return response
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    return response
+                response.close()
+            self.retries += 1
+            self.sleep(self.backoff(attempt))
+
+    def backoff(self, attempt: int) -> float:
+        """exponential backoff w/ full jitter"""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "breaker": self.breaker.stats(),
+        }
+
+    def close(self) -> None:
+        self.session.close()
@@ -0,0 +1,16 @@
+from .lobby_repository import LobbyRepository
+from .memory_lobby_repository import MemoryLobbyRepository
+from .redis_lobby_repository import RedisLobbyRepository
+
+# Config.LOBBY_BACKEND -> Repository[Lobby] implementation, all held to the same contract (see test_lobby_backends.py)
+LOBBY_BACKENDS = {
+    "dynamodb": LobbyRepository,
+    "redis": RedisLobbyRepository,
+    "memory": MemoryLobbyRepository,
+}
+
+
+def create_lobby_repository(backend: str = "dynamodb", **kwargs: object) -> LobbyRepository:
+    if backend not in LOBBY_BACKENDS:
+        raise ValueError(f"Unknown lobby backend '{backend}', expected one of {', '.join(LOBBY_BACKENDS)}")
+    return LOBBY_BACKENDS[backend](**kwargs)
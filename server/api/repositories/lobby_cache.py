@@ -0,0 +1,65 @@
+import os
+import time
+from copy import deepcopy
+from .search_cache import SearchCache
+from .single_flight import SingleFlight
+
+# Defaults can be overridden through the environment (see .env)
+LOBBY_CACHE_TTL = float(os.environ.get("LOBBY_CACHE_TTL", 2))     # seconds, only bounds staleness across workers
+LOBBY_CACHE_MAX_ENTRIES = int(os.environ.get("LOBBY_CACHE_MAX_ENTRIES", 1024))
+LOBBY_CACHE_MAX_BYTES = int(os.environ.get("LOBBY_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+VERSION_STRIPES = 1024
+
+
+class LobbyCache(SearchCache):
+    """
+    Short-lived read-through cache of Lobby objects (keyed by lobby_ID) and single lobby attributes
+    (keyed by (lobby_ID, attribute)), all dropped together when the lobby is invalidated.
+    Callers get their own copy (routes mutate lobbies in place), concurrent misses for a lobby share one read,
+    and a read that races an invalidation is never stored
+    """
+    def __init__(self,
+                 ttl: float = LOBBY_CACHE_TTL,
+                 max_entries: int = LOBBY_CACHE_MAX_ENTRIES,
+                 max_bytes: int = LOBBY_CACHE_MAX_BYTES,
+                 clock=time.monotonic) -> None:
+        super().__init__(ttl=ttl, max_entries=max_entries, max_bytes=max_bytes, clock=clock)
+        self.flight = SingleFlight()
+        self.invalidations = 0
+        # Bumped on every invalidation; striped so the table stays bounded no matter how many lobbies come and go
+        self._versions = [0] * VERSION_STRIPES
+        self._attributes = set()     # attribute names cached so far, at most the Lobby fields
+
+    def get_or_load(self, lobby_ID: str, load, attribute: str = None) -> object:
+        """cached copy of the lobby (or one of its attributes), or load(lobby_ID) on a miss (None isn't cached)"""
+        key = lobby_ID if attribute is None else (lobby_ID, attribute)
+        value = self.get(key)
+        if value is not None:
+            return deepcopy(value)
+        version = self._version(lobby_ID)
+        # Keyed by version, so a reader that just wrote never joins a read that started before its write
+        value = self.flight.do((key, version), load, lobby_ID)
+        if value is not None:
+            with self._lock:
+                if self._version(lobby_ID) == version:
+                    self.put(key, value)
+                    if attribute is not None:
+                        self._attributes.add(attribute)
+        return deepcopy(value)
+
+    def invalidate(self, lobby_ID: str) -> None:
+        with self._lock:
+            self._versions[hash(lobby_ID) % VERSION_STRIPES] += 1
+            self.invalidations += 1
+            super().invalidate(lobby_ID)
+            for attribute in self._attributes:
+                super().invalidate((lobby_ID, attribute))
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["invalidations"] = self.invalidations
+        stats["coalesced"] = self.flight.coalesced
+        return stats
+
+    def _version(self, lobby_ID: str) -> int:
+        return self._versions[hash(lobby_ID) % VERSION_STRIPES]
@@ -1,13 +1,37 @@
+import os
+import json
 import boto3
+import random
+import zlib
+import time
+import hashlib
 from uuid import uuid4
 from datetime import datetime, timezone
+from copy import deepcopy
+from functools import cached_property
 from dataclasses import dataclass
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import Key, Attr
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError
+from ..cooperative import MAX_OUTBOUND_CONCURRENCY, OutboundLimited, outbound_slot
+from ..serialization import dumps, loads
 from .repository import Repository
+from .lobby_cache import LobbyCache
+from .search_cache import SearchCache
 from .templates.lobby_table_template import LobbyTableTemplate
+from .templates.deck_table_template import DeckTableTemplate
 
 TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+MAXIMUM_LOBBY_AGE = 1800    # 1800s = 30min
+# Expired lobbies are only swept once they're this far past expires_at; until then create-lobby may reuse their IDs
+LOBBY_SWEEP_GRACE = int(os.environ.get("LOBBY_SWEEP_GRACE", 600))
+# 0 keeps every vote in the lobby item; N > 0 spreads ballots over N "<lobby_ID>#votes#<k>" items in the same table
+VOTE_SHARDS = int(os.environ.get("VOTE_SHARDS", 0))
+BATCH_WRITE_LIMIT = 25     # items per BatchWriteItem
+BATCH_GET_LIMIT = 100    # keys per BatchGetItem
+# Decks are immutable (keyed by content hash), so a worker can keep the ones its lobbies use for their whole lifetime
+DECK_CACHE_MAX_ENTRIES = int(os.environ.get("DECK_CACHE_MAX_ENTRIES", 256))
+DECK_CACHE_MAX_BYTES = int(os.environ.get("DECK_CACHE_MAX_BYTES", 16 * 1024 * 1024))
 DEFAULT_PREFERENCES = {
     "coordinates": {
         "latitude": 91,
@@ -19,6 +43,113 @@ DEFAULT_PREFERENCES = {
     "priceRange": "$"
 }
 
+class _LobbyNotFound:
+    def __repr__(self) -> str:
+        return 'LOBBY_NOT_FOUND'
+
+# Returned by conditional (must_exist=True) writes when the lobby doesn't exist, distinct from a None "no attributes" result
+LOBBY_NOT_FOUND = _LobbyNotFound()
+LOBBY_EXISTS = "attribute_exists(lobby_ID)"
+VERSION_BUMP = "version :version_step"
+
+# Stored attributes that routes only see converted (see _lobby_item), and what each needs projected alongside it
+DERIVED_ATTRIBUTES = {
+    'businesses': ['businesses_ref'],
+    'categories': ['category_order'],
+}
+
+MAX_EXPRESSION_BYTES = 4096    # DynamoDB's limit on the length of an UpdateExpression
+
+def vote_update_expressions(votes: list, max_bytes: int = MAX_EXPRESSION_BYTES) -> list[tuple[str, dict]]:
+    """
+    Folds a ballot into as few "SET votes[i] = if_not_exists(votes[i], :zero) + :vi, ..." expressions as fit
+    under max_bytes, returned as (UpdateExpression, ExpressionAttributeValues) pairs in index order
+    """
+    chunks, clauses, values = [], [], { ':zero': 0 }
+    length = len("SET ")
+    for i, vote in enumerate(votes):
+        clause = f"votes[{i}] = if_not_exists(votes[{i}], :zero) + :v{i}"
+        if clauses and length + len(", ") + len(clause) > max_bytes:
+            chunks.append(("SET " + ", ".join(clauses), values))
+            clauses, values, length = [], { ':zero': 0 }, len("SET ")
+        length += len(clause) + (len(", ") if clauses else 0)
+        clauses.append(clause)
+        values[f':v{i}'] = vote
+    if clauses:
+        chunks.append(("SET " + ", ".join(clauses), values))
+    return chunks
+
+def versioned(expression: str) -> str:
+    """an UpdateExpression that also bumps the lobby's version (an expression holds at most one ADD clause)"""
+    if expression.startswith("ADD "):
+        return expression.replace("ADD ", f"ADD {VERSION_BUMP}, ", 1)
+    if " ADD " in expression:
+        return expression.replace(" ADD ", f" ADD {VERSION_BUMP}, ", 1)
+    return f"{expression} ADD {VERSION_BUMP}"
+
+def is_expired(expires_at: int, grace: int = 0, now: int = None) -> bool:
+    return (int(time.time()) if now is None else now) >= expires_at + grace
+
+def is_reusable(expires_at: int, grace: int = LOBBY_SWEEP_GRACE, now: int = None) -> bool:
+    """
+    Expired lobby IDs can be handed out again until the sweeper may delete them (after the grace period),
+    never both at once - the sweeper's batch deletes can't be conditional
+    """
+    return expires_at is not None and is_expired(expires_at, now=now) and not is_expired(expires_at, grace, now)
+
+def expiry_from_timestamp(timestamp: str) -> int:
+    """epoch seconds at which a lobby created/refreshed at `timestamp` expires"""
+    start = datetime.strptime(timestamp, TIME_FORMAT).replace(tzinfo=timezone.utc)
+    return int(start.timestamp()) + MAXIMUM_LOBBY_AGE
+
+def transition_changes(to_phase: str, joinable: bool = None, timestamp: str = None) -> dict:
+    """the attributes a phase transition writes (a new timestamp also moves the lobby's expiry)"""
+    changes = { 'phase': to_phase }
+    if joinable is not None:
+        changes['joinable'] = joinable
+    if timestamp is not None:
+        changes.update(timestamp=timestamp, expires_at=expiry_from_timestamp(timestamp))
+    return changes
+
+def sessions_map(sessions: list) -> dict:
+    """
+    stored form of a sessions list: entries keyed by session_ID, so joins/leaves/updates address one player.
+    joined_at is a time_ns() stamp like add_session's, offset by list position so the list's order survives
+    """
+    base = time.time_ns()
+    return { entry['session_info']['session_ID']: { **entry, 'joined_at': base + i } for i, entry in enumerate(sessions) }
+
+def sessions_list(sessions: dict) -> list:
+    """the [{ session_info, is_finished }, ...] shape routes (and clients) use, in join order"""
+    if isinstance(sessions, list):    # stored before sessions became a map
+        return sessions
+    entries = sorted(sessions.values(), key=lambda entry: entry.get('joined_at', 0))
+    return [{ 'session_info': entry['session_info'], 'is_finished': entry['is_finished'] } for entry in entries]
+
+def category_member(session: dict) -> str:
+    """a session_info as a string set member (keys sorted, so equal sessions always encode the same)"""
+    return json.dumps(session, sort_keys=True, separators=(',', ':'))
+
+def categories_map(categories: list) -> tuple[dict, dict]:
+    """
+    stored form of a categories list: category -> string set of member sessions, so one ADD/DELETE joins or leaves
+    a category, plus category -> position (sets and maps are unordered)
+    """
+    chosen = [category for category in categories if category['sessions']]     # DynamoDB sets can't be empty
+    return ({ category['category']: { category_member(session) for session in category['sessions'] } for category in chosen },
+            { category['category']: i for i, category in enumerate(chosen) })
+
+def categories_list(categories: dict, order: dict) -> list:
+    """the [{ category, sessions }, ...] shape routes (and clients) use, in the order categories were first chosen"""
+    if isinstance(categories, list):    # stored before categories became a map
+        return categories
+    return [{ 'category': name, 'sessions': [json.loads(member) for member in sorted(categories[name])] }
+            for name in sorted(categories, key=lambda name: order.get(name, 0))]
+
+def deck_ID(deck: bytes) -> str:
+    """content address of an encoded deck, so identical searches share one stored copy"""
+    return hashlib.sha256(deck).hexdigest()
+
 @dataclass 
 class Lobby:
     lobby_ID: str
@@ -31,6 +162,8 @@ class Lobby:
     categories: list
     businesses: list
     votes: list
+    expires_at: int
+    version: int
 
     def __init__(self, 
                  lobby_ID: str, 
@@ -42,7 +175,9 @@ class Lobby:
                  preferences: dict = DEFAULT_PREFERENCES,
                  categories: list = [],
                  businesses: list = [],
-                 votes: list = []):
+                 votes: list = [],
+                 expires_at: int = None,
+                 version: int = None):
         self.lobby_ID = lobby_ID
         self.host = host
         # JavaScript UTC Date format - cannot use default parameter value here b/c the datetime object will be old
@@ -54,46 +189,115 @@ class Lobby:
         self.categories = categories
         self.businesses = businesses
         self.votes = votes
+        # Epoch seconds, LobbyTable's TTL attribute (derived from the timestamp for lobbies stored before it existed)
+        self.expires_at = int(expires_at) if expires_at else expiry_from_timestamp(self.timestamp)
+        # Bumped by every write. New lobbies start at their creation time in ms, so a reused ID never repeats a version
+        self.version = int(version) if version is not None else time.time_ns() // 1_000_000
 
 class LobbyRepository(Repository[Lobby]):
-    def __init__(self) -> None:
-        self.dynamodb = boto3.resource('dynamodb')
-        self.dynamodb_client = boto3.client('dynamodb')
-        self.table = self.create_table()
+    def __init__(self, vote_shards: int = VOTE_SHARDS, cache: LobbyCache = None) -> None:
+        self.vote_shards = vote_shards
+        # Every mutation below invalidates its lobby, so reads only go stale across workers (bounded by the TTL)
+        self.cache = cache if cache is not None else LobbyCache()
+        self.decks = SearchCache(ttl=MAXIMUM_LOBBY_AGE, max_entries=DECK_CACHE_MAX_ENTRIES, max_bytes=DECK_CACHE_MAX_BYTES)
+
+    # boto3 resources/clients/tables are only built on first use, so creating the repository (and the app) stays cheap.
+    # Tables are never created implicitly - see create_tables() and 'flask create-tables'
+    @cached_property
+    def dynamodb(self):
+        return boto3.resource('dynamodb', config=BotoConfig(max_pool_connections=MAX_OUTBOUND_CONCURRENCY))
+
+    @cached_property
+    def dynamodb_client(self):
+        return boto3.client('dynamodb', config=BotoConfig(max_pool_connections=MAX_OUTBOUND_CONCURRENCY))
+
+    @cached_property
+    def table(self):
+        # Every table call holds an outbound slot, so DynamoDB can't starve the worker's concurrency budget
+        return OutboundLimited(self.dynamodb.Table('LobbyTable'))
+
+    @cached_property
+    def deck_table(self):
+        # Business decks live out of line, zlib-compressed and keyed by content hash; lobbies only hold a businesses_ref
+        return OutboundLimited(self.dynamodb.Table('DeckTable'))
+
+    def create_tables(self) -> None:
+        """creates LobbyTable and DeckTable (w/ TTL enabled) and waits until they exist, skipping any that already do"""
+        self.create_table('LobbyTable', LobbyTableTemplate)
+        self.create_table('DeckTable', DeckTableTemplate)
         
-    def create_table(self):
+    def create_table(self, name: str = 'LobbyTable', template: type = LobbyTableTemplate):
         try:
             table = self.dynamodb.create_table(
-                TableName = 'LobbyTable',
-                KeySchema = LobbyTableTemplate.KeySchema,
-                AttributeDefinitions = LobbyTableTemplate.AttributeDefinitions,
-                ProvisionedThroughput = LobbyTableTemplate.ProvisionedThroughput
+                TableName = name,
+                KeySchema = template.KeySchema,
+                AttributeDefinitions = template.AttributeDefinitions,
+                ProvisionedThroughput = template.ProvisionedThroughput
             )
             # Wait until the table exists.
             table.wait_until_exists()
+            self.dynamodb_client.update_time_to_live(
+                TableName = name,
+                TimeToLiveSpecification = template.TimeToLiveSpecification
+            )
             return table
         except ClientError as error:
             if error.response['Error']['Code'] == 'ResourceInUseException':
-                return self.dynamodb.Table('LobbyTable')
+                return self.dynamodb.Table(name)
             else:
                 print("WARNING: error", error.response['Error']['Code'])    
 
     def add(self, **kwargs: object) -> None:
+        self._put(kwargs)
+
+    def claim(self, lobby: Lobby, now: int = None, grace: int = LOBBY_SWEEP_GRACE) -> bool:
+        """
+        Stores a new lobby only if its ID is free (or holds a reusable expired lobby) - one conditional put,
+        so two creators can never both end up w/ the same ID. Returns False if the ID is taken
+        """
+        now = int(time.time()) if now is None else now
+        try:
+            self._put(vars(lobby),
+                ConditionExpression="attribute_not_exists(lobby_ID) OR expires_at BETWEEN :reusable_from AND :now",
+                ExpressionAttributeValues={
+                    ':reusable_from': now - grace + 1,
+                    ':now': now,
+                },
+            )
+        except ClientError as error:
+            if error.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+        return True
+
+    def _put(self, kwargs: dict, **conditions: object) -> None:
         item = {
             'lobby_ID': kwargs['lobby_ID'],
             'host': kwargs['host'],
             'timestamp': kwargs['timestamp'],
             'joinable': kwargs['joinable'],
             'phase': kwargs['phase'],
-            'sessions':  kwargs['sessions'],
+            'sessions': sessions_map(kwargs['sessions']),
             'preferences': kwargs['preferences'],
-            'categories': kwargs['categories'],
-            'businesses': kwargs['businesses'],
             'votes': kwargs['votes'],
+            'expires_at': kwargs['expires_at'],
+            'version': kwargs['version'],
         }
-        self.table.put_item(Item=item)
+        item['categories'], item['category_order'] = categories_map(kwargs['categories'])
+        if kwargs['businesses']:
+            item['businesses_ref'] = self.put_deck(kwargs['businesses'], kwargs['expires_at'])
+        try:
+            self.table.put_item(Item=item, **conditions)
+        finally:
+            self.cache.invalidate(kwargs['lobby_ID'])
+
+    def get(self, lobby_ID: str, use_cache: bool = True) -> Lobby:
+        """use_cache=False for read-modify-write callers, which need the latest item"""
+        if not use_cache:
+            return self._get(lobby_ID)
+        return self.cache.get_or_load(lobby_ID, self._get)
 
-    def get(self, lobby_ID: str) -> Lobby:
+    def _get(self, lobby_ID: str) -> Lobby:
         response = self.table.get_item(
             Key={ 'lobby_ID': lobby_ID }
         )
@@ -106,12 +310,46 @@ class LobbyRepository(Repository[Lobby]):
             timestamp=item['timestamp'],
             joinable=item['joinable'],
             phase=item['phase'],
-            sessions=item['sessions'],
+            sessions=sessions_list(item['sessions']),
             preferences=item['preferences'],
-            categories=item['categories'],
-            businesses=item['businesses'],
-            votes=item['votes'])
+            categories=categories_list(item['categories'], item.get('category_order', {})),
+            businesses=self._businesses(item),
+            votes=item['votes'],
+            expires_at=item.get('expires_at'),
+            version=item.get('version', 0))
     
+    def get_attributes(self, lobby_ID: str, attributes: list[str], consistent: bool = False) -> dict:
+        """
+        Just the named top-level attributes of a lobby, or None if it doesn't exist. Served from the lobby cache when
+        possible, otherwise through a projected GetItem, so polls don't pay to read the businesses/categories lists
+        """
+        if not consistent:
+            lobby = self.cache.get(lobby_ID)
+            if lobby is not None:
+                return deepcopy({ name: getattr(lobby, name) for name in attributes })
+        projected = ['lobby_ID'] + attributes + [name for attribute in attributes for name in DERIVED_ATTRIBUTES.get(attribute, [])]
+        names = { f'#a{i}': name for i, name in enumerate(projected) }   # placeholders dodge reserved words
+        response = self.table.get_item(
+            Key={ 'lobby_ID': lobby_ID },
+            ProjectionExpression=', '.join(names),
+            ExpressionAttributeNames=names,
+            ConsistentRead=consistent,
+        )
+        if 'Item' not in response:
+            return None
+        item = self._lobby_item(response['Item'])
+        if 'businesses' in attributes:
+            item['businesses'] = self._businesses(item)
+        return { name: item.get(name) for name in attributes }
+
+    def get_attribute(self, lobby_ID: str, attribute: str, consistent: bool = False) -> object:
+        """a single attribute of a lobby, or LOBBY_NOT_FOUND. Cached like full lobbies, so a burst of polls costs one read"""
+        if consistent:
+            attributes = self.get_attributes(lobby_ID, [attribute], consistent=True)
+        else:
+            attributes = self.cache.get_or_load(lobby_ID, lambda lobby_ID: self.get_attributes(lobby_ID, [attribute]), attribute)
+        return LOBBY_NOT_FOUND if attributes is None else attributes[attribute]
+
     # NOTE: Expensive operation, should never (need to) call this
     def get_all(self) -> list[Lobby]:
         return NotImplementedError
@@ -121,142 +359,380 @@ class LobbyRepository(Repository[Lobby]):
         return NotImplementedError
     
     # TODO: Update method return types
-    def update_joinable(self, lobby_ID: str, joinable: bool) -> None:
-        response = self.table.update_item(
-            Key={
-                'lobby_ID': lobby_ID,
-            },
+    def update_joinable(self, lobby_ID: str, joinable: bool, must_exist: bool = False) -> None:
+        return self._update(lobby_ID, must_exist,
             UpdateExpression="SET joinable = :joinable",
             ExpressionAttributeValues={':joinable': joinable},
         )
-        return response["Attributes"] if "Attributes" in response else None
 
-    def update_host(self, lobby_ID: str, host: dict) -> None:
-        response = self.table.update_item(
-            Key={
-                'lobby_ID': lobby_ID,
-            },
+    def update_host(self, lobby_ID: str, host: dict, must_exist: bool = False) -> None:
+        return self._update(lobby_ID, must_exist,
             UpdateExpression="SET host = :host",
             ExpressionAttributeValues={':host': host},
         )
-        return response["Attributes"] if "Attributes" in response else None
     
-    def update_preferences(self, lobby_ID: str, preferences: dict) -> None:
-        response = self.table.update_item(
-            Key={
-                'lobby_ID': lobby_ID,
-            },
+    def update_preferences(self, lobby_ID: str, preferences: dict, must_exist: bool = False, return_values: str = 'NONE') -> None:
+        response = self._update(lobby_ID, must_exist,
             UpdateExpression="SET preferences = :preferences",
             ExpressionAttributeValues={':preferences': preferences},
+            ReturnValues=return_values,
         )
-        return response["Attributes"] if "Attributes" in response else None
+        return self._lobby_item(response) if isinstance(response, dict) else response
 
     def add_session(self, lobby_ID: str, session: dict) -> None:
-        lobby = self.get(lobby_ID=lobby_ID)
-        if lobby:
-            for cur in lobby.sessions:
-                session_info = cur["session_info"]
-                if session_info == session:
-                    return None
-        response = self.table.update_item(
-            Key={
-                'lobby_ID': lobby_ID,
-            },
-            UpdateExpression="SET sessions = list_append(sessions, :session)",
-            ExpressionAttributeValues={':session': [{
+        """joins a session in one write (no-op if it already joined), or LOBBY_NOT_FOUND"""
+        return self._update(lobby_ID, True,
+            UpdateExpression="SET sessions.#session = if_not_exists(sessions.#session, :entry)",
+            ExpressionAttributeNames={'#session': session['session_ID']},
+            ExpressionAttributeValues={':entry': {
                 "session_info": session,
-                "is_finished": False
-            }]})
-        return response["Attributes"] if "Attributes" in response else None
+                "is_finished": False,
+                "joined_at": time.time_ns(),
+            }})
     
     def remove_sessions(self, lobby_ID: str, session: dict) -> None:
-        lobby = self.get(lobby_ID=lobby_ID)
-        if lobby:
-            for i, cur in enumerate(lobby.sessions):
-                session_info = cur["session_info"]
-                if session_info == session:
-                    response = self.table.update_item(
-                        Key={
-                            'lobby_ID': lobby_ID,
-                        },
-                        UpdateExpression=f"REMOVE sessions[{i}]")
-                    return response["Attributes"] if "Attributes" in response else None
-        return None
+        """removes exactly this session by ID, whatever else joined or left meanwhile, or LOBBY_NOT_FOUND"""
+        return self._update(lobby_ID, True,
+            UpdateExpression="REMOVE sessions.#session",
+            ExpressionAttributeNames={'#session': session['session_ID']},
+        )
     
-    def update_sessions(self, lobby_ID: str, i: int, new_session: dict, is_finished: bool) -> None:
-        response = self.table.update_item(
-            Key={
-                'lobby_ID': lobby_ID,
-            },
-            UpdateExpression=f"SET sessions[{i}] = :session",
-            ExpressionAttributeValues={':session': {
-                "session_info": new_session,
-                "is_finished": is_finished
-            }},
+    def update_session(self, lobby_ID: str, session: dict, is_finished: bool) -> list:
+        """
+        Updates a joined session in one write and returns the lobby's sessions afterwards,
+        or LOBBY_NOT_FOUND if the lobby doesn't exist or the session never joined it
+        """
+        response = self._update(lobby_ID, False,
+            UpdateExpression="SET sessions.#session.session_info = :session, sessions.#session.is_finished = :is_finished",
+            ConditionExpression="attribute_exists(sessions.#session)",
+            ExpressionAttributeNames={'#session': session['session_ID']},
+            ExpressionAttributeValues={':session': session, ':is_finished': is_finished},
+            ReturnValues='ALL_NEW',
         )
-        return response["Attributes"] if "Attributes" in response else None
+        return response if response is LOBBY_NOT_FOUND else self._lobby_item(response)['sessions']
     
-    def update_timestamp(self, lobby_ID: str, timestamp: str) -> None:
-        response = self.table.update_item(
-            Key={
-                'lobby_ID': lobby_ID,
-            },
-            UpdateExpression="SET #timestamp = :timestamp",
+    def update_timestamp(self, lobby_ID: str, timestamp: str, must_exist: bool = False) -> None:
+        response = self._update(lobby_ID, must_exist,
+            UpdateExpression="SET #timestamp = :timestamp, expires_at = :expires_at",
             ExpressionAttributeNames = { "#timestamp" : 'timestamp' },
-            ExpressionAttributeValues={':timestamp': timestamp},
+            ExpressionAttributeValues={
+                ':timestamp': timestamp,
+                ':expires_at': expiry_from_timestamp(timestamp),
+            },
+            ReturnValues='ALL_NEW',
         )
-        return response["Attributes"] if "Attributes" in response else None
+        if response is LOBBY_NOT_FOUND:
+            return response
+        self._extend_out_of_line(lobby_ID, response)
     
-    def update_categories(self, lobby_ID: str, categories: list) -> None:
-        response = self.table.update_item(
-            Key={
-                'lobby_ID': lobby_ID,
-            },
-            UpdateExpression="SET categories = :categories",
-            ExpressionAttributeValues={':categories': categories},
+    def update_categories(self, lobby_ID: str, categories: list, must_exist: bool = False) -> None:
+        members, order = categories_map(categories)
+        return self._update(lobby_ID, must_exist,
+            UpdateExpression="SET categories = :categories, category_order = :order",
+            ExpressionAttributeValues={':categories': members, ':order': order},
         )
-        return response["Attributes"] if "Attributes" in response else None
+
+    def add_category(self, lobby_ID: str, category: str, session: dict) -> tuple[dict, bool]:
+        """
+        Adds a session to a category (creating it if nobody had chosen it) in one atomic write. Returns the updated
+        lobby attributes and whether the category is new, or LOBBY_NOT_FOUND
+        """
+        chosen_at = time.time_ns()
+        response = self._update(lobby_ID, True,
+            UpdateExpression="ADD categories.#category :member SET category_order.#category = if_not_exists(category_order.#category, :chosen_at)",
+            ExpressionAttributeNames={'#category': category},
+            ExpressionAttributeValues={':member': { category_member(session) }, ':chosen_at': chosen_at},
+            ReturnValues='ALL_NEW',
+        )
+        if response is LOBBY_NOT_FOUND:
+            return response
+        return self._lobby_item(response), response['category_order'][category] == chosen_at
+
+    def remove_category(self, lobby_ID: str, category: str, session: dict) -> dict:
+        """
+        Removes a session from a category in one atomic write (the category goes once nobody has it chosen).
+        Returns the updated lobby attributes, or LOBBY_NOT_FOUND if the lobby, category or membership doesn't exist
+        """
+        names = {'#category': category}
+        member = category_member(session)
+        response = self._update(lobby_ID, False,
+            UpdateExpression="DELETE categories.#category :member",
+            ConditionExpression="contains(categories.#category, :session)",
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues={':member': { member }, ':session': member},
+            ReturnValues='ALL_NEW',
+        )
+        if response is LOBBY_NOT_FOUND:
+            return response
+        if category not in response['categories']:    # DynamoDB drops a set once it's empty; forget its position too
+            self._update(lobby_ID, False,     # unless someone chose it again in the meantime
+                UpdateExpression="REMOVE category_order.#category",
+                ConditionExpression="attribute_not_exists(categories.#category)",
+                ExpressionAttributeNames=names,
+            )
+        return self._lobby_item(response)
     
-    def update_businesses(self, lobby_ID: str, businesses: list) -> None:
-        response = self.table.update_item(
-            Key={
-                'lobby_ID': lobby_ID,
-            },
-            UpdateExpression="SET businesses = :businesses",
-            ExpressionAttributeValues={':businesses': businesses},
+    def update_businesses(self, lobby_ID: str, businesses: list, must_exist: bool = False) -> None:
+        """
+        stores the deck before pointing the lobby at it, so the ref never dangles. The deck (and every vote shard)
+        expires no earlier than the lobby, and update_timestamp/transition push them out along w/ it
+        """
+        expires_at = int(time.time()) + MAXIMUM_LOBBY_AGE
+        ref = self.put_deck(businesses, expires_at)
+        response = self._update(lobby_ID, must_exist,
+            UpdateExpression="SET businesses_ref = :ref REMOVE businesses",
+            ExpressionAttributeValues={':ref': ref},
+            ReturnValues='ALL_NEW',
         )
-        return response["Attributes"] if "Attributes" in response else None
+        if response is LOBBY_NOT_FOUND:
+            return response
+        lobby_expires_at = int(response.get('expires_at') or 0)
+        if lobby_expires_at > expires_at:    # a lobby refreshed since it started outlasts the default
+            expires_at = lobby_expires_at
+            self._extend_deck(ref, expires_at)
+        if self.vote_shards:
+            # A new deck starts every shard at zero, so ballots can update list indices in place. Shards expire w/ the
+            # lobby (not before it), so TTL/the sweeper clean them up too
+            self._batch_write([{ 'PutRequest': { 'Item': { 'lobby_ID': key, 'votes': [0] * len(businesses), 'expires_at': expires_at } } }
+                               for key in self.vote_shard_keys(lobby_ID)])
     
-    def update_votes(self, lobby_ID: str, votes: list) -> None:
-        for i, vote in enumerate(votes):
-            response = self.table.update_item(
-                Key={
-                    'lobby_ID': lobby_ID,
-                },
-                UpdateExpression="SET votes[" + str(i) + "] = if_not_exists(votes[" + str(i) + "], :zero) + :vote",
-                ExpressionAttributeValues={
-                    ':zero': 0,
-                    ':vote': vote
+    def update_votes(self, lobby_ID: str, votes: list, must_exist: bool = False, session_ID: str = None) -> None:
+        """
+        adds a whole ballot in one round trip (more only if it outgrows DynamoDB's expression size limit).
+        When sharded, the ballot goes to the session's shard (or a random one), so concurrent voters rarely share an item
+        """
+        key = lobby_ID
+        if self.vote_shards:
+            shard = zlib.crc32(session_ID.encode()) if session_ID else random.randrange(self.vote_shards)
+            key = self.vote_shard_keys(lobby_ID)[shard % self.vote_shards]
+        for expression, values in vote_update_expressions(votes, MAX_EXPRESSION_BYTES - len(f" ADD {VERSION_BUMP}")):
+            response = self._update(key, must_exist,
+                UpdateExpression=expression,
+                ExpressionAttributeValues=values,
+                bump=key == lobby_ID,     # shards aren't lobbies
+            )
+            if response is LOBBY_NOT_FOUND:
+                return response
+
+    def get_votes(self, lobby_ID: str) -> list:
+        """the lobby's tally, summed across its vote shards in one BatchGetItem (None if the lobby doesn't exist)"""
+        if not self.vote_shards:
+            votes = self.get_attribute(lobby_ID, 'votes')
+            return None if votes is LOBBY_NOT_FOUND else votes or []
+
+        keys = [{ 'lobby_ID': key } for key in [lobby_ID] + self.vote_shard_keys(lobby_ID)]
+        request = { self.table.name: { 'Keys': keys, 'ProjectionExpression': 'lobby_ID, votes' } }
+        items = []
+        while request:
+            with outbound_slot():
+                response = self.dynamodb.batch_get_item(RequestItems=request)
+            items += response['Responses'].get(self.table.name, [])
+            request = response.get('UnprocessedKeys')
+        if not any(item['lobby_ID'] == lobby_ID for item in items):
+            return None
+
+        tally = []
+        for item in items:   # includes votes left in the lobby item by an unsharded deployment
+            for i, vote in enumerate(item.get('votes', [])):
+                if i == len(tally):
+                    tally.append(0)
+                tally[i] += vote
+        return tally
+
+    def put_deck(self, businesses: list, expires_at: int = None) -> str:
+        """
+        Stores a compressed deck under its content hash, expiring at expires_at (default: a new lobby's), and returns
+        that ID. The put is conditional on it moving the expiry out, so a deck shared w/ a longer-lived lobby is
+        left alone - same content, later expiry
+        """
+        deck = dumps(businesses)
+        ref = deck_ID(deck)
+        expires_at = int(time.time()) + MAXIMUM_LOBBY_AGE if expires_at is None else int(expires_at)
+        try:
+            self.deck_table.put_item(
+                Item={
+                    'deck_ID': ref,
+                    'deck': zlib.compress(deck),
+                    'expires_at': expires_at,
                 },
+                ConditionExpression="attribute_not_exists(deck_ID) OR expires_at < :expires_at",
+                ExpressionAttributeValues={':expires_at': expires_at},
             )
+        except ClientError as error:
+            if error.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+        self.decks.put(ref, deck)
+        return ref
+
+    def get_deck(self, ref: str) -> list:
+        """a stored deck, decoded afresh on every call (callers may mutate it), or None if it expired"""
+        deck = self.decks.get(ref)
+        if deck is None:
+            response = self.deck_table.get_item(Key={ 'deck_ID': ref })
+            if 'Item' not in response:
+                return None
+            deck = zlib.decompress(response['Item']['deck'].value)
+            self.decks.put(ref, deck)
+        return loads(deck)
+
+    def _extend_deck(self, ref: str, expires_at: int) -> None:
+        """pushes a stored deck's expiry out to expires_at (never in), a no-op if it's gone or already lasts longer"""
+        try:
+            self.deck_table.update_item(
+                Key={ 'deck_ID': ref },
+                UpdateExpression="SET expires_at = :expires_at",
+                ConditionExpression="attribute_exists(deck_ID) AND expires_at < :expires_at",
+                ExpressionAttributeValues={':expires_at': expires_at},
+            )
+        except ClientError as error:
+            if error.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+    def _extend_out_of_line(self, lobby_ID: str, item: dict) -> None:
+        """
+        After a lobby's expiry moved out, moves its deck's and vote shards' along, since neither TTL nor the sweeper
+        knows they belong to it. item is the lobby as written (ALL_NEW)
+        """
+        expires_at = int(item['expires_at'])
+        if 'businesses_ref' in item:
+            self._extend_deck(item['businesses_ref'], expires_at)
+        for key in self.vote_shard_keys(lobby_ID) if self.vote_shards else []:
+            self._update(key, False, bump=False,
+                UpdateExpression="SET expires_at = :expires_at",
+                ConditionExpression="attribute_exists(lobby_ID) AND expires_at < :expires_at",
+                ExpressionAttributeValues={':expires_at': expires_at},
+            )
+
+    def _lobby_item(self, item: dict) -> dict:
+        """converts a raw (possibly projected) lobby item's sessions and categories to the shapes routes use"""
+        if 'sessions' in item:
+            item['sessions'] = sessions_list(item['sessions'])
+        if 'categories' in item:
+            item['categories'] = categories_list(item['categories'], item.get('category_order', {}))
+        return item
+
+    def _businesses(self, item: dict) -> list:
+        if 'businesses_ref' in item:
+            return self.get_deck(item['businesses_ref']) or []
+        return item.get('businesses', [])     # stored inline, before decks moved out of line
+
+    def vote_shard_keys(self, lobby_ID: str) -> list[str]:
+        return [f'{lobby_ID}#votes#{k}' for k in range(self.vote_shards)]
 
     # Possible phases: lobby, categories, swiping, and results
-    def update_phase(self, lobby_ID: str, phase: str) -> None:
-        response = self.table.update_item(
-            Key={
-                'lobby_ID': lobby_ID,
-            },
+    def update_phase(self, lobby_ID: str, phase: str, must_exist: bool = False) -> None:
+        return self._update(lobby_ID, must_exist,
             UpdateExpression="SET phase = :newPhase",
             ExpressionAttributeValues={
                 ':newPhase': phase,
             },
         )
-        return response["Attributes"] if "Attributes" in response else None
 
-    def delete(self, lobby_ID: str) -> None:
-        self.table.delete_item(
-            Key={
-                'lobby_ID': lobby_ID,
-            }
+    def transition(self, lobby_ID: str, from_phase: str, to_phase: str, joinable: bool = None, timestamp: str = None) -> dict:
+        """
+        Moves a lobby from from_phase to to_phase, setting joinable and/or timestamp (if given) in the same conditional
+        write, so no reader sees a half-applied transition. Returns the written attributes,
+        or LOBBY_NOT_FOUND if the lobby doesn't exist or isn't in from_phase
+        """
+        changes = transition_changes(to_phase, joinable, timestamp)
+        names = { f'#{name}': name for name in changes }
+        response = self._update(lobby_ID, False,
+            UpdateExpression="SET " + ", ".join(f"#{name} = :{name}" for name in changes),
+            ConditionExpression="#phase = :from_phase",
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues={ ':from_phase': from_phase, **{ f':{name}': value for name, value in changes.items() } },
+            ReturnValues='ALL_NEW' if 'expires_at' in changes else 'NONE',
         )
+        if response is LOBBY_NOT_FOUND:
+            return response
+        if 'expires_at' in changes:
+            self._extend_out_of_line(lobby_ID, response)
+        return changes
+
+    def delete(self, lobby_ID: str, must_exist: bool = False) -> None:
+        try:
+            self.table.delete_item(
+                Key={
+                    'lobby_ID': lobby_ID,
+                },
+                **({ 'ConditionExpression': LOBBY_EXISTS } if must_exist else {})
+            )
+        except ClientError as error:
+            if error.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return LOBBY_NOT_FOUND
+            raise
+        finally:
+            self.cache.invalidate(lobby_ID)
+        if self.vote_shards:
+            self._batch_write([{ 'DeleteRequest': { 'Key': { 'lobby_ID': key } } } for key in self.vote_shard_keys(lobby_ID)])
+
+    def delete_expired(self, now: int = None, grace: int = LOBBY_SWEEP_GRACE) -> int:
+        """
+        Deletes every item (lobbies, vote shards and decks) that expired more than `grace` seconds ago, in BatchWriteItem
+        chunks, and returns how many were deleted. Backs up DynamoDB's TTL, which can lag expiry by up to 48 hours
+        """
+        cutoff = (int(time.time()) if now is None else now) - grace
+        deleted = 0
+        for table, key_name in [(self.table, 'lobby_ID'), (self.deck_table, 'deck_ID')]:
+            scan = {
+                'FilterExpression': Attr('expires_at').lt(cutoff),
+                'ProjectionExpression': key_name,
+            }
+            while True:
+                response = table.scan(**scan)
+                keys = [item[key_name] for item in response['Items']]
+                self._batch_write([{ 'DeleteRequest': { 'Key': { key_name: key } } } for key in keys], table)
+                for key in keys:
+                    if table is self.table:
+                        self.cache.invalidate(key)
+                    else:
+                        self.decks.invalidate(key)
+                deleted += len(keys)
+                if 'LastEvaluatedKey' not in response:
+                    break
+                scan['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        return deleted
+
+    def get_expiries(self, lobby_IDs: set[str]) -> dict[str, int]:
+        """expires_at of each existing lobby among lobby_IDs, w/ one BatchGetItem per 100 IDs"""
+        expiries = {}
+        lobby_IDs = list(lobby_IDs)
+        for i in range(0, len(lobby_IDs), BATCH_GET_LIMIT):
+            request = { self.table.name: { 'Keys': [{ 'lobby_ID': lobby_ID } for lobby_ID in lobby_IDs[i:i + BATCH_GET_LIMIT]],
+                                           'ProjectionExpression': 'lobby_ID, expires_at' } }
+            while request:
+                with outbound_slot():
+                    response = self.dynamodb.batch_get_item(RequestItems=request)
+                expiries.update({ item['lobby_ID']: item.get('expires_at') for item in response['Responses'].get(self.table.name, []) })
+                request = response.get('UnprocessedKeys')
+        return expiries
+
+    def _batch_write(self, requests: list[dict], table: object = None) -> None:
+        table_name = (table or self.table).name
+        for i in range(0, len(requests), BATCH_WRITE_LIMIT):
+            pending = { table_name: requests[i:i + BATCH_WRITE_LIMIT] }
+            while pending:
+                with outbound_slot():
+                    response = self.dynamodb.batch_write_item(RequestItems=pending)
+                pending = response.get('UnprocessedItems')
+
+    def _update(self, lobby_ID: str, must_exist: bool, bump: bool = True, **kwargs: object) -> dict:
+        """
+        Single UpdateItem on a lobby, which also bumps its version. With must_exist, the write is conditional on the lobby
+        existing (instead of upserting a partial item) and returns LOBBY_NOT_FOUND if it doesn't - no read needed
+        """
+        if must_exist:
+            kwargs['ConditionExpression'] = LOBBY_EXISTS
+        if bump:
+            kwargs['UpdateExpression'] = versioned(kwargs['UpdateExpression'])
+            kwargs['ExpressionAttributeValues'] = { **kwargs.get('ExpressionAttributeValues', {}), ':version_step': 1 }
+        try:
+            response = self.table.update_item(Key={ 'lobby_ID': lobby_ID }, **kwargs)
+        except ClientError as error:
+            if error.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return LOBBY_NOT_FOUND
+            raise
+        finally:
+            self.cache.invalidate(lobby_ID)     # also after failures, which may still have been applied
+        return response["Attributes"] if "Attributes" in response else None
         
\ No newline at end of file
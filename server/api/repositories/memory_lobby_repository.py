@@ -0,0 +1,228 @@
+import time
+from copy import deepcopy
+from threading import Lock
+from .repository import Repository
+from .lobby_cache import LobbyCache
+from .lobby_repository import (LOBBY_NOT_FOUND, LOBBY_SWEEP_GRACE, Lobby, categories_list, categories_map, category_member,
+                               expiry_from_timestamp, is_expired, is_reusable, sessions_list, sessions_map, transition_changes)
+
+
+class MemoryLobbyRepository(Repository[Lobby]):
+    """
+    Lobbies in a dict in this process, for single-node deployments, tests and benchmarks.
+    Items are stored in LobbyTable's shape (sessions/categories maps) and every operation runs under one lock,
+    so each is as atomic as its DynamoDB counterpart. Lobbies vanish once past their sweep grace, like TTL'd items
+    """
+    def __init__(self, cache: LobbyCache = None) -> None:
+        # Reads never need it, but /get-lobby-cache-stats and socket invalidation work the same against every backend
+        self.cache = cache if cache is not None else LobbyCache()
+        self._lobbies = {}
+        self._lock = Lock()
+
+    def create_tables(self) -> None:
+        """nothing to provision"""
+
+    def add(self, **kwargs: object) -> None:
+        with self._lock:
+            self._lobbies[kwargs['lobby_ID']] = self._item(kwargs)
+        self.cache.invalidate(kwargs['lobby_ID'])
+
+    def claim(self, lobby: Lobby, now: int = None, grace: int = LOBBY_SWEEP_GRACE) -> bool:
+        """stores a new lobby only if its ID is free (or holds a reusable expired lobby), see LobbyRepository.claim"""
+        with self._lock:
+            current = self._lobbies.get(lobby.lobby_ID)
+            if current is not None and not is_reusable(current['expires_at'], grace, now):
+                return False
+            self._lobbies[lobby.lobby_ID] = self._item(vars(lobby))
+        self.cache.invalidate(lobby.lobby_ID)
+        return True
+
+    def get(self, lobby_ID: str, use_cache: bool = True) -> Lobby:
+        attributes = self.get_attributes(lobby_ID, None)
+        return None if attributes is None else Lobby(**attributes)
+
+    def get_attributes(self, lobby_ID: str, attributes: list[str], consistent: bool = False) -> dict:
+        """just the named attributes of a lobby (all of them for None), or None if it doesn't exist"""
+        with self._lock:
+            item = self._live(lobby_ID)
+            if item is None:
+                return None
+            return self._attributes(item, attributes)
+
+    def get_attribute(self, lobby_ID: str, attribute: str, consistent: bool = False) -> object:
+        attributes = self.get_attributes(lobby_ID, [attribute])
+        return LOBBY_NOT_FOUND if attributes is None else attributes[attribute]
+
+    # NOTE: Expensive operation, should never (need to) call this
+    def get_all(self) -> list[Lobby]:
+        return NotImplementedError
+
+    # Not defined in exchange for better method names
+    def update(self) -> None:
+        return NotImplementedError
+
+    def update_joinable(self, lobby_ID: str, joinable: bool, must_exist: bool = False) -> None:
+        return self._update(lobby_ID, must_exist, lambda item: item.update(joinable=joinable))
+
+    def update_host(self, lobby_ID: str, host: dict, must_exist: bool = False) -> None:
+        return self._update(lobby_ID, must_exist, lambda item: item.update(host=deepcopy(host)))
+
+    def update_preferences(self, lobby_ID: str, preferences: dict, must_exist: bool = False, return_values: str = 'NONE') -> None:
+        def change(item: dict) -> dict:
+            item['preferences'] = deepcopy(preferences)
+            return self._attributes(item) if return_values == 'ALL_NEW' else None
+        return self._update(lobby_ID, must_exist, change)
+
+    def add_session(self, lobby_ID: str, session: dict) -> None:
+        def change(item: dict) -> None:
+            item['sessions'].setdefault(session['session_ID'], {
+                "session_info": deepcopy(session),
+                "is_finished": False,
+                "joined_at": time.time_ns(),
+            })
+        return self._update(lobby_ID, True, change)
+
+    def remove_sessions(self, lobby_ID: str, session: dict) -> None:
+        def change(item: dict) -> None:
+            item['sessions'].pop(session['session_ID'], None)
+        return self._update(lobby_ID, True, change)
+
+    def update_session(self, lobby_ID: str, session: dict, is_finished: bool) -> list:
+        def change(item: dict) -> list:
+            entry = item['sessions'].get(session['session_ID'])
+            if entry is None:
+                return LOBBY_NOT_FOUND
+            entry.update(session_info=deepcopy(session), is_finished=is_finished)
+            return deepcopy(sessions_list(item['sessions']))
+        return self._update(lobby_ID, True, change)
+
+    def update_timestamp(self, lobby_ID: str, timestamp: str, must_exist: bool = False) -> None:
+        return self._update(lobby_ID, must_exist,
+                            lambda item: item.update(timestamp=timestamp, expires_at=expiry_from_timestamp(timestamp)))
+
+    def update_categories(self, lobby_ID: str, categories: list, must_exist: bool = False) -> None:
+        def change(item: dict) -> None:
+            item['categories'], item['category_order'] = categories_map(categories)
+        return self._update(lobby_ID, must_exist, change)
+
+    def add_category(self, lobby_ID: str, category: str, session: dict) -> tuple[dict, bool]:
+        def change(item: dict) -> tuple[dict, bool]:
+            members = item['categories'].setdefault(category, set())
+            is_new = not members
+            members.add(category_member(session))
+            item['category_order'].setdefault(category, time.time_ns())
+            return self._attributes(item), is_new
+        return self._update(lobby_ID, True, change)
+
+    def remove_category(self, lobby_ID: str, category: str, session: dict) -> dict:
+        def change(item: dict) -> dict:
+            members = item['categories'].get(category, set())
+            if category_member(session) not in members:
+                return LOBBY_NOT_FOUND
+            members.remove(category_member(session))
+            if not members:
+                del item['categories'][category]
+                item['category_order'].pop(category, None)
+            return self._attributes(item)
+        return self._update(lobby_ID, True, change)
+
+    def update_businesses(self, lobby_ID: str, businesses: list, must_exist: bool = False) -> None:
+        return self._update(lobby_ID, must_exist, lambda item: item.update(businesses=deepcopy(businesses)))
+
+    def update_votes(self, lobby_ID: str, votes: list, must_exist: bool = False, session_ID: str = None) -> None:
+        def change(item: dict) -> None:
+            tally = item['votes']
+            for i, vote in enumerate(votes):
+                if i == len(tally):
+                    tally.append(0)
+                tally[i] += vote
+        return self._update(lobby_ID, must_exist, change)
+
+    def get_votes(self, lobby_ID: str) -> list:
+        votes = self.get_attribute(lobby_ID, 'votes')
+        return None if votes is LOBBY_NOT_FOUND else votes
+
+    # Possible phases: lobby, categories, swiping, and results
+    def update_phase(self, lobby_ID: str, phase: str, must_exist: bool = False) -> None:
+        return self._update(lobby_ID, must_exist, lambda item: item.update(phase=phase))
+
+    def transition(self, lobby_ID: str, from_phase: str, to_phase: str, joinable: bool = None, timestamp: str = None) -> dict:
+        """moves a lobby from from_phase to to_phase under the lock, see LobbyRepository.transition"""
+        changes = transition_changes(to_phase, joinable, timestamp)
+        def change(item: dict) -> dict:
+            if item['phase'] != from_phase:
+                return LOBBY_NOT_FOUND
+            item.update(changes)
+            return dict(changes)
+        return self._update(lobby_ID, True, change)
+
+    def delete(self, lobby_ID: str, must_exist: bool = False) -> None:
+        with self._lock:
+            item = self._lobbies.pop(lobby_ID, None)
+        self.cache.invalidate(lobby_ID)
+        if item is None and must_exist:
+            return LOBBY_NOT_FOUND
+
+    def delete_expired(self, now: int = None, grace: int = LOBBY_SWEEP_GRACE) -> int:
+        with self._lock:
+            expired = [lobby_ID for lobby_ID, item in self._lobbies.items() if is_expired(item['expires_at'], grace + 1, now)]
+            for lobby_ID in expired:
+                del self._lobbies[lobby_ID]
+        for lobby_ID in expired:
+            self.cache.invalidate(lobby_ID)
+        return len(expired)
+
+    def get_expiries(self, lobby_IDs: set[str]) -> dict[str, int]:
+        with self._lock:
+            return { lobby_ID: item['expires_at'] for lobby_ID in lobby_IDs if (item := self._live(lobby_ID)) is not None }
+
+    def _live(self, lobby_ID: str) -> dict:
+        """the stored item, unless it's past the point where DynamoDB's TTL/the sweeper could have deleted it"""
+        item = self._lobbies.get(lobby_ID)
+        if item is None or is_expired(item['expires_at'], LOBBY_SWEEP_GRACE):
+            return None
+        return item
+
+    def _update(self, lobby_ID: str, must_exist: bool, change) -> object:
+        """
+        Applies change(item) to a lobby under the lock (bumping its version unless change returns LOBBY_NOT_FOUND),
+        returning its result. A missing lobby returns LOBBY_NOT_FOUND w/ must_exist, otherwise the write is dropped
+        (there's no partial item worth upserting in memory)
+        """
+        with self._lock:
+            item = self._live(lobby_ID)
+            result = (LOBBY_NOT_FOUND if must_exist else None) if item is None else change(item)
+            if item is not None and result is not LOBBY_NOT_FOUND:
+                item['version'] += 1
+        self.cache.invalidate(lobby_ID)
+        return result
+
+    def _item(self, kwargs: dict) -> dict:
+        categories, category_order = categories_map(kwargs['categories'])
+        return deepcopy({
+            'lobby_ID': kwargs['lobby_ID'],
+            'host': kwargs['host'],
+            'timestamp': kwargs['timestamp'],
+            'joinable': kwargs['joinable'],
+            'phase': kwargs['phase'],
+            'sessions': sessions_map(kwargs['sessions']),
+            'preferences': kwargs['preferences'],
+            'categories': categories,
+            'category_order': category_order,
+            'businesses': kwargs['businesses'],
+            'votes': kwargs['votes'],
+            'expires_at': kwargs['expires_at'],
+            'version': kwargs['version'],
+        })
+
+    def _attributes(self, item: dict, names: list[str] = None) -> dict:
+        """a copy of (the named attributes of) the item in the shape routes use (see LobbyRepository._lobby_item)"""
+        attributes = {}
+        for name in (names if names is not None else Lobby.__annotations__):
+            if name == 'sessions':
+                attributes[name] = sessions_list(item['sessions'])
+            elif name == 'categories':
+                attributes[name] = categories_list(item['categories'], item['category_order'])
+            else:
+                attributes[name] = item.get(name)
+        return deepcopy(attributes)
@@ -0,0 +1,397 @@
+import os
+import time
+import zlib
+import redis
+from copy import deepcopy
+from redis.exceptions import WatchError
+from ..serialization import dumps, loads
+from .repository import Repository
+from .lobby_cache import LobbyCache
+from .lobby_repository import (LOBBY_NOT_FOUND, LOBBY_SWEEP_GRACE, MAXIMUM_LOBBY_AGE, Lobby, categories_list, categories_map,
+                               category_member, deck_ID, expiry_from_timestamp, is_reusable, sessions_list, sessions_map,
+                               transition_changes)
+
+LOBBY_REDIS_URL = os.environ.get("LOBBY_REDIS_URL") or os.environ.get("REDIS_URL")
+
+
+def lobby_keys(lobby_ID: str) -> dict[str, str]:
+    """
+    A lobby's keys: a hash of its scalar attributes (JSON values), plus one hash each for sessions (session_ID -> entry),
+    categories ([category, member] -> time chosen) and votes (index -> count), so every change is one atomic command.
+    The {lobby_ID} hash tag keeps them in one Redis Cluster slot, so they can share a transaction
+    """
+    return { part: f'lobby:{{{lobby_ID}}}' + ('' if part == 'lobby' else f':{part}')
+             for part in ['lobby', 'sessions', 'categories', 'votes'] }
+
+def deck_key(ref: str) -> str:
+    return f'deck:{ref}'
+
+
+class RedisLobbyRepository(Repository[Lobby]):
+    """
+    Lobbies in Redis. Conditional writes WATCH the lobby hash and apply in one MULTI/EXEC (retried if the lobby changed
+    meanwhile), and every key expires on its own once the lobby is past its sweep grace, so nothing needs sweeping
+    """
+    def __init__(self, client: redis.Redis = None, url: str = LOBBY_REDIS_URL, cache: LobbyCache = None) -> None:
+        self.redis = client if client is not None else redis.from_url(url)    # connects on first use
+        # Every mutation below invalidates its lobby, so reads only go stale across workers (bounded by the TTL)
+        self.cache = cache if cache is not None else LobbyCache()
+
+    def create_tables(self) -> None:
+        """nothing to provision, keys are created as lobbies are"""
+
+    def add(self, **kwargs: object) -> None:
+        keys = lobby_keys(kwargs['lobby_ID'])
+        with self.redis.pipeline() as pipe:
+            self._put(pipe, keys, kwargs)
+            pipe.execute()
+        self.cache.invalidate(kwargs['lobby_ID'])
+
+    def claim(self, lobby: Lobby, now: int = None, grace: int = LOBBY_SWEEP_GRACE) -> bool:
+        """stores a new lobby only if its ID is free (or holds a reusable expired lobby), see LobbyRepository.claim"""
+        keys = lobby_keys(lobby.lobby_ID)
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(keys['lobby'])
+                    expires_at = pipe.hget(keys['lobby'], 'expires_at')
+                    if expires_at is not None and not is_reusable(int(expires_at), grace, now):
+                        return False
+                    pipe.multi()
+                    self._put(pipe, keys, vars(lobby))
+                    pipe.execute()
+                    break
+                except WatchError:
+                    continue
+        self.cache.invalidate(lobby.lobby_ID)
+        return True
+
+    def get(self, lobby_ID: str, use_cache: bool = True) -> Lobby:
+        """use_cache=False for read-modify-write callers, which need the latest item"""
+        if not use_cache:
+            return self._get(lobby_ID)
+        return self.cache.get_or_load(lobby_ID, self._get)
+
+    def _get(self, lobby_ID: str) -> Lobby:
+        attributes = self._read(lobby_ID, businesses=True)
+        return None if attributes is None else Lobby(**attributes)
+
+    def get_attributes(self, lobby_ID: str, attributes: list[str], consistent: bool = False) -> dict:
+        """just the named attributes of a lobby, or None if it doesn't exist (the deck is only fetched if asked for)"""
+        if not consistent:
+            lobby = self.cache.get(lobby_ID)
+            if lobby is not None:
+                return deepcopy({ name: getattr(lobby, name) for name in attributes })
+        lobby = self._read(lobby_ID, businesses='businesses' in attributes)
+        return None if lobby is None else { name: lobby.get(name) for name in attributes }
+
+    def get_attribute(self, lobby_ID: str, attribute: str, consistent: bool = False) -> object:
+        """a single attribute of a lobby, or LOBBY_NOT_FOUND. Cached like full lobbies, so a burst of polls costs one read"""
+        if consistent:
+            attributes = self.get_attributes(lobby_ID, [attribute], consistent=True)
+        else:
+            attributes = self.cache.get_or_load(lobby_ID, lambda lobby_ID: self.get_attributes(lobby_ID, [attribute]), attribute)
+        return LOBBY_NOT_FOUND if attributes is None else attributes[attribute]
+
+    # NOTE: Expensive operation, should never (need to) call this
+    def get_all(self) -> list[Lobby]:
+        return NotImplementedError
+
+    # Not defined in exchange for better method names
+    def update(self) -> None:
+        return NotImplementedError
+
+    def update_joinable(self, lobby_ID: str, joinable: bool, must_exist: bool = False) -> None:
+        return self._set(lobby_ID, must_exist, joinable=joinable)
+
+    def update_host(self, lobby_ID: str, host: dict, must_exist: bool = False) -> None:
+        return self._set(lobby_ID, must_exist, host=host)
+
+    def update_preferences(self, lobby_ID: str, preferences: dict, must_exist: bool = False, return_values: str = 'NONE') -> None:
+        def write(pipe: redis.client.Pipeline, keys: dict, expire_at: int) -> None:
+            pipe.hset(keys['lobby'], 'preferences', dumps(preferences))
+            if return_values == 'ALL_NEW':
+                self._queue_read(pipe, keys)
+        def result(results: list) -> dict:
+            return self._attributes(*results[-4:]) if return_values == 'ALL_NEW' else None
+        return self._update(lobby_ID, must_exist, write, result)
+
+    def add_session(self, lobby_ID: str, session: dict) -> None:
+        """joins a session in one write (no-op if it already joined), or LOBBY_NOT_FOUND"""
+        def write(pipe: redis.client.Pipeline, keys: dict, expire_at: int) -> None:
+            pipe.hsetnx(keys['sessions'], session['session_ID'], dumps({
+                "session_info": session,
+                "is_finished": False,
+                "joined_at": time.time_ns(),
+            }))
+            pipe.expireat(keys['sessions'], expire_at)
+        return self._update(lobby_ID, True, write)
+
+    def remove_sessions(self, lobby_ID: str, session: dict) -> None:
+        """removes exactly this session by ID, whatever else joined or left meanwhile, or LOBBY_NOT_FOUND"""
+        def write(pipe: redis.client.Pipeline, keys: dict, expire_at: int) -> None:
+            pipe.hdel(keys['sessions'], session['session_ID'])
+        return self._update(lobby_ID, True, write)
+
+    def update_session(self, lobby_ID: str, session: dict, is_finished: bool) -> list:
+        """
+        Updates a joined session and returns the lobby's sessions afterwards,
+        or LOBBY_NOT_FOUND if the lobby doesn't exist or the session never joined it
+        """
+        updated = {}
+        def check(pipe: redis.client.Pipeline, keys: dict) -> bool:
+            entry = pipe.hget(keys['sessions'], session['session_ID'])
+            if entry is not None:
+                updated['entry'] = { **loads(entry), "session_info": session, "is_finished": is_finished }
+            return entry is not None
+        def write(pipe: redis.client.Pipeline, keys: dict, expire_at: int) -> None:
+            pipe.hset(keys['sessions'], session['session_ID'], dumps(updated['entry']))
+            pipe.hgetall(keys['sessions'])
+        def result(results: list) -> list:
+            return sessions_list(self._decode_sessions(results[-1]))
+        return self._update(lobby_ID, True, write, result, check=check, watch=('sessions',))
+
+    def update_timestamp(self, lobby_ID: str, timestamp: str, must_exist: bool = False) -> None:
+        expires_at = expiry_from_timestamp(timestamp)
+        ref = {}
+        def write(pipe: redis.client.Pipeline, keys: dict, expire_at: int) -> None:
+            pipe.hset(keys['lobby'], mapping={ 'timestamp': dumps(timestamp), 'expires_at': expires_at })
+            for key in keys.values():
+                pipe.expireat(key, expires_at + LOBBY_SWEEP_GRACE)
+            self._extend_deck(pipe, ref.get('ref'), expires_at + LOBBY_SWEEP_GRACE)
+        return self._update(lobby_ID, must_exist, write, check=self._deck_ref_check(ref))
+
+    def update_categories(self, lobby_ID: str, categories: list, must_exist: bool = False) -> None:
+        def write(pipe: redis.client.Pipeline, keys: dict, expire_at: int) -> None:
+            pipe.delete(keys['categories'])
+            self._put_categories(pipe, keys, categories, expire_at)
+        return self._update(lobby_ID, must_exist, write)
+
+    def add_category(self, lobby_ID: str, category: str, session: dict) -> tuple[dict, bool]:
+        """
+        Adds a session to a category (creating it if nobody had chosen it) in one atomic write. Returns the updated
+        lobby attributes and whether the category is new, or LOBBY_NOT_FOUND
+        """
+        def write(pipe: redis.client.Pipeline, keys: dict, expire_at: int) -> None:
+            pipe.hsetnx(keys['categories'], dumps([category, category_member(session)]), time.time_ns())
+            pipe.expireat(keys['categories'], expire_at)
+            self._queue_read(pipe, keys)
+        def result(results: list) -> tuple[dict, bool]:
+            lobby = self._attributes(*results[-4:])
+            members = next(chosen["sessions"] for chosen in lobby["categories"] if chosen["category"] == category)
+            return lobby, results[0] == 1 and len(members) == 1
+        return self._update(lobby_ID, True, write, result)
+
+    def remove_category(self, lobby_ID: str, category: str, session: dict) -> dict:
+        """
+        Removes a session from a category in one atomic write (the category goes once nobody has it chosen).
+        Returns the updated lobby attributes, or LOBBY_NOT_FOUND if the lobby, category or membership doesn't exist
+        """
+        field = dumps([category, category_member(session)])
+        def check(pipe: redis.client.Pipeline, keys: dict) -> bool:
+            return pipe.hexists(keys['categories'], field)
+        def write(pipe: redis.client.Pipeline, keys: dict, expire_at: int) -> None:
+            pipe.hdel(keys['categories'], field)
+            self._queue_read(pipe, keys)
+        def result(results: list) -> dict:
+            return self._attributes(*results[-4:])
+        return self._update(lobby_ID, True, write, result, check=check, watch=('categories',))
+
+    def update_businesses(self, lobby_ID: str, businesses: list, must_exist: bool = False) -> None:
+        """
+        stores the deck before pointing the lobby at it, so the ref never dangles. The deck expires no earlier than
+        the lobby's keys, and update_timestamp/transition push it out along w/ them
+        """
+        ref = self.put_deck(businesses)
+        def write(pipe: redis.client.Pipeline, keys: dict, expire_at: int) -> None:
+            pipe.hset(keys['lobby'], 'businesses_ref', dumps(ref))
+            self._extend_deck(pipe, ref, expire_at)
+        return self._update(lobby_ID, must_exist, write)
+
+    def update_votes(self, lobby_ID: str, votes: list, must_exist: bool = False, session_ID: str = None) -> None:
+        """adds a whole ballot atomically, w/ one HINCRBY per business"""
+        def write(pipe: redis.client.Pipeline, keys: dict, expire_at: int) -> None:
+            for i, vote in enumerate(votes):
+                pipe.hincrby(keys['votes'], i, int(vote))
+            pipe.expireat(keys['votes'], expire_at)
+        return self._update(lobby_ID, must_exist, write)
+
+    def get_votes(self, lobby_ID: str) -> list:
+        """the lobby's tally (None if the lobby doesn't exist)"""
+        keys = lobby_keys(lobby_ID)
+        with self.redis.pipeline() as pipe:
+            pipe.exists(keys['lobby'])
+            pipe.hgetall(keys['votes'])
+            exists, votes = pipe.execute()
+        return self._decode_votes(votes) if exists else None
+
+    def put_deck(self, businesses: list, expire_at: int = None) -> str:
+        """
+        stores a compressed deck under its content hash, expiring at expire_at (default: a new lobby's keys').
+        An identical deck already stored keeps its content and only ever has its expiry pushed out
+        """
+        deck = dumps(businesses)
+        ref = deck_ID(deck)
+        expire_at = int(time.time()) + MAXIMUM_LOBBY_AGE + LOBBY_SWEEP_GRACE if expire_at is None else expire_at
+        with self.redis.pipeline() as pipe:
+            pipe.set(deck_key(ref), zlib.compress(deck), nx=True, exat=expire_at)
+            self._extend_deck(pipe, ref, expire_at)
+            pipe.execute()
+        return ref
+
+    def get_deck(self, ref: str) -> list:
+        deck = self.redis.get(deck_key(ref))
+        return None if deck is None else loads(zlib.decompress(deck))
+
+    # Possible phases: lobby, categories, swiping, and results
+    def update_phase(self, lobby_ID: str, phase: str, must_exist: bool = False) -> None:
+        return self._set(lobby_ID, must_exist, phase=phase)
+
+    def transition(self, lobby_ID: str, from_phase: str, to_phase: str, joinable: bool = None, timestamp: str = None) -> dict:
+        """moves a lobby from from_phase to to_phase in one MULTI/EXEC while it's still in from_phase, see LobbyRepository.transition"""
+        changes = transition_changes(to_phase, joinable, timestamp)
+        def check(pipe: redis.client.Pipeline, keys: dict) -> bool:
+            phase = pipe.hget(keys['lobby'], 'phase')
+            return phase is not None and loads(phase) == from_phase
+        ref = {}
+        def checks(pipe: redis.client.Pipeline, keys: dict) -> bool:
+            return check(pipe, keys) and self._deck_ref_check(ref)(pipe, keys)
+        def write(pipe: redis.client.Pipeline, keys: dict, expire_at: int) -> None:
+            pipe.hset(keys['lobby'], mapping={ name: value if name == 'expires_at' else dumps(value) for name, value in changes.items() })
+            if 'expires_at' in changes:
+                for key in keys.values():
+                    pipe.expireat(key, changes['expires_at'] + LOBBY_SWEEP_GRACE)
+                self._extend_deck(pipe, ref.get('ref'), changes['expires_at'] + LOBBY_SWEEP_GRACE)
+        return self._update(lobby_ID, True, write, lambda results: changes, check=checks)
+
+    def delete(self, lobby_ID: str, must_exist: bool = False) -> None:
+        keys = lobby_keys(lobby_ID)
+        try:
+            with self.redis.pipeline() as pipe:
+                pipe.delete(keys['lobby'])
+                pipe.delete(keys['sessions'], keys['categories'], keys['votes'])
+                deleted, _ = pipe.execute()
+        finally:
+            self.cache.invalidate(lobby_ID)
+        if must_exist and not deleted:
+            return LOBBY_NOT_FOUND
+
+    def delete_expired(self, now: int = None, grace: int = LOBBY_SWEEP_GRACE) -> int:
+        """nothing to do, every key already expires once its lobby is past the sweep grace"""
+        return 0
+
+    def get_expiries(self, lobby_IDs: set[str]) -> dict[str, int]:
+        """expires_at of each existing lobby among lobby_IDs, in one pipelined round trip"""
+        lobby_IDs = list(lobby_IDs)
+        with self.redis.pipeline(transaction=False) as pipe:
+            for lobby_ID in lobby_IDs:
+                pipe.hget(lobby_keys(lobby_ID)['lobby'], 'expires_at')
+            expiries = pipe.execute()
+        return { lobby_ID: int(expires_at) for lobby_ID, expires_at in zip(lobby_IDs, expiries) if expires_at is not None }
+
+    def _set(self, lobby_ID: str, must_exist: bool, **attributes: object) -> None:
+        def write(pipe: redis.client.Pipeline, keys: dict, expire_at: int) -> None:
+            pipe.hset(keys['lobby'], mapping={ name: dumps(value) for name, value in attributes.items() })
+        return self._update(lobby_ID, must_exist, write)
+
+    def _update(self, lobby_ID: str, must_exist: bool, write, result=None, check=None, watch: tuple[str] = ()) -> object:
+        """
+        Runs write(pipe, keys, expire_at) in one MULTI/EXEC, only while the lobby exists (and check(pipe, keys) holds),
+        bumping its version, and returns result(EXEC results) if given. WATCHes the lobby hash (plus `watch`),
+        retrying if it changes first.
+        A missing lobby (or failed check) returns LOBBY_NOT_FOUND w/ must_exist, otherwise the write is dropped -
+        there's no partial item worth upserting w/o an expiry
+        """
+        keys = lobby_keys(lobby_ID)
+        try:
+            with self.redis.pipeline() as pipe:
+                while True:
+                    try:
+                        pipe.watch(keys['lobby'], *(keys[part] for part in watch))
+                        expires_at = pipe.hget(keys['lobby'], 'expires_at')
+                        if expires_at is None or (check is not None and not check(pipe, keys)):
+                            return LOBBY_NOT_FOUND if must_exist else None
+                        pipe.multi()
+                        pipe.hincrby(keys['lobby'], 'version', 1)
+                        write(pipe, keys, int(expires_at) + LOBBY_SWEEP_GRACE)
+                        results = pipe.execute()[1:]    # just write's results
+                        return result(results) if result is not None else None
+                    except WatchError:
+                        continue
+        finally:
+            self.cache.invalidate(lobby_ID)
+
+    def _put(self, pipe: redis.client.Pipeline, keys: dict, kwargs: dict) -> None:
+        expire_at = kwargs['expires_at'] + LOBBY_SWEEP_GRACE
+        pipe.delete(*keys.values())
+        lobby = { name: dumps(kwargs[name]) for name in ['lobby_ID', 'host', 'timestamp', 'joinable', 'phase', 'preferences'] }
+        lobby['expires_at'] = kwargs['expires_at']
+        lobby['version'] = kwargs['version']
+        if kwargs['businesses']:
+            lobby['businesses_ref'] = dumps(self.put_deck(kwargs['businesses'], expire_at))
+        pipe.hset(keys['lobby'], mapping=lobby)
+        if kwargs['sessions']:
+            pipe.hset(keys['sessions'], mapping={ session_ID: dumps(entry) for session_ID, entry in sessions_map(kwargs['sessions']).items() })
+        self._put_categories(pipe, keys, kwargs['categories'], expire_at)
+        if kwargs['votes']:
+            pipe.hset(keys['votes'], mapping=dict(enumerate(int(vote) for vote in kwargs['votes'])))
+        for key in keys.values():
+            pipe.expireat(key, expire_at)
+
+    def _deck_ref_check(self, ref: dict):
+        """a check that reads the lobby's businesses_ref (while WATCHed) into ref['ref'], so write can extend its deck"""
+        def check(pipe: redis.client.Pipeline, keys: dict) -> bool:
+            stored = pipe.hget(keys['lobby'], 'businesses_ref')
+            ref['ref'] = loads(stored) if stored is not None else None
+            return True
+        return check
+
+    def _extend_deck(self, pipe: redis.client.Pipeline, ref: str, expire_at: int) -> None:
+        """queues pushing a deck's expiry out to expire_at (never in - a deck may be shared w/ a longer-lived lobby)"""
+        if ref:
+            pipe.expireat(deck_key(ref), expire_at, gt=True)
+
+    def _put_categories(self, pipe: redis.client.Pipeline, keys: dict, categories: list, expire_at: int) -> None:
+        members, order = categories_map(categories)
+        fields = { dumps([category, member]): order[category] for category in members for member in members[category] }
+        if fields:
+            pipe.hset(keys['categories'], mapping=fields)
+            pipe.expireat(keys['categories'], expire_at)
+
+    def _read(self, lobby_ID: str, businesses: bool) -> dict:
+        keys = lobby_keys(lobby_ID)
+        with self.redis.pipeline() as pipe:
+            self._queue_read(pipe, keys)
+            attributes = self._attributes(*pipe.execute())
+        if attributes is not None and businesses:
+            ref = attributes.pop('businesses_ref', None)
+            attributes['businesses'] = (self.get_deck(ref) if ref else None) or []
+        return attributes
+
+    def _queue_read(self, pipe: redis.client.Pipeline, keys: dict) -> None:
+        for part in ['lobby', 'sessions', 'categories', 'votes']:
+            pipe.hgetall(keys[part])
+
+    def _attributes(self, lobby: dict, sessions: dict, categories: dict, votes: dict) -> dict:
+        """a lobby's hashes decoded into the shape routes use (see LobbyRepository._lobby_item), or None if it doesn't exist"""
+        if not lobby:
+            return None
+        attributes = { name.decode(): loads(value) for name, value in lobby.items() }
+        attributes['sessions'] = sessions_list(self._decode_sessions(sessions))
+        members, order = {}, {}
+        for field, chosen_at in categories.items():
+            category, member = loads(field)
+            members.setdefault(category, set()).add(member)
+            order[category] = min(order.get(category, int(chosen_at)), int(chosen_at))    # when first chosen by a current member
+        attributes['categories'] = categories_list(members, order)
+        attributes['votes'] = self._decode_votes(votes)
+        return attributes
+
+    def _decode_sessions(self, sessions: dict) -> dict:
+        return { session_ID.decode(): loads(entry) for session_ID, entry in sessions.items() }
+
+    def _decode_votes(self, votes: dict) -> list:
+        tally = [0] * (max(map(int, votes), default=-1) + 1)
+        for i, vote in votes.items():
+            tally[int(i)] = int(vote)
+        return tally
@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+from threading import RLock
+from collections import OrderedDict
+
+# Defaults can be overridden through the environment (see .env)
+DEFAULT_TTL = int(os.environ.get("SEARCH_CACHE_TTL", 600))                      # seconds
+DEFAULT_MAX_ENTRIES = int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", 512))
+DEFAULT_MAX_BYTES = int(os.environ.get("SEARCH_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+DEFAULT_GEO_PRECISION = int(os.environ.get("SEARCH_CACHE_GEO_PRECISION", 3))    # 3 decimals ~= 110m
+
+
+def approximate_size(obj: object) -> int:
+    """rough, recursive estimate of an object's memory footprint (in bytes)"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approximate_size(k) + approximate_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approximate_size(ele) for ele in obj)
+    elif hasattr(obj, '__dict__'):
+        size += approximate_size(vars(obj))
+    elif hasattr(obj, '__slots__'):
+        size += sum(approximate_size(getattr(obj, slot, None)) for slot in obj.__slots__)
+    return size
+
+def make_search_key(geolocation: dict, categories: list[str], price: str, num_results: int, radius: int,
+                    precision: int = DEFAULT_GEO_PRECISION, **extra: object) -> tuple:
+    """
+    Builds a hashable key for a business search. Nearby coordinates share a geo bucket, and categories
+    are normalized so that cosmetically different requests resolve to the same cache entry
+    """
+    latitude = round(float(geolocation['latitude']), precision)
+    longitude = round(float(geolocation['longitude']), precision)
+    formatted_cats = tuple(sorted({category.strip().lower() for category in categories if category.strip()}))
+    return (latitude, longitude, formatted_cats, str(price), int(num_results), int(radius), tuple(sorted(extra.items())))
+
+
+class SearchCache:
+    """Bounded LRU + TTL cache for business searches, with hit/miss/eviction counters"""
+    def __init__(self,
+                 ttl: float = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 clock=time.monotonic) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+
+        self._entries = OrderedDict()   # key -> (expires_at, size, value), least recently used first
+        self._lock = RLock()    # re-entrant, so subclasses can compose get/put/invalidate atomically
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> object:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, _, value = entry
+            if expires_at <= self.clock():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: tuple, value: object) -> None:
+        size = approximate_size(value)
+        if size > self.max_bytes:   # Never worth evicting everything else for a single entry
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self.clock() + self.ttl, size, value)
+            self.current_bytes += size
+            while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key: tuple) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _remove(self, key: tuple) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
@@ -0,0 +1,23 @@
+class DeckTableTemplate:
+    KeySchema = [
+        {
+            'AttributeName': 'deck_ID',
+            'KeyType': 'HASH'
+        },
+    ]
+    AttributeDefinitions = [
+        {
+            'AttributeName': 'deck_ID',
+            'AttributeType': 'S'
+        },
+    ]
+    ProvisionedThroughput = {
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    # A deck's expires_at only ever moves out - to the latest expiry among the lobbies that stored it or were refreshed
+    # while pointing at it - so TTL never takes a deck from under a live lobby
+    TimeToLiveSpecification = {
+            'Enabled': True,
+            'AttributeName': 'expires_at'
+        }
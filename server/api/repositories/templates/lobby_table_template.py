@@ -15,4 +15,8 @@ class LobbyTableTemplate:
             'ReadCapacityUnits': 5,
             'WriteCapacityUnits': 5
         }
-    
\ No newline at end of file
+    # DynamoDB deletes lobbies (and vote shards) some time after their epoch expires_at passes
+    TimeToLiveSpecification = {
+            'Enabled': True,
+            'AttributeName': 'expires_at'
+        }
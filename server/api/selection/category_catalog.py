@@ -0,0 +1,55 @@
+import os
+import json
+
+# Mirrors client/src/utils/CategoryMap.js (country -> display name -> Yelp alias); keep the two in sync
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), 'categories.json')
+
+
+def normalize(name: str) -> str:
+    """case/whitespace-insensitive lookup key, e.g. '  fast   FOOD ' -> 'fast food'"""
+    return ' '.join(name.split()).lower()
+
+
+class CategoryCatalog:
+    """
+    Canonical Yelp categories, compiled once into a single dict so display names
+    ("Fast Food", "fast food") and aliases ("hotdogs") all resolve to an alias in O(1)
+    """
+    def __init__(self, countries: dict[str, dict[str, str]]) -> None:
+        self.countries = countries
+        self._aliases = {}
+        for categories in countries.values():
+            for name, alias in categories.items():
+                self._aliases[normalize(name)] = alias
+                self._aliases[normalize(alias)] = alias
+
+    @classmethod
+    def load(cls, path: str = CATALOG_PATH) -> 'CategoryCatalog':
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def __contains__(self, name: str) -> bool:
+        return self.resolve(name) is not None
+
+    def __len__(self) -> int:
+        return len(set(self._aliases.values()))
+
+    def resolve(self, name: str) -> str:
+        """Yelp alias for a display name or alias, or None if it isn't a known category"""
+        if not isinstance(name, str):
+            return None
+        return self._aliases.get(normalize(name))
+
+    def canonicalize(self, names: list[str]) -> tuple[list[str], list[str]]:
+        """returns (sorted, de-duplicated aliases, unknown names)"""
+        aliases, unknown = set(), []
+        for name in names:
+            alias = self.resolve(name)
+            if alias is None:
+                unknown.append(name)
+            else:
+                aliases.add(alias)
+        return sorted(aliases), unknown
+
+
+CATALOG = CategoryCatalog.load()
@@ -0,0 +1,104 @@
+import os
+from threading import Lock, Timer
+from ..repositories.fusion_repository import FusionRepository
+from .search_params import build_search_params
+
+PREFETCH_DELAY = float(os.environ.get("PREFETCH_DELAY", 1.5))   # seconds of quiet before searching
+PREFETCH_PHASE = "categories"    # earlier changes (e.g. setup's location/price/radius) would only waste searches
+
+
+class Prefetcher:
+    """
+    Speculatively runs a lobby's business search while its categories/preferences are still being chosen.
+    Changes are debounced per lobby; a newer change cancels the pending prefetch. The result lands in
+    FusionRepository's search cache (or single-flight, if still running) where the final search picks it up
+    """
+    def __init__(self, fr: FusionRepository, delay: float = PREFETCH_DELAY) -> None:
+        self.fr = fr
+        self.delay = delay
+        self._lock = Lock()
+        self._timers = {}        # lobby_ID -> pending Timer
+        self._generations = {}   # lobby_ID -> latest scheduled generation
+        self.scheduled = 0
+        self.cancelled = 0
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def schedule(self, lobby_ID: str, preferences: dict, categories: list[dict], phase: str) -> bool:
+        """
+        debounces a prefetch of the lobby's search. Skipped (cancelling any pending one) outside PREFETCH_PHASE,
+        w/o categories (an uncategorized search nobody will use), or while the preferences are incomplete
+        """
+        if phase != PREFETCH_PHASE or not categories:
+            with self._lock:
+                self.skipped += 1
+            self.cancel(lobby_ID)
+            return False
+        try:
+            params, error = build_search_params(
+                geolocation=preferences["coordinates"],
+                categoriesArr=categories,
+                price=preferences["priceRange"],
+                num_results=preferences["numResults"],
+                radius=preferences["driveRadius"]
+            )
+        except (KeyError, TypeError, ValueError):
+            error = "Preferences not formatted correctly"
+        if error:   # e.g. the host hasn't picked a location yet
+            with self._lock:
+                self.skipped += 1
+            self.cancel(lobby_ID)
+            return False
+
+        with self._lock:
+            self._cancel_pending(lobby_ID)
+            generation = self._generations.get(lobby_ID, 0) + 1
+            self._generations[lobby_ID] = generation
+            timer = Timer(self.delay, self._run, args=(lobby_ID, generation, params))
+            timer.daemon = True
+            self._timers[lobby_ID] = timer
+            self.scheduled += 1
+        timer.start()
+        return True
+
+    def cancel(self, lobby_ID: str) -> None:
+        with self._lock:
+            self._cancel_pending(lobby_ID)
+            self._generations.pop(lobby_ID, None)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._timers)
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending(),
+            "scheduled": self.scheduled,
+            "cancelled": self.cancelled,
+            "completed": self.completed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+        }
+
+    def _run(self, lobby_ID: str, generation: int, params: dict) -> None:
+        with self._lock:
+            if self._generations.get(lobby_ID) != generation:   # superseded after the timer fired
+                return
+            self._timers.pop(lobby_ID, None)
+            self._generations.pop(lobby_ID, None)
+        try:
+            self.fr.get_all(**params)
+        except Exception as e:
+            print("WARNING: prefetch failed for lobby", lobby_ID, e)
+            with self._lock:
+                self.failed += 1
+            return
+        with self._lock:
+            self.completed += 1
+
+    def _cancel_pending(self, lobby_ID: str) -> None:
+        timer = self._timers.pop(lobby_ID, None)
+        if timer is not None:
+            timer.cancel()
+            self.cancelled += 1
@@ -0,0 +1,75 @@
+from .category_catalog import CATALOG, CategoryCatalog
+
+VALID_NUM_RESULTS = [10, 20, 30]
+SEARCH_FIELDS = ["geolocation", "categories", "price", "num_results", "radius"]
+
+
+def missing_search_fields(body: dict) -> list[str]:
+    """the SEARCH_FIELDS a /get-businesses body lacks, so they're a 400 rather than a KeyError"""
+    if not isinstance(body, dict):
+        return list(SEARCH_FIELDS)
+    return [field for field in SEARCH_FIELDS if field not in body]
+
+
+def build_search_params(geolocation: dict, categoriesArr: list[dict], price: str, num_results: object, radius: object,
+                        catalog: CategoryCatalog = CATALOG) -> tuple[dict, str]:
+    """
+    Validates a business search and converts it into FusionRepository.get_all arguments.
+    Returns (params, None) on success, or (None, error message) for invalid input
+    """
+    if not isinstance(geolocation, dict) or 'latitude' not in geolocation or 'longitude' not in geolocation:
+        return None, "Invalid geolocation coordinates provided"
+    latitude = geolocation['latitude']
+    longitude = geolocation['longitude']
+
+    # Check if geolocation ranges are valid
+    if not -90 < float(latitude) < 90 or not -180 < float(longitude) < 180:
+        return None, "Invalid geolocation coordinates provided"
+    
+    # Check if valid price is provided
+    if not isinstance(price, str) or not 1 <= len(price) <= 4:
+        return None, "Invalid price range requested"
+    
+    if price != "$" * len(price):
+        return None, "Invalid price string requested"
+    
+    # Check if valid num_results is provided
+    if type(num_results) == str and not num_results.isdigit():
+        return None, "Invalid format of num_results provided"
+    num_results = int(num_results)
+
+    if num_results not in VALID_NUM_RESULTS:
+        return None, "Invalid number of results requested"
+    
+    # Check if valid radius is provided
+    if type(radius) == str and not radius.isdigit():
+        return None, "Invalid format of radius provided"
+    radius = int(radius)
+    
+    if not 5 <= radius <= 25:
+        return None, "Invalid search radius requested"
+    
+    # Map display names (or aliases) onto canonical Yelp aliases - sorted, so equivalent selections share one query
+    if not isinstance(categoriesArr, list) or not all(isinstance(category, dict) and "category" in category
+                                                       for category in categoriesArr):
+        return None, "Invalid category requested"
+    categories, unknown = catalog.canonicalize(category["category"] for category in categoriesArr)
+    if unknown:
+        return None, "Invalid category requested"
+
+    # Format the price range
+    price = range(1, len(price) + 1)
+    price = [str(i) for i in price]
+    price = '%2C'.join(price)
+
+    # Convert miles to meters
+    radius = int(round(radius * 1609.34))
+    radius = min(radius, 40000) # Maximum range of the API
+
+    return {
+        "geolocation": geolocation,
+        "categories": categories,
+        "price": price,
+        "num_results": num_results,
+        "radius": radius,
+    }, None
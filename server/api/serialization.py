@@ -0,0 +1,39 @@
+import json
+from decimal import Decimal
+from flask import Response
+
+# orjson is considerably faster, but optional - fall back to the standard library without it
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj: object) -> object:
+    if isinstance(obj, Decimal):    # DynamoDB returns every number as a Decimal
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    if hasattr(obj, 'to_dict'):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj: object) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, separators=(',', ':'), ensure_ascii=False).encode()
+
+def loads(data: bytes) -> object:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_response(body: bytes, status: int = 200) -> Response:
+    return Response(body, status=status, mimetype='application/json')
+
+def encode_businesses(businesses: list) -> bytes:
+    """
+    Encodes a list of businesses as a JSON array. Business objects contribute their cached, pre-encoded bytes,
+    so a deck that was already served (e.g. from the search cache) is never re-serialized
+    """
+    if not all(hasattr(business, 'to_json') for business in businesses):
+        return dumps(businesses)    # plain dicts, e.g. a deck read back from the LobbyTable
+    return b'[' + b','.join(business.to_json() for business in businesses) + b']'
@@ -0,0 +1,109 @@
+'''
+Compares the previous Business pipeline (dict copy -> dataclass -> jsonify-style dataclasses.asdict + json.dumps)
+against the __slots__ Business w/ cached, pre-encoded JSON, for 30-business decks.
+Building is no faster (a little slower in most runs); the win is in serializing. A cold miss peaks higher than the legacy path,
+since it keeps each business's encoding (for later hits) alongside the response body.
+
+From /groupgrub/server, run:
+    'python3 -m benchmarks.bench_business_serialization'
+'''
+import json
+import timeit
+import tracemalloc
+from dataclasses import dataclass, asdict
+from api.repositories.fusion_repository import Business
+from api.serialization import encode_businesses, orjson
+
+DECK_SIZE = 30
+ROUNDS = 2000
+
+
+@dataclass
+class LegacyBusiness:
+    name: str
+    categories: list[str]
+    url: str
+    image_url: str
+    price: int
+    address: str
+    phone: str
+
+def legacy_build(response: list[dict]) -> list[LegacyBusiness]:
+    businesses = []
+    for obj in response:
+        address = obj['location']['display_address']
+        formatted_address = 'Address not provided'
+        if (address and all(isinstance(ele, str) for ele in address)):
+            formatted_address = '\n'.join(address)
+        data = {
+            'name': obj['name'],
+            'categories': obj['categories'],
+            'url': obj['url'],
+            'image_url': obj['image_url'],
+            'price': obj['price'],
+            'address': formatted_address,
+            'phone': obj['phone'],
+        }
+        businesses.append(LegacyBusiness(**data))
+    return businesses
+
+def legacy_serialize(businesses: list[LegacyBusiness]) -> bytes:
+    # What flask's default JSON provider does for a list of dataclasses
+    return json.dumps({ "selections": [asdict(business) for business in businesses] }).encode()
+
+def compact_build(response: list[dict]) -> list[Business]:
+    return [Business.from_yelp(obj) for obj in response]
+
+def compact_serialize(businesses: list[Business]) -> bytes:
+    return b'{"selections":' + encode_businesses(businesses) + b'}'
+
+def synthetic_response(n: int) -> list[dict]:
+    return [{
+        'id': f'business-{i}',
+        'name': f'Business #{i}',
+        'categories': [{'alias': 'burgers', 'title': 'Burgers'}, {'alias': 'hotdogs', 'title': 'Fast Food'}],
+        'url': f'https://www.yelp.com/biz/business-{i}?adjust_creative=abcdefghijklmnop&utm_campaign=yelp_api_v3',
+        'image_url': f'https://s3-media1.fl.yelpcdn.com/bphoto/{i:022d}/o.jpg',
+        'price': '$' * (i % 4 + 1),
+        'location': { 'display_address': [f'{i} S Figueroa St', 'Los Angeles, CA 90007'] },
+        'phone': '+12135550100',
+        'rating': 4.5,
+        'review_count': 100 + i,
+    } for i in range(n)]
+
+def measure(label: str, fn) -> tuple[float, int]:
+    seconds = timeit.timeit(fn, number=ROUNDS) / ROUNDS
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label:<44} {seconds * 1e6:>9.1f} us/deck {peak / 1024:>9.1f} KiB peak')
+    return seconds, peak
+
+def main() -> None:
+    response = synthetic_response(DECK_SIZE)
+    legacy_deck, compact_deck = legacy_build(response), compact_build(response)
+    compact_serialize(compact_deck)     # warm the per-business encodings, as a cached search would
+
+    print(f'{DECK_SIZE}-business decks, {ROUNDS} rounds, orjson {"enabled" if orjson else "unavailable"}\n')
+    results = {
+        'legacy build': measure('legacy: build from Yelp JSON', lambda: legacy_build(response)),
+        'compact build': measure('compact: build from Yelp JSON', lambda: compact_build(response)),
+        'legacy serialize': measure('legacy: serialize response', lambda: legacy_serialize(legacy_deck)),
+        'compact serialize': measure('compact: serialize response (cold)', lambda: compact_serialize(compact_build(response))),
+        'compact serialize warm': measure('compact: serialize response (cached deck)', lambda: compact_serialize(compact_deck)),
+    }
+
+    legacy_time = results['legacy build'][0] + results['legacy serialize'][0]
+    legacy_peak = max(results['legacy build'][1], results['legacy serialize'][1])
+    def summary(label: str, legacy: tuple[float, int], compact: tuple[float, int]) -> None:
+        print(f'{label:<31} {legacy[0] / compact[0]:>6.2f}x the legacy speed, {compact[1] / legacy[1]:.2f}x its peak memory')
+
+    # Ratios are compact vs legacy (speed > 1 is faster, peak memory < 1 is smaller)
+    print()
+    summary('build only:', results['legacy build'], results['compact build'])
+    summary('cold miss (build + serialize):', (legacy_time, legacy_peak), results['compact serialize'])
+    summary('cache hit (serialize only):', results['legacy serialize'], results['compact serialize warm'])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+'''
+Checks that the event loop keeps running while hundreds of upstream searches are in flight.
+
+A heartbeat task stands in for Socket.IO traffic: it should tick every few ms no matter how many slow
+Yelp (stand-in) searches are outstanding. Reports the worst heartbeat gap and total search time.
+
+From /groupgrub/server, run:
+    'python3 -m benchmarks.bench_cooperative_io --searches 300 --latency fixed:0.5'
+(COOPERATIVE_IO defaults to true here; set COOPERATIVE_IO=false to compare against plain threads)
+'''
+import os
+os.environ.setdefault("COOPERATIVE_IO", "true")
+
+import api  # applies eventlet monkey patching (if enabled) before anything below imports sockets/threads
+import sys
+import time
+import socket
+import argparse
+import subprocess
+from threading import Thread
+from api.cooperative import COOPERATIVE_IO
+from api.repositories.fusion_repository import FusionRepository
+from api.repositories.http_client import HttpClient
+
+HEARTBEAT_INTERVAL = 0.01
+GEOLOCATION = { 'latitude': 34.02116, 'longitude': -118.287132 }
+
+
+def start_standin(latency: str) -> tuple[str, subprocess.Popen]:
+    # Separate process, so the stand-in's own CPU time doesn't show up as heartbeat gaps
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    process = subprocess.Popen([sys.executable, '-m', 'standins.fusion_standin', '--port', str(port), '--latency', latency],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(200):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return f'http://127.0.0.1:{port}', process
+
+def main() -> dict:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--searches', type=int, default=300)
+    parser.add_argument('--latency', default='fixed:0.5')
+    args = parser.parse_args()
+
+    standin_url, standin = start_standin(args.latency)
+    fr = FusionRepository(api_url=standin_url, http=HttpClient(pool_maxsize=args.searches))
+
+    gaps, running = [], True
+    def heartbeat() -> None:
+        last = time.perf_counter()
+        while running:
+            time.sleep(HEARTBEAT_INTERVAL)
+            now = time.perf_counter()
+            gaps.append(now - last - HEARTBEAT_INTERVAL)
+            last = now
+
+    results = []
+    def search(i: int) -> None:
+        results.append(len(fr.search(GEOLOCATION, [f'category{i}'], '1', 10, 8047)))
+
+    beat = Thread(target=heartbeat)
+    beat.start()
+    start = time.perf_counter()
+    searches = [Thread(target=search, args=(i,)) for i in range(args.searches)]
+    for thread in searches:
+        thread.start()
+    for thread in searches:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    running = False
+    beat.join()
+    standin.terminate()
+
+    report = {
+        "cooperative_io": COOPERATIVE_IO,
+        "searches": args.searches,
+        "succeeded": sum(1 for n in results if n == 10),
+        "elapsed": elapsed,
+        "max_heartbeat_gap": max(gaps) if gaps else 0.0,
+    }
+    print(f'cooperative I/O: {COOPERATIVE_IO}   {report["succeeded"]}/{args.searches} searches in {elapsed:.2f}s, '
+          f'stand-in latency {args.latency}')
+    print(f'worst heartbeat gap: {report["max_heartbeat_gap"] * 1e3:.1f} ms ({len(gaps)} heartbeats)')
+    return report
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+'''
+Per-operation latency of each lobby backend (see api/repositories/lobby_backends.py), w/ lobby caches bypassed
+wherever the API allows it.
+
+DynamoDB runs against moto and Redis against fakeredis unless --redis-url points at a real server, so only the
+memory numbers (and the relative cost of each operation) carry over to production as is.
+
+From /groupgrub/server, run:
+    'python3 -m benchmarks.bench_lobby_backends [--iterations 500] [--redis-url redis://localhost:6379/1]'
+'''
+import os
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-west-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+import time
+import argparse
+import statistics
+import fakeredis
+import redis
+from moto import mock_aws
+from api.repositories.lobby_backends import LOBBY_BACKENDS, create_lobby_repository
+from api.repositories.lobby_repository import Lobby
+
+LOBBY_ID = "bnch"
+HOST = { "session_ID": "host", "nickname": "Host" }
+BUSINESSES = [{ "id": f"business{i}", "name": f"Business {i}", "image_url": "", "categories": ["tacos"] } for i in range(10)]
+
+# operation -> call, run against a lobby w/ a deck, a few sessions and categories
+OPERATIONS = {
+    "get": lambda lr, i: lr.get(lobby_ID=LOBBY_ID, use_cache=False),
+    "get_attribute": lambda lr, i: lr.get_attribute(lobby_ID=LOBBY_ID, attribute="phase", consistent=True),
+    "update_phase": lambda lr, i: lr.update_phase(lobby_ID=LOBBY_ID, phase="swiping", must_exist=True),
+    "add_session": lambda lr, i: lr.add_session(lobby_ID=LOBBY_ID, session={ "session_ID": f"guest{i}" }),
+    "add_category": lambda lr, i: lr.add_category(lobby_ID=LOBBY_ID, category="Tacos", session={ "session_ID": f"guest{i}" }),
+    "update_votes": lambda lr, i: lr.update_votes(lobby_ID=LOBBY_ID, votes=[1] * len(BUSINESSES), must_exist=True),
+    "get_votes": lambda lr, i: lr.get_votes(lobby_ID=LOBBY_ID),
+}
+
+
+def seed(lr) -> None:
+    lr.add(**vars(Lobby(lobby_ID=LOBBY_ID, host=HOST, timestamp=None, votes=[0] * len(BUSINESSES))))
+    lr.update_businesses(lobby_ID=LOBBY_ID, businesses=BUSINESSES)
+    for i in range(4):
+        lr.add_session(lobby_ID=LOBBY_ID, session={ "session_ID": f"player{i}" })
+        lr.add_category(lobby_ID=LOBBY_ID, category=f"Category {i}", session={ "session_ID": f"player{i}" })
+
+def main() -> dict:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=300)
+    parser.add_argument('--redis-url', default=None, help="real Redis to benchmark instead of fakeredis (its keys get overwritten)")
+    args = parser.parse_args()
+
+    report = {}
+    with mock_aws():
+        for backend in LOBBY_BACKENDS:
+            if backend == "redis":
+                client = redis.from_url(args.redis_url) if args.redis_url else fakeredis.FakeRedis()
+                lr = create_lobby_repository(backend, client=client)
+            else:
+                lr = create_lobby_repository(backend)
+            lr.create_tables()
+            seed(lr)
+            for name, operation in OPERATIONS.items():
+                samples = []
+                for i in range(args.iterations):
+                    start = time.perf_counter()
+                    operation(lr, i)
+                    samples.append(time.perf_counter() - start)
+                report[(backend, name)] = statistics.median(samples)
+            lr.delete(lobby_ID=LOBBY_ID)
+
+    print(f'{"operation":<16}' + ''.join(f'{backend:>12}' for backend in LOBBY_BACKENDS) + '   (median ms)')
+    for name in OPERATIONS:
+        print(f'{name:<16}' + ''.join(f'{report[(backend, name)] * 1000:>12.3f}' for backend in LOBBY_BACKENDS))
+    return report
+
+if __name__ == '__main__':
+    main()
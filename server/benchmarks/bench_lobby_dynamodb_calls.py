@@ -0,0 +1,164 @@
+'''
+Counts the DynamoDB calls each /lobby route makes, against moto's in-process DynamoDB (no AWS account needed).
+
+Every route runs against a freshly seeded lobby, so the counts exclude setup. Prints one row per route with the
+number of calls by operation (GetItem, UpdateItem, ...) and the bytes DynamoDB sent back.
+
+--baseline first replays the same routes w/ the read-before-write pattern conditional updates replaced
+(a GetItem to check the lobby exists, then an unconditional write) against the same moto tables, and then
+prints the before/after totals.
+
+From /groupgrub/server, run:
+    'python3 -m benchmarks.bench_lobby_dynamodb_calls [--vote-shards 4] [--burst 8] [--baseline]'
+'''
+import os
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-west-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+import argparse
+from copy import deepcopy
+from decimal import Decimal
+from collections import Counter
+from flask import Flask
+from moto import mock_aws
+from api.lobby.routes import create_blueprint
+from api.repositories.lobby_repository import LOBBY_NOT_FOUND, Lobby, LobbyRepository
+
+LOBBY_ID = "bnch"
+HOST = { "session_ID": "host" }
+GUEST = { "session_ID": "guest" }
+PREFERENCES = {
+    "coordinates": { "latitude": 34.02116, "longitude": -118.287132, "name": "USC" },
+    "numResults": "10",
+    "driveRadius": "5",
+    "priceRange": "$$"
+}
+BUSINESSES = [{ "id": f"business{i}", "name": f"Business {i}", "image_url": "", "categories": ["tacos"] } for i in range(10)]
+
+# (method, route, request body or query string)
+ROUTES = [
+    ("POST", "/create-lobby", { "session_info": HOST }),
+    ("POST", "/join-lobby", { "lobby_ID": LOBBY_ID }),
+    ("GET", "/get-lobby-host", { "lobby-ID": LOBBY_ID }),
+    ("POST", "/update-lobby-host", { "lobby_ID": LOBBY_ID, "host": GUEST }),
+    ("GET", "/get-lobby-timestamp", { "lobby-ID": LOBBY_ID }),
+    ("POST", "/update-lobby-timestamp", { "lobby_ID": LOBBY_ID }),
+    ("GET", "/get-lobby-joinable", { "lobby-ID": LOBBY_ID }),
+    ("POST", "/update-lobby-joinable", { "lobby_ID": LOBBY_ID, "joinable": False }),
+    ("GET", "/get-lobby-phase", { "lobby-ID": LOBBY_ID }),
+    ("POST", "/update-lobby-phase", { "lobby_ID": LOBBY_ID, "phase": "categories" }),
+    ("GET", "/get-lobby-sessions", { "lobby-ID": LOBBY_ID }),
+    ("POST", "/update-lobby-session", { "lobby_ID": LOBBY_ID, "session_info": GUEST }),
+    ("GET", "/get-lobby-preferences", { "lobby-ID": LOBBY_ID }),
+    ("POST", "/update-lobby-preferences", { "lobby_ID": LOBBY_ID, "preferences": PREFERENCES }),
+    ("GET", "/get-lobby-categories", { "lobby-ID": LOBBY_ID }),
+    ("POST", "/add-lobby-category", { "lobby_ID": LOBBY_ID, "session_info": GUEST, "category": "Tacos" }),
+    ("POST", "/remove-lobby-category", { "lobby_ID": LOBBY_ID, "session_info": HOST, "category": "Tacos", "deletion_index": 0 }),
+    ("GET", "/get-lobby-businesses", { "lobby-ID": LOBBY_ID }),
+    ("POST", "/update-lobby-businesses", { "lobby_ID": LOBBY_ID, "businesses": BUSINESSES }),
+    ("GET", "/get-lobby-votes", { "lobby-ID": LOBBY_ID }),
+    ("POST", "/update-lobby-votes", { "lobby_ID": LOBBY_ID, "votes": [1, 0, 1, 1, 0, 0, 1, 0, 0, 1] }),
+    ("DELETE", "/delete-lobby", { "lobby_ID": LOBBY_ID }),
+    ("POST", "/update-lobby-host", { "lobby_ID": "none", "host": GUEST }),     # missing lobby
+]
+
+
+class ReadBeforeWriteLobbyRepository(LobbyRepository):
+    """the previous existence checks: a (strongly consistent, uncached) GetItem before each must_exist write"""
+    def _update(self, lobby_ID: str, must_exist: bool, bump: bool = True, **kwargs: object) -> dict:
+        if must_exist:
+            if 'Item' not in self.table.get_item(Key={ 'lobby_ID': lobby_ID }, ConsistentRead=True):
+                return LOBBY_NOT_FOUND
+        return super()._update(lobby_ID, False, bump, **kwargs)
+
+    def delete(self, lobby_ID: str, must_exist: bool = False) -> None:
+        if must_exist and 'Item' not in self.table.get_item(Key={ 'lobby_ID': lobby_ID }, ConsistentRead=True):
+            return LOBBY_NOT_FOUND
+        return super().delete(lobby_ID)
+
+
+def seed(lr: LobbyRepository) -> None:
+    preferences = deepcopy(PREFERENCES)
+    preferences["coordinates"]["latitude"] = Decimal(str(PREFERENCES["coordinates"]["latitude"]))
+    preferences["coordinates"]["longitude"] = Decimal(str(PREFERENCES["coordinates"]["longitude"]))
+    lobby = Lobby(lobby_ID=LOBBY_ID, host=HOST, timestamp=None, preferences=preferences,
+                  categories=[{ "category": "Tacos", "sessions": [HOST] }],
+                  businesses=BUSINESSES, votes=[0] * len(BUSINESSES))
+    lr.add(**vars(lobby))
+    lr.update_businesses(lobby_ID=LOBBY_ID, businesses=BUSINESSES)    # also sets up vote shards, if enabled
+    lr.add_session(lobby_ID=LOBBY_ID, session=HOST)
+    lr.add_session(lobby_ID=LOBBY_ID, session=GUEST)
+
+def count_calls(lr: LobbyRepository) -> Counter:
+    """DynamoDB calls by operation, plus the response payload bytes under 'bytes'"""
+    calls = Counter()
+    def count(event_name: str, **kwargs: object) -> None:
+        calls[event_name.rsplit('.', 1)[-1]] += 1
+    def count_bytes(http_response: object, **kwargs: object) -> None:
+        calls['bytes'] += len(http_response.content)
+    for client in {id(c): c for c in [lr.dynamodb.meta.client, lr.dynamodb_client]}.values():
+        client.meta.events.register('before-call.dynamodb', count)
+        client.meta.events.register('after-call.dynamodb', count_bytes)
+    return calls
+
+def measure(repository: type, vote_shards: int, burst: int) -> dict:
+    """{ route: { status, bytes, calls by operation } } for every route, using a repository of the given class"""
+    report = {}
+    with mock_aws():
+        lr = repository(vote_shards=vote_shards)
+        lr.create_tables()
+        calls = count_calls(lr)
+        app = Flask(__name__)
+        app.register_blueprint(create_blueprint(lr=lr), url_prefix='/lobby')
+        client = app.test_client()
+
+        for method, route, body in ROUTES:
+            lr.delete(lobby_ID=LOBBY_ID)
+            seed(lr)
+            calls.clear()
+            if method == "POST":
+                response = client.post('/lobby' + route, json=body)
+            else:
+                response = client.open('/lobby' + route, method=method, query_string=body)
+            name = f'{method} {route}' + (' (missing)' if body.get("lobby_ID") == "none" else '')
+            report[name] = { "status": response.status_code, "bytes": calls.pop('bytes', 0), "calls": dict(calls) }
+
+        # A socket notification makes every client in the room re-read the lobby
+        calls.clear()
+        for _ in range(burst):
+            response = client.get('/lobby/get-lobby-sessions', query_string={ "lobby-ID": LOBBY_ID })
+        report[f'GET /get-lobby-sessions x{burst} (burst)'] = { "status": response.status_code, "bytes": calls.pop('bytes', 0), "calls": dict(calls) }
+    return report
+
+def total_calls(report: dict) -> int:
+    return sum(sum(result["calls"].values()) for result in report.values())
+
+def print_report(title: str, report: dict) -> None:
+    print(title)
+    width = max(len(name) for name in report)
+    for name, result in report.items():
+        calls = ', '.join(f'{operation} x{n}' for operation, n in sorted(result["calls"].items()))
+        print(f'{name:<{width}}  {result["status"]}  {result["bytes"]:>6} B  {sum(result["calls"].values())} call(s): {calls}')
+    print(f'total: {total_calls(report)} DynamoDB calls, '
+          f'{sum(result["bytes"] for result in report.values())} bytes read over {len(report)} requests\n')
+
+def main() -> dict:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--vote-shards', type=int, default=0)
+    parser.add_argument('--burst', type=int, default=8, help="clients re-reading a lobby after one socket event")
+    parser.add_argument('--baseline', action='store_true', help="also replay the read-before-write pattern, for comparison")
+    args = parser.parse_args()
+
+    if args.baseline:
+        baseline = measure(ReadBeforeWriteLobbyRepository, args.vote_shards, args.burst)
+        print_report('before (GetItem, then an unconditional write):', baseline)
+    report = measure(LobbyRepository, args.vote_shards, args.burst)
+    print_report('after (conditional writes):' if args.baseline else 'conditional writes:', report)
+    if args.baseline:
+        print(f'{total_calls(baseline)} -> {total_calls(report)} DynamoDB calls '
+              f'({total_calls(baseline) - total_calls(report)} round trips saved over {len(report)} requests)')
+    return report
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+'''
+Throughput + tail latency of /selection/get-businesses against the local Yelp stand-in (no network, no quota).
+
+From /groupgrub/server, run:
+    'python3 -m benchmarks.bench_selection --requests 2000 --concurrency 16 --latency lognormal:0.08,0.5'
+
+--distinct controls how many different searches are mixed in (i.e. the best achievable cache hit ratio),
+--no-cache measures the raw upstream path.
+'''
+import time
+import random
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask
+from api.repositories.fusion_repository import FusionRepository
+from api.repositories.search_cache import SearchCache
+from api.selection.routes import create_blueprint
+from standins import serve_in_background
+from standins.fusion_standin import create_standin
+
+CATEGORIES = ['Burgers', 'Tacos', 'Ramen', 'Pizza', 'Thai', 'Sushi Bars', 'Coffee & Tea', 'Vegan']
+
+
+def search_body(rng: random.Random) -> dict:
+    return {
+        "geolocation": { "latitude": 34.02116 + rng.uniform(-0.05, 0.05), "longitude": -118.287132 + rng.uniform(-0.05, 0.05) },
+        "categories": [{ "category": category, "sessions": [] } for category in rng.sample(CATEGORIES, rng.randint(1, 3))],
+        "price": "$" * rng.randint(1, 4),
+        "num_results": rng.choice([10, 20, 30]),
+        "radius": rng.choice([5, 10, 25]),
+    }
+
+def percentile(samples: list[float], p: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--distinct', type=int, default=50, help="number of distinct searches in the workload")
+    parser.add_argument('--latency', default='lognormal:0.08,0.5', help="stand-in latency distribution")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--fan-out', action='store_true')
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args()
+
+    standin_url, standin = serve_in_background(create_standin(latency=args.latency, error_rate=args.error_rate))
+    cache = SearchCache(ttl=0) if args.no_cache else SearchCache()
+    fr = FusionRepository(cache=cache, api_url=standin_url, fan_out=args.fan_out)
+
+    app = Flask(__name__)
+    app.register_blueprint(create_blueprint(fr=fr), url_prefix='/selection')
+
+    rng = random.Random(0)
+    workload = [search_body(rng) for _ in range(args.distinct)]
+    bodies = [rng.choice(workload) for _ in range(args.requests)]
+
+    def run(body: dict) -> tuple[float, int]:
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.post("/selection/get-businesses", json=body)
+        return time.perf_counter() - start, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(run, bodies))
+    elapsed = time.perf_counter() - start
+    standin.shutdown()
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, status in results if status != 200)
+    stats = fr.stats()
+    print(f'{args.requests} requests, concurrency {args.concurrency}, {args.distinct} distinct searches, stand-in latency {args.latency}')
+    print(f'throughput: {args.requests / elapsed:,.0f} req/s   errors: {errors}')
+    print(f'latency ms: mean {statistics.mean(latencies) * 1e3:.2f}  p50 {percentile(latencies, .5) * 1e3:.2f}  '
+          f'p95 {percentile(latencies, .95) * 1e3:.2f}  p99 {percentile(latencies, .99) * 1e3:.2f}  max {latencies[-1] * 1e3:.2f}')
+    print(f'upstream requests: {stats["http"]["requests"]}  cache hit ratio: {stats["cache"]["hit_ratio"]:.2%}  '
+          f'coalesced: {stats["single_flight"]["coalesced"]}  breaker: {stats["http"]["breaker"]["state"]}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+'''
+Cold-start time of the API: a fresh interpreter importing api.api, building the app and serving its first request.
+Nothing on that path should touch AWS or Redis (tables are provisioned separately, w/ 'flask create-tables'),
+so this runs w/o credentials or a Redis server and any network call shows up as a stall (or an error).
+
+From /groupgrub/server, run:
+    'python3 -m benchmarks.bench_startup [--runs 5]'
+'''
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# Run in a child interpreter, so every module import is cold
+CHILD = '''
+import time, json
+start = time.perf_counter()
+from api.api import create_app, socketio    # lobby/events.py imports socketio from __main__, as when run through api.py
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+response = app.test_client().get("/lobby/get-lobby-cache-stats")
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({ "import": imported - start, "create_app": created - imported, "first request": served - created }))
+'''
+
+
+def main() -> dict:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    server_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = { **os.environ, "LOBBY_BACKEND": os.environ.get("LOBBY_BACKEND", "dynamodb") }
+    runs = []
+    for _ in range(args.runs):
+        child = subprocess.run([sys.executable, '-c', CHILD], cwd=server_dir, env=env, capture_output=True, text=True, check=True)
+        runs.append(json.loads(child.stdout.strip().splitlines()[-1]))
+
+    report = { phase: statistics.median(run[phase] for run in runs) for phase in runs[0] }
+    for phase, seconds in report.items():
+        print(f'{phase:<14} {seconds * 1000:>8.1f} ms')
+    print(f'{"total":<14} {sum(report.values()) * 1000:>8.1f} ms  (median of {args.runs} cold starts, {env["LOBBY_BACKEND"]} backend)')
+    return report
+
+if __name__ == '__main__':
+    main()
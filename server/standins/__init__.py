@@ -0,0 +1,18 @@
+'''
+Local stand-ins for the third-party services the API talks to, so tests and benchmarks can run offline.
+
+Each stand-in is a small Flask app; serve_in_background() runs one on an ephemeral port for tests/benchmarks.
+'''
+from threading import Thread
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args: object, **kwargs: object) -> None:
+        pass
+
+def serve_in_background(app, host: str = '127.0.0.1', port: int = 0):
+    """Starts a threaded server for `app` and returns (base_url, server). Call server.shutdown() when done"""
+    server = make_server(host, port, app, threaded=True, request_handler=_QuietRequestHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://{host}:{server.server_port}', server
@@ -0,0 +1,195 @@
+'''
+Stand-in for Yelp Fusion's api.yelp.com/v3/businesses/search.
+
+Serves deterministic synthetic businesses (or replays recorded responses) w/ configurable latency and error
+injection, so the selection path can be tested and load-tested on an air-gapped box.
+
+From /groupgrub/server, run:
+    'python3 -m standins.fusion_standin --port 5001 --latency lognormal:0.08,0.5 --error-rate 0.01'
+then start the API with FUSION_API_URL=http://127.0.0.1:5001
+
+Record real responses once (needs FUSION_KEY), then replay them offline:
+    'python3 -m standins.fusion_standin --record recordings.json'
+    'python3 -m standins.fusion_standin --replay recordings.json'
+'''
+import json
+import time
+import random
+import hashlib
+import argparse
+import requests
+from threading import Lock
+from functools import lru_cache
+from flask import Flask, request, jsonify
+
+UPSTREAM = 'https://api.yelp.com'
+RESULTS_PER_CATEGORY = 240      # enough to exercise pagination
+ERROR_STATUSES = (429, 500, 503)
+STREETS = ['Figueroa St', 'Hoover St', 'Vermont Ave', 'Jefferson Blvd', 'Exposition Blvd', 'Flower St']
+
+
+def parse_latency(spec: str):
+    """
+    Builds a latency sampler (rng -> seconds) from a spec:
+    'none', 'fixed:S', 'uniform:LOW,HIGH', 'normal:MEAN,STDDEV' or 'lognormal:MEDIAN,SIGMA'
+    """
+    kind, _, args = spec.partition(':')
+    values = [float(arg) for arg in args.split(',')] if args else []
+    if kind == 'none':
+        return lambda rng: 0.0
+    if kind == 'fixed':
+        return lambda rng: values[0]
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        median, sigma = values
+        return lambda rng: median * rng.lognormvariate(0, sigma)
+    raise ValueError(f"Unknown latency distribution '{spec}'")
+
+def query_key(args) -> str:
+    """normalized representation of a search query, used to match recordings"""
+    params = {key: sorted(args.getlist(key)) for key in sorted(args) if key != 'term'}
+    return json.dumps(params, sort_keys=True)
+
+def requested_categories(args) -> list[str]:
+    categories = []
+    for value in args.getlist('categories'):
+        categories.extend(category for category in value.split(',') if category)
+    return categories
+
+@lru_cache(maxsize=65536)
+def synthetic_business(category: str, i: int, latitude: float, longitude: float, seed: int, image_base: str) -> dict:
+    # Seeded by everything that identifies the business, so every run serves identical data
+    digest = hashlib.sha256(f'{seed}:{category}:{i}:{latitude:.3f}:{longitude:.3f}'.encode()).hexdigest()
+    rng = random.Random(digest)
+    business_ID = f'{category}-{digest[:16]}'
+    title = category.replace('+', ' ').replace('_', ' ').title()
+    number = rng.randint(100, 9999)
+    return {
+        'id': business_ID,
+        'alias': business_ID,
+        'name': f'{title} Place #{i}',
+        'image_url': f'{image_base}/bphoto/{digest[:22]}/o.jpg',
+        'is_closed': False,
+        'url': f'https://www.yelp.com/biz/{business_ID}',
+        'review_count': rng.randint(1, 2000),
+        'categories': [{'alias': category, 'title': title}],
+        'rating': rng.randint(2, 10) / 2,
+        'coordinates': {
+            'latitude': latitude + rng.uniform(-0.02, 0.02),
+            'longitude': longitude + rng.uniform(-0.02, 0.02)
+        },
+        'transactions': [],
+        'price': '$' * rng.randint(1, 4),
+        'location': {
+            'address1': f'{number} {rng.choice(STREETS)}',
+            'city': 'Los Angeles',
+            'zip_code': '90007',
+            'country': 'US',
+            'state': 'CA',
+            'display_address': [f'{number} {rng.choice(STREETS)}', 'Los Angeles, CA 90007']
+        },
+        'phone': f'+1213555{number:04d}',
+        'display_phone': f'(213) 555-{number:04d}',
+        'distance': rng.uniform(10, 8000),
+    }
+
+def synthetic_search(args, seed: int, image_base: str) -> dict:
+    latitude = float(args.get('latitude', 0))
+    longitude = float(args.get('longitude', 0))
+    limit = min(int(args.get('limit', 20)), 50)
+    offset = int(args.get('offset', 0))
+    prices = {int(price) for price in args.get('price', '1,2,3,4').split(',') if price}
+
+    categories = requested_categories(args) or ['restaurants']
+    # Round-robin across categories, like a relevance-sorted mix of matches
+    matches = []
+    for i in range(RESULTS_PER_CATEGORY):
+        for category in categories:
+            business = synthetic_business(category, i, latitude, longitude, seed, image_base)
+            if len(business['price']) in prices:
+                matches.append(business)
+        if len(matches) >= offset + limit:
+            break
+    return {
+        'businesses': matches[offset:offset + limit],
+        'total': RESULTS_PER_CATEGORY * len(categories) * len(prices) // 4,   # approximate, like the real API
+        'region': { 'center': { 'latitude': latitude, 'longitude': longitude } }
+    }
+
+
+def create_standin(seed: int = 0,
+                   latency: str = 'none',
+                   error_rate: float = 0.0,
+                   error_statuses: tuple = ERROR_STATUSES,
+                   replay: str = None,
+                   record: str = None,
+                   image_base: str = 'https://s3-media1.fl.yelpcdn.com') -> Flask:
+    app = Flask(__name__)
+    sample_latency = parse_latency(latency)
+    rng, rng_lock = random.Random(seed), Lock()
+    recordings = {}
+    if replay:
+        with open(replay) as f:
+            recordings = json.load(f)
+    stats = { 'requests': 0, 'errors': 0, 'replayed': 0, 'synthetic': 0, 'recorded': 0 }
+
+    @app.route("/v3/businesses/search", methods=["GET"])
+    def search():
+        with rng_lock:
+            stats['requests'] += 1
+            delay = sample_latency(rng)
+            fail = rng.random() < error_rate
+            status = rng.choice(error_statuses)
+        time.sleep(delay)
+        if fail:
+            with rng_lock:
+                stats['errors'] += 1
+            return jsonify({ "error": { "code": "INJECTED_ERROR", "description": "Injected by fusion_standin" } }), status
+
+        key = query_key(request.args)
+        if record:
+            response = requests.get(UPSTREAM + request.full_path, headers={ 'Authorization': request.headers.get('Authorization', '') })
+            if response.status_code == 200:
+                with rng_lock:
+                    recordings[key] = response.json()
+                    stats['recorded'] += 1
+                    with open(record, 'w') as f:
+                        json.dump(recordings, f)
+            return response.content, response.status_code, { 'Content-Type': 'application/json' }
+        if key in recordings:
+            with rng_lock:
+                stats['replayed'] += 1
+            return jsonify(recordings[key])
+        if replay:  # strict replay: unknown queries are an error rather than silently synthetic
+            return jsonify({ "error": { "code": "NOT_RECORDED", "description": key } }), 404
+
+        with rng_lock:
+            stats['synthetic'] += 1
+        return jsonify(synthetic_search(request.args, seed, image_base))
+
+    @app.route("/stats", methods=["GET"])
+    def get_stats():
+        return jsonify(stats)
+
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local stand-in for the Yelp Fusion business search API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', default='none', help="none | fixed:S | uniform:LOW,HIGH | normal:MEAN,STDDEV | lognormal:MEDIAN,SIGMA")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--image-base', default='https://s3-media1.fl.yelpcdn.com')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--replay', help="JSON file of recorded responses to serve")
+    group.add_argument('--record', help="proxy to api.yelp.com and record responses into this JSON file")
+    args = parser.parse_args()
+
+    standin = create_standin(seed=args.seed, latency=args.latency, error_rate=args.error_rate,
+                             replay=args.replay, record=args.record, image_base=args.image_base)
+    standin.run(host=args.host, port=args.port, threaded=True)
@@ -0,0 +1,53 @@
+'''
+Stand-in for Yelp's image CDN (s3-media*.fl.yelpcdn.com).
+
+Serves a deterministic PNG for every /bphoto/<photo_ID>/<size>.jpg path, so the image proxy can be tested offline.
+Pair it w/ the fusion stand-in:
+    'python3 -m standins.image_standin --port 5002'
+    'python3 -m standins.fusion_standin --image-base http://127.0.0.1:5002'
+'''
+import zlib
+import struct
+import hashlib
+import argparse
+from functools import lru_cache
+from flask import Flask, Response, jsonify
+
+WIDTH, HEIGHT = 1000, 750   # roughly the size of Yelp's 'o.jpg' originals
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+@lru_cache(maxsize=256)
+def synthetic_png(photo_ID: str, width: int = WIDTH, height: int = HEIGHT) -> bytes:
+    """solid-color RGB PNG, colored by the photo ID"""
+    red, green, blue = hashlib.sha256(photo_ID.encode()).digest()[:3]
+    row = b'\x00' + bytes([red, green, blue]) * width
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + _chunk(b'IHDR', header) +
+            _chunk(b'IDAT', zlib.compress(row * height, 9)) + _chunk(b'IEND', b''))
+
+
+def create_standin(width: int = WIDTH, height: int = HEIGHT) -> Flask:
+    app = Flask(__name__)
+    stats = { 'requests': 0 }
+
+    @app.route("/bphoto/<photo_ID>/<size>", methods=["GET"])
+    def photo(photo_ID, size):
+        stats['requests'] += 1
+        return Response(synthetic_png(photo_ID, width, height), mimetype='image/png')
+
+    @app.route("/stats", methods=["GET"])
+    def get_stats():
+        return jsonify(stats)
+
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local stand-in for Yelp's image CDN")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5002)
+    args = parser.parse_args()
+    create_standin().run(host=args.host, port=args.port, threaded=True)
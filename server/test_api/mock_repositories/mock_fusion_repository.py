@@ -30,21 +30,22 @@ class MockFusionRepository(MockRepository[Business]):
         steaks = Business(name="steaks", categories=["meat"], price=4, phone="steaks#")
         grapes = Business(name="grapes", categories=["fruit"], price=1, phone="grapes#")
 
+        # Keyed by the canonical aliases build_search_params hands get_all
         self.businessMap = {
-            "fried": [burgers, fries],
-            "meat": [burgers, steaks],
-            "fruit": [grapes],
-            "fast+food": [burgers]
+            "burgers": [burgers],
+            "steak": [steaks],
+            "hotdogs": [burgers, fries],
+            "juicebars": [grapes]
         }
 
 
     def get(self, email: str) -> Business:
         raise NotImplementedError
     
-    def get_all(self, geolocation: dict, categories: list[str], price: int, num_results: int) -> list[Business]:
+    def get_all(self, geolocation: dict, categories: list[str], price: str, num_results: int, radius: int) -> list[Business]:
         businesses = []
         for category in categories:
-            for business in self.businessMap[category]:
+            for business in self.businessMap.get(category, []):
                 if len(businesses) > num_results: 
                     break
                 if business.price <= int(price[-1]):
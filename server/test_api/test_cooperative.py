@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import subprocess
+from threading import Lock, Thread
+from api import cooperative
+from api.cooperative import OutboundLimited
+
+class FakeTable:
+    name = "LobbyTable"
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.lock = Lock()
+
+    def get_item(self, Key):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.02)
+        with self.lock:
+            self.active -= 1
+        return { "Item": Key }
+
+class TestCooperativeIO:
+    def test_outbound_limited_proxies_calls(self):
+        table = OutboundLimited(FakeTable())
+        assert table.name == "LobbyTable"
+        assert table.get_item(Key={ "lobby_ID": "ABCD" }) == { "Item": { "lobby_ID": "ABCD" } }
+
+    def test_outbound_concurrency_capped(self, monkeypatch):
+        monkeypatch.setattr(cooperative, "_outbound_slots", None)
+        monkeypatch.setattr(cooperative, "MAX_OUTBOUND_CONCURRENCY", 2)
+        fake = FakeTable()
+        table = OutboundLimited(fake)
+        threads = [Thread(target=table.get_item, kwargs={ "Key": {} }) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert fake.peak == 2
+
+    def test_monkey_patched_when_enabled(self):
+        code = "import api, eventlet.patcher as p; print(p.is_monkey_patched('socket'), p.is_monkey_patched('thread'))"
+        env = dict(os.environ, COOPERATIVE_IO="true")
+        output = subprocess.run([sys.executable, "-W", "ignore", "-c", code], env=env, capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(__file__)))
+        assert output.stdout.split() == ["True", "True"]
+
+    def test_enabled_from_dotenv(self):
+        # Stands in for a .env file setting COOPERATIVE_IO, w/o it in the process environment
+        code = ("import os, dotenv; dotenv.load_dotenv = lambda *args, **kwargs: os.environ.update(COOPERATIVE_IO='true'); "
+                "import api, eventlet.patcher as p; from api.cooperative import async_mode; "
+                "print(p.is_monkey_patched('socket'), async_mode())")
+        env = { name: value for name, value in os.environ.items() if name != "COOPERATIVE_IO" }
+        output = subprocess.run([sys.executable, "-W", "ignore", "-c", code], env=env, capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(__file__)))
+        assert output.stdout.split() == ["True", "eventlet"]
@@ -0,0 +1,153 @@
+import os
+import time
+import threading
+import pytest
+import requests
+from flask import Flask
+from api.images.image_cache import ImageCache, ImageFetchError, proxy_image_url, source_image_url
+from api.images.routes import create_blueprint
+from standins import serve_in_background
+from standins.image_standin import create_standin
+
+@pytest.fixture(scope="module")
+def standin_url():
+    url, server = serve_in_background(create_standin(width=800, height=600))
+    yield url
+    server.shutdown()
+
+@pytest.fixture
+def my_cache(tmp_path) -> ImageCache:
+    return ImageCache(directory=str(tmp_path), max_bytes=10 * 1024 * 1024, allowed_hosts=["127.0.0.1"])
+
+def image_url(standin_url: str, photo_ID: str) -> str:
+    return f"{standin_url}/bphoto/{photo_ID}/o.jpg"
+
+def standin_requests(standin_url: str) -> int:
+    return requests.get(f"{standin_url}/stats").json()["requests"]
+
+class TestProxyUrls:
+    def test_round_trip(self):
+        src = "https://s3-media1.fl.yelpcdn.com/bphoto/abc/o.jpg"
+        proxied = proxy_image_url(src, "https://api.groupgrub.app/", 600)
+        assert proxied.startswith("https://api.groupgrub.app/images/proxy?")
+        assert source_image_url(proxied) == (src, 600)
+
+    def test_disabled_without_proxy(self):
+        assert proxy_image_url("https://s3-media1.fl.yelpcdn.com/x.jpg", None) == "https://s3-media1.fl.yelpcdn.com/x.jpg"
+
+
+class TestImageCache:
+    def test_allowed_hosts(self):
+        cache = ImageCache.__new__(ImageCache)
+        cache.allowed_hosts = [".fl.yelpcdn.com"]
+        assert cache.is_allowed("https://s3-media1.fl.yelpcdn.com/bphoto/a/o.jpg")
+        assert not cache.is_allowed("https://evil.example.com/a.jpg")
+        assert not cache.is_allowed("file:///etc/passwd")
+        with pytest.raises(ImageFetchError):
+            cache.get("https://evil.example.com/a.jpg")
+
+    def test_miss_then_hit(self, my_cache, standin_url):
+        before = standin_requests(standin_url)
+        path, etag, content_type = my_cache.get(image_url(standin_url, "a"))
+        assert content_type == "image/png"
+        assert os.path.basename(path) == etag
+        assert my_cache.get(image_url(standin_url, "a"))[1] == etag
+        assert standin_requests(standin_url) == before + 1
+        assert my_cache.stats()["hits"] == 1
+
+    def test_content_addressed(self, my_cache, standin_url):
+        # Same photo behind two URLs -> one stored object
+        first = my_cache.get(image_url(standin_url, "b"))
+        second = my_cache.get(f"{standin_url}/bphoto/b/l.jpg")
+        assert first[1] == second[1]
+        assert my_cache.stats()["objects"] == 1
+
+    def test_lru_eviction(self, tmp_path, standin_url):
+        size = os.path.getsize(ImageCache(directory=str(tmp_path / "probe"), allowed_hosts=["127.0.0.1"]).get(image_url(standin_url, "c"))[0])
+        cache = ImageCache(directory=str(tmp_path / "small"), max_bytes=int(size * 2.5), allowed_hosts=["127.0.0.1"])
+        for photo_ID in ["d", "e", "f"]:
+            cache.get(image_url(standin_url, photo_ID))
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["bytes"] <= cache.max_bytes
+
+    def test_survives_restart(self, tmp_path, standin_url):
+        ImageCache(directory=str(tmp_path), allowed_hosts=["127.0.0.1"]).get(image_url(standin_url, "g"))
+        before = standin_requests(standin_url)
+        restarted = ImageCache(directory=str(tmp_path), allowed_hosts=["127.0.0.1"])
+        restarted.get(image_url(standin_url, "g"))
+        assert standin_requests(standin_url) == before
+        assert restarted.stats()["objects"] == 1
+
+    def test_downscale(self, my_cache, standin_url):
+        Image = pytest.importorskip("PIL.Image")
+        path, etag, content_type = my_cache.get(image_url(standin_url, "h"), width=300)
+        assert content_type == "image/jpeg"
+        assert etag.endswith("-w300")
+        with Image.open(path) as image:
+            assert image.size == (300, 225)
+
+    def test_concurrent_misses_fetch_once(self, my_cache, standin_url):
+        fetch, fetches = my_cache._fetch, []
+        def slow_fetch(url):
+            fetches.append(url)
+            time.sleep(0.1)
+            return fetch(url)
+        my_cache._fetch = slow_fetch
+        threads = [threading.Thread(target=my_cache.get, args=(image_url(standin_url, "m"),)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(fetches) == 1
+        assert my_cache.stats()["coalesced"] == 3
+        assert not [file for _, _, files in os.walk(my_cache.directory) for file in files if file.endswith(".tmp")]
+
+    def test_undecodable_served_as_original(self, my_cache, standin_url):
+        pytest.importorskip("PIL.Image")
+        my_cache._fetch = lambda url: (b'<svg xmlns="http://www.w3.org/2000/svg"/>', "image/svg+xml")
+        for _ in range(2):
+            path, etag, content_type = my_cache.get(image_url(standin_url, "n"), width=300)
+            assert content_type == "image/svg+xml"
+            assert not etag.endswith("-w300")
+        assert my_cache.stats()["undecodable"] == 2
+
+    def test_prefetch(self, my_cache, standin_url):
+        proxied = [proxy_image_url(image_url(standin_url, photo_ID), "http://localhost:5000", None) for photo_ID in "ijk"]
+        my_cache.prefetch(proxied)
+        deadline = time.monotonic() + 5
+        while my_cache.stats()["prefetched"] < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert my_cache.stats()["prefetched"] == 3
+
+
+class TestImageRoutes:
+    def test_proxy_headers(self, my_cache, standin_url):
+        app = Flask(__name__)
+        app.register_blueprint(create_blueprint(ic=my_cache), url_prefix='/images')
+        client = app.test_client()
+
+        response = client.get("/images/proxy", query_string={ "src": image_url(standin_url, "l") })
+        assert response.status_code == 200
+        assert response.mimetype == "image/png"
+        assert "immutable" in response.headers["Cache-Control"]
+
+        revalidated = client.get("/images/proxy", query_string={ "src": image_url(standin_url, "l") },
+                                 headers={ "If-None-Match": response.headers["ETag"] })
+        assert revalidated.status_code == 304
+
+    def test_proxy_truncated_image(self, my_cache, standin_url):
+        pytest.importorskip("PIL.Image")
+        data = requests.get(image_url(standin_url, "o")).content
+        my_cache._fetch = lambda url: (data[:len(data) // 2], "image/png")
+        app = Flask(__name__)
+        app.register_blueprint(create_blueprint(ic=my_cache), url_prefix='/images')
+        response = app.test_client().get("/images/proxy", query_string={ "src": image_url(standin_url, "o"), "w": "300" })
+        assert response.status_code == 200
+        assert response.mimetype == "image/png"
+
+    def test_proxy_rejects_bad_input(self, my_cache):
+        app = Flask(__name__)
+        app.register_blueprint(create_blueprint(ic=my_cache), url_prefix='/images')
+        client = app.test_client()
+        assert client.get("/images/proxy", query_string={ "src": "https://evil.example.com/a.jpg" }).status_code == 400
+        assert client.get("/images/proxy", query_string={ "src": "http://127.0.0.1:1/a.jpg", "w": "123" }).status_code == 400
@@ -0,0 +1,63 @@
+import os
+import pytest
+from moto import mock_aws
+from api.lobby.broadcasts import RoomBroadcasts
+from api.repositories.lobby_repository import Lobby, LobbyRepository
+from api.repositories.memory_lobby_repository import MemoryLobbyRepository
+
+TEST_LOBBY_ID = "abcd"
+TEST_HOST = { "session_ID": "host", "nickname": "Host" }
+
+@pytest.fixture
+def lr():
+    lr = MemoryLobbyRepository()
+    lr.add(**vars(Lobby(lobby_ID=TEST_LOBBY_ID, host=TEST_HOST, timestamp=None, votes=[0, 0])))
+    return lr
+
+class TestRoomBroadcasts:
+    def test_payload(self, lr):
+        lr.add_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=TEST_HOST)
+        payload = RoomBroadcasts(lr).payload(TEST_LOBBY_ID, ["categories"])
+        assert payload == {
+            "lobby_ID": TEST_LOBBY_ID,
+            "seq": 1,
+            "version": lr.get(lobby_ID=TEST_LOBBY_ID).version,
+            "lobby": { "categories": [{ "category": "Tacos", "sessions": [TEST_HOST] }] },
+        }
+
+    def test_seq_counts_each_stream_of_fields(self, lr):
+        broadcasts = RoomBroadcasts(lr)
+        assert [broadcasts.payload(TEST_LOBBY_ID, ["sessions"])["seq"] for _ in range(3)] == [1, 2, 3]
+        assert broadcasts.payload(TEST_LOBBY_ID, ["votes"])["seq"] == 1
+        lr.add(**vars(Lobby(lobby_ID="efgh", timestamp=None)))
+        assert broadcasts.payload("efgh", ["sessions"])["seq"] == 1
+
+    def test_version_follows_writes(self, lr):
+        broadcasts = RoomBroadcasts(lr)
+        before = broadcasts.payload(TEST_LOBBY_ID, ["preferences"])
+        lr.update_preferences(lobby_ID=TEST_LOBBY_ID, preferences={ "priceRange": "$$" }, must_exist=True)
+        after = broadcasts.payload(TEST_LOBBY_ID, ["preferences"])
+        assert after["version"] == before["version"] + 1 and after["lobby"] == { "preferences": { "priceRange": "$$" } }
+
+    def test_missing_lobby(self, lr):
+        assert RoomBroadcasts(lr).payload("none", ["sessions"]) is None
+
+    def test_counters_stay_bounded(self, lr):
+        broadcasts = RoomBroadcasts(lr, max_rooms=2)
+        for lobby_ID in ["a", "b", "c"]:
+            lr.add(**vars(Lobby(lobby_ID=lobby_ID, timestamp=None)))
+            broadcasts.payload(lobby_ID, ["sessions"])
+        assert list(broadcasts._seqs) == ["b", "c"]
+
+    def test_plain_json_from_dynamodb(self):
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-west-1")
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+        with mock_aws():
+            lr = LobbyRepository()
+            lr.create_tables()
+            lr.add(**vars(Lobby(lobby_ID=TEST_LOBBY_ID, timestamp=None, votes=[0, 0])))
+            lr.update_votes(lobby_ID=TEST_LOBBY_ID, votes=[1, 0], must_exist=True)
+            payload = RoomBroadcasts(lr).payload(TEST_LOBBY_ID, ["votes"])
+            assert payload["lobby"] == { "votes": [1, 0] } and type(payload["lobby"]["votes"][0]) is int
+            assert type(payload["version"]) is int
@@ -0,0 +1,50 @@
+import os
+import pytest
+from itertools import count
+from moto import mock_aws
+from api.lobby.id_pool import LobbyIDPool
+from api.repositories.lobby_repository import Lobby, LobbyRepository
+from ..test_repositories.test_single_flight import wait_until
+
+@pytest.fixture
+def lr():
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-west-1")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_aws():
+        lr = LobbyRepository()
+        lr.create_tables()
+        yield lr
+
+def sequential_IDs(taken: int):
+    """ID generator cycling (shuffled) through a tiny keyspace: id0..id<taken - 1> are in use, 50 more are free"""
+    ids = count()
+    return lambda: f"id{next(ids) * 7 % (taken + 50)}"
+
+class TestLobbyIDPool:
+    def test_disabled(self, lr):
+        pool = LobbyIDPool(lr, size=0)
+        assert not pool.start()
+        assert len(pool.take()) == 4
+        assert pool.stats()["generated"] == 1
+
+    def test_refill_skips_taken_IDs(self, lr):
+        for i in range(100):
+            lr.add(**vars(Lobby(lobby_ID=f"id{i}", timestamp=None)))
+        pool = LobbyIDPool(lr, size=20, generate_ID=sequential_IDs(taken=100))
+        assert pool.refill() == 20
+        taken = [pool.take() for _ in range(20)]
+        assert all(int(lobby_ID[2:]) >= 100 for lobby_ID in taken)
+        assert len(set(taken)) == 20
+        assert pool.stats()["rejected"] > 0
+
+    def test_background_refill(self, lr):
+        pool = LobbyIDPool(lr, size=10)
+        assert pool.start()
+        wait_until(lambda: pool.stats()["available"] == 10)
+        for _ in range(6):
+            assert lr.claim(Lobby(lobby_ID=pool.take(), timestamp=None))
+        wait_until(lambda: pool.stats()["available"] == 10)
+        pool.stop()
+        assert pool.stats()["taken"] == 6
+        assert pool.stats()["available"] == 10
@@ -0,0 +1,46 @@
+import json
+from api.api import create_app
+from api.repositories.lobby_repository import Lobby
+from api.repositories.memory_lobby_repository import MemoryLobbyRepository
+from ..mock_repositories.mock_fusion_repository import MockFusionRepository
+
+TEST_LOBBY_ID = "abcd"
+TEST_HOST = { "session_ID": "host", "nickname": "Host" }
+
+def my_client():
+    lr = MemoryLobbyRepository()
+    lr.add(**vars(Lobby(lobby_ID=TEST_LOBBY_ID, host=TEST_HOST, timestamp=None, votes=[0, 0])))
+    app = create_app(lr=lr, fr=MockFusionRepository())
+    app.config.update({
+        "TESTING": True,
+    })
+    return lr, app.test_client()
+
+class TestSnapshotRoute:
+    def test_requested_fields(self):
+        lr, client = my_client()
+        response = client.get(f"/lobby/get-lobby-snapshot?lobby-ID={TEST_LOBBY_ID}&fields=host,phase,votes")
+        data = json.loads(response.get_data(as_text=True))
+
+        assert response.status_code == 200
+        assert data["lobby"] == { "host": TEST_HOST, "phase": "setup", "votes": [0, 0] }
+        assert data["version"] == lr.get(lobby_ID=TEST_LOBBY_ID).version
+        assert response.headers["ETag"]
+
+    def test_not_modified_until_a_write(self):
+        lr, client = my_client()
+        url = f"/lobby/get-lobby-snapshot?lobby-ID={TEST_LOBBY_ID}"
+        etag = client.get(url).headers["ETag"]
+
+        response = client.get(url, headers={ "If-None-Match": etag })
+        assert response.status_code == 304 and response.get_data() == b""
+
+        lr.update_phase(lobby_ID=TEST_LOBBY_ID, phase="categories", must_exist=True)
+        response = client.get(url, headers={ "If-None-Match": etag })
+        assert response.status_code == 200 and response.headers["ETag"] != etag
+        assert json.loads(response.get_data(as_text=True))["lobby"]["phase"] == "categories"
+
+    def test_errors(self):
+        _, client = my_client()
+        assert client.get("/lobby/get-lobby-snapshot?lobby-ID=none").status_code == 404
+        assert client.get(f"/lobby/get-lobby-snapshot?lobby-ID={TEST_LOBBY_ID}&fields=host,password").status_code == 400
@@ -0,0 +1,32 @@
+from api.lobby.sweeper import LobbySweeper
+from ..test_repositories.test_single_flight import wait_until
+
+class FakeLobbyRepository:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.sweeps = 0
+
+    def delete_expired(self):
+        self.sweeps += 1
+        if self.fail:
+            raise RuntimeError("throttled")
+        return 3
+
+class TestLobbySweeper:
+    def test_disabled_by_default(self):
+        sweeper = LobbySweeper(FakeLobbyRepository(), interval=0)
+        assert not sweeper.start()
+
+    def test_sweeps_in_background(self):
+        lr = FakeLobbyRepository()
+        sweeper = LobbySweeper(lr, interval=0.01)
+        assert sweeper.start()
+        assert not sweeper.start()
+        wait_until(lambda: sweeper.sweeps >= 2)
+        sweeper.stop()
+        assert sweeper.stats()["deleted"] == 3 * sweeper.sweeps
+
+    def test_failures_counted(self):
+        sweeper = LobbySweeper(FakeLobbyRepository(fail=True), interval=0)
+        assert sweeper.sweep() == 0
+        assert sweeper.stats()["failed"] == 1
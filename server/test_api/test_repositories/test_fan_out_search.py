@@ -0,0 +1,84 @@
+import time
+from threading import Lock
+from api.repositories.search_cache import SearchCache
+from api.repositories.fusion_repository import Business, FusionRepository, IncompleteResults, merge_businesses, PAGE_SIZE
+
+SAL_GEOLOCATION = {
+    'latitude': '34.02116',
+    'longitude': '-118.287132'
+}
+
+def make_business(id: str, category: str) -> Business:
+    return Business(name=id, categories=[{'alias': category, 'title': category}], url="", image_url="", price="$", address="", phone="", id=id)
+
+class FakeFusionRepository(FusionRepository):
+    """Each category has its own pool of businesses; 'shared' shows up under every category"""
+    def __init__(self, pool_sizes: dict, latency: float = 0):
+        super().__init__(cache=SearchCache(), fan_out=True, max_workers=8)
+        self.pools = {
+            category: [make_business("shared", category)] + [make_business(f"{category}-{i}", category) for i in range(size - 1)]
+            for category, size in pool_sizes.items()
+        }
+        self.latency = latency
+        self.requests = []
+        self.failing = set()
+        self.lock = Lock()
+
+    def search(self, geolocation, categories, price, num_results, radius, offset=0):
+        with self.lock:
+            self.requests.append((tuple(categories), offset, num_results))
+        time.sleep(self.latency)
+        if categories and categories[0] in self.failing:
+            return IncompleteResults()
+        pool = self.pools[categories[0]] if categories else list(self.pools.values())[0]
+        return pool[offset:offset + num_results]
+
+class TestMergeBusinesses:
+    def test_round_robin_and_dedup(self):
+        a = [make_business("a1", "a"), make_business("shared", "a"), make_business("a2", "a")]
+        b = [make_business("shared", "b"), make_business("b1", "b")]
+        merged = merge_businesses([a, b], 10)
+        assert [business.id for business in merged] == ["a1", "shared", "b1", "a2"]
+
+    def test_truncates(self):
+        a = [make_business(f"a{i}", "a") for i in range(5)]
+        assert len(merge_businesses([a], 3)) == 3
+
+
+class TestFanOutSearch:
+    def test_categories_interleaved_fairly(self):
+        repository = FakeFusionRepository({"burgers": 30, "ethiopian": 3})
+        businesses = repository.get_all(geolocation=SAL_GEOLOCATION, categories=["burgers", "ethiopian"], price="1", num_results=10, radius=8047)
+        ids = [business.id for business in businesses]
+        assert len(ids) == 10 == len(set(ids))
+        assert {"ethiopian-0", "ethiopian-1"} <= set(ids)
+
+    def test_pages_beyond_single_request(self):
+        repository = FakeFusionRepository({"burgers": 200})
+        businesses = repository.get_all(geolocation=SAL_GEOLOCATION, categories=["burgers"], price="1", num_results=120, radius=8047)
+        assert len(businesses) == 120
+        assert sorted(offset for _, offset, _ in repository.requests) == [0, PAGE_SIZE, 2 * PAGE_SIZE]
+
+    def test_requests_run_concurrently(self):
+        repository = FakeFusionRepository({f"category{i}": 10 for i in range(4)}, latency=0.2)
+        start = time.monotonic()
+        repository.get_all(geolocation=SAL_GEOLOCATION, categories=list(repository.pools), price="1", num_results=20, radius=8047)
+        assert len(repository.requests) == 4
+        assert time.monotonic() - start < 0.6
+
+    def test_single_category_single_request(self):
+        repository = FakeFusionRepository({"burgers": 30})
+        repository.get_all(geolocation=SAL_GEOLOCATION, categories=["burgers"], price="1", num_results=10, radius=8047)
+        assert repository.requests == [(("burgers",), 0, 10)]
+
+    def test_partial_results_not_cached(self):
+        repository = FakeFusionRepository({"burgers": 30, "ethiopian": 3})
+        repository.failing.add("ethiopian")
+        search = dict(geolocation=SAL_GEOLOCATION, categories=["burgers", "ethiopian"], price="1", num_results=10, radius=8047)
+        assert len(repository.get_all(**search)) == 10    # still served
+        repository.failing.clear()
+        businesses = repository.get_all(**search)
+        assert len(repository.requests) == 4      # searched again instead of replaying the partial deck
+        assert "ethiopian-0" in {business.id for business in businesses}
+        repository.get_all(**search)
+        assert len(repository.requests) == 4
@@ -1,15 +1,38 @@
+import json
 import pytest
 from api.repositories.templates.fusion_header import fusion_header
 from api.repositories.fusion_repository import Business, FusionRepository
+from api.repositories.http_client import HttpClient
+from standins import serve_in_background
+from standins.fusion_standin import create_standin
 
 TEST_NAME = "McDonalds"
 TEST_CATEGORIES = ['Burger', 'Fast+Food']
 TEST_PRICE = "1%2C2%2C3"
 TEST_PHONE = "xxx-xxx-xxxx"
+TEST_URL = "https://www.yelp.com/biz/mcdonalds"
+TEST_IMAGE_URL = "https://s3-media1.fl.yelpcdn.com/bphoto/mcdonalds/o.jpg"
+TEST_ADDRESS = "3500 S Figueroa St\nLos Angeles, CA 90007"
+TEST_ID = "mcdonalds-los-angeles"
+TEST_RADIUS = 8047
 
 @pytest.fixture
 def my_business() -> Business:
-    return Business(name=TEST_NAME, categories=TEST_CATEGORIES, price=TEST_PRICE, phone=TEST_PHONE)
+    return Business(name=TEST_NAME, categories=TEST_CATEGORIES, url=TEST_URL, image_url=TEST_IMAGE_URL,
+                    price=TEST_PRICE, address=TEST_ADDRESS, phone=TEST_PHONE, id=TEST_ID)
+
+@pytest.fixture
+def yelp_business() -> dict:
+    return {
+        'id': TEST_ID,
+        'name': TEST_NAME,
+        'categories': [{'alias': 'burgers', 'title': 'Burgers'}],
+        'url': TEST_URL,
+        'image_url': TEST_IMAGE_URL,
+        'location': { 'display_address': TEST_ADDRESS.split('\n') },
+        'phone': TEST_PHONE,
+        'rating': 3.5,
+    }
 
 @pytest.fixture
 def sal_geolocation() -> dict:
@@ -18,9 +41,16 @@ def sal_geolocation() -> dict:
         'longitude': '-118.287132'
     }
 
+@pytest.fixture(scope="module")
+def standin_url():
+    # Local stand-in for api.yelp.com, so these tests don't need network access or burn API quota
+    url, server = serve_in_background(create_standin(seed=1))
+    yield url
+    server.shutdown()
+
 @pytest.fixture
-def my_repository() -> FusionRepository:
-    return FusionRepository()
+def my_repository(standin_url) -> FusionRepository:
+    return FusionRepository(api_url=standin_url)
 
 class TestBusiness:
     def test_init(self, my_business):
@@ -28,6 +58,23 @@ class TestBusiness:
         assert my_business.categories == TEST_CATEGORIES
         assert my_business.price == TEST_PRICE
         assert my_business.phone == TEST_PHONE
+        assert not hasattr(my_business, '__dict__')
+
+    def test_from_yelp(self, yelp_business):
+        business = Business.from_yelp(yelp_business)
+        assert business.id == TEST_ID
+        assert business.address == TEST_ADDRESS
+        assert business.price == ''     # missing price shouldn't raise
+        assert business.categories == yelp_business['categories']
+
+    def test_from_yelp_missing_address(self, yelp_business):
+        yelp_business['location']['display_address'] = []
+        assert Business.from_yelp(yelp_business).address == 'Address not provided'
+
+    def test_to_json(self, my_business):
+        encoded = my_business.to_json()
+        assert json.loads(encoded) == my_business.to_dict()
+        assert my_business.to_json() is encoded     # encoded once, then reused
     
 
 class TestFusionRepository:
@@ -35,13 +82,13 @@ class TestFusionRepository:
         assert my_repository.headers == fusion_header
 
     def test_add(self, my_business, my_repository):
-        assert my_repository.add(**vars(my_business)) == NotImplementedError
+        assert my_repository.add(**my_business.to_dict()) == NotImplementedError
 
     def test_get(self, my_repository):
         assert my_repository.get(email="") == NotImplementedError
 
     def test_get_all_single_result(self, my_business, sal_geolocation, my_repository):
-        response = my_repository.get_all(geolocation=sal_geolocation, categories=my_business.categories, price=my_business.price, num_results = 1)
+        response = my_repository.get_all(geolocation=sal_geolocation, categories=my_business.categories, price=my_business.price, num_results = 1, radius=TEST_RADIUS)
         assert len(response) == 1
         
         matched_flag = False
@@ -53,7 +100,7 @@ class TestFusionRepository:
         assert matched_flag
     
     def test_get_all_multiple_results(self, my_business, sal_geolocation, my_repository):
-        response = my_repository.get_all(geolocation=sal_geolocation, categories=my_business.categories, price=my_business.price, num_results = 3)
+        response = my_repository.get_all(geolocation=sal_geolocation, categories=my_business.categories, price=my_business.price, num_results = 3, radius=TEST_RADIUS)
         assert len(response) == 3
         
         matched_flag = True
@@ -74,7 +121,23 @@ class TestFusionRepository:
         assert matched_flag
     
     def test_update(self, my_business, my_repository):
-        assert my_repository.update(email="", **vars(my_business)) == NotImplementedError
+        assert my_repository.update(email="", **my_business.to_dict()) == NotImplementedError
     
     def test_delete(self, my_repository):
         assert my_repository.delete(email="") == NotImplementedError
+
+    def test_get_all_deterministic(self, my_business, sal_geolocation, standin_url):
+        first = FusionRepository(api_url=standin_url).get_all(geolocation=sal_geolocation, categories=my_business.categories, price=my_business.price, num_results=10, radius=TEST_RADIUS)
+        second = FusionRepository(api_url=standin_url).get_all(geolocation=sal_geolocation, categories=my_business.categories, price=my_business.price, num_results=10, radius=TEST_RADIUS)
+        assert first == second
+        assert len({ business.id for business in first }) == 10
+
+    def test_get_all_upstream_errors(self, my_business, sal_geolocation):
+        url, server = serve_in_background(create_standin(error_rate=1.0, error_statuses=(503,)))
+        try:
+            repository = FusionRepository(api_url=url, http=HttpClient(max_retries=1, sleep=lambda _: None))
+            response = repository.get_all(geolocation=sal_geolocation, categories=my_business.categories, price=my_business.price, num_results=10, radius=TEST_RADIUS)
+            assert response == []
+            assert repository.stats()["http"]["retries"] == 1
+        finally:
+            server.shutdown()
@@ -0,0 +1,138 @@
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from api.repositories.http_client import CircuitBreaker, CircuitOpenError, HttpClient, CLOSED, OPEN, HALF_OPEN
+
+TEST_URL = "https://api.yelp.com/v3/businesses/search"
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class ScriptedAdapter(BaseAdapter):
+    """Replays a fixed sequence of status codes (or exceptions) instead of touching the network"""
+    def __init__(self, script: list):
+        super().__init__()
+        self.script = list(script)
+        self.calls = 0
+        self.timeouts = []
+
+    def send(self, request, timeout=None, **kwargs):
+        self.calls += 1
+        self.timeouts.append(timeout)
+        outcome = self.script.pop(0) if len(self.script) > 1 else self.script[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        response = requests.Response()
+        response.status_code = outcome
+        response.request = request
+        response.url = request.url
+        response._content = b'{"businesses": []}'
+        return response
+
+    def close(self):
+        pass
+
+def my_client(script: list, breaker: CircuitBreaker = None, max_retries: int = 2) -> tuple[HttpClient, ScriptedAdapter]:
+    client = HttpClient(max_retries=max_retries, breaker=breaker, sleep=lambda _: None)
+    adapter = ScriptedAdapter(script)
+    client.session.mount('https://', adapter)
+    return client, adapter
+
+class TestHttpClient:
+    def test_success_uses_timeouts(self):
+        client, adapter = my_client([200])
+        assert client.get(TEST_URL).status_code == 200
+        assert adapter.calls == 1
+        assert adapter.timeouts[0] == client.timeout
+
+    def test_retries_on_server_errors(self):
+        client, adapter = my_client([503, 429, 200])
+        assert client.get(TEST_URL).status_code == 200
+        assert adapter.calls == 3
+        assert client.stats()["retries"] == 2
+
+    def test_gives_up_after_max_retries(self):
+        client, adapter = my_client([500], max_retries=1)
+        assert client.get(TEST_URL).status_code == 500
+        assert adapter.calls == 2
+
+    def test_does_not_retry_client_errors(self):
+        client, adapter = my_client([400])
+        assert client.get(TEST_URL).status_code == 400
+        assert adapter.calls == 1
+
+    def test_retries_connection_errors(self):
+        client, adapter = my_client([requests.exceptions.ConnectionError(), 200])
+        assert client.get(TEST_URL).status_code == 200
+        with pytest.raises(requests.exceptions.Timeout):
+            my_client([requests.exceptions.Timeout()], max_retries=0)[0].get(TEST_URL)
+
+    def test_backoff_is_bounded(self):
+        client, _ = my_client([200])
+        for attempt in range(10):
+            assert 0 <= client.backoff(attempt) <= client.backoff_cap
+
+
+class TestCircuitBreaker:
+    def test_trips_and_fails_fast(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=FakeClock())
+        client, adapter = my_client([500], breaker=breaker, max_retries=1)
+        client.get(TEST_URL)
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            client.get(TEST_URL)
+        assert adapter.calls == 2
+        assert breaker.stats()["rejected"] == 1
+
+    def test_half_open_recovery(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        clock.now += 31
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow()
+        assert not breaker.allow()     # only one trial request at a time
+        breaker.record_success()
+        assert breaker.state == CLOSED
+
+    def test_half_open_failure_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=clock)
+        for _ in range(3):
+            breaker.record_failure()
+        clock.now += 31
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert breaker.stats()["trips"] == 2
+
+    def test_half_open_trial_settled_by_other_errors(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+        client, adapter = my_client([requests.exceptions.TooManyRedirects("loop"), 200], breaker=breaker)
+        breaker.record_failure()
+        clock.now += 31
+        with pytest.raises(requests.exceptions.TooManyRedirects):
+            client.get(TEST_URL)
+        assert adapter.calls == 1       # not retried
+        assert breaker.state == OPEN
+        clock.now += 31
+        assert client.get(TEST_URL).status_code == 200
+        assert breaker.state == CLOSED
+
+    def test_half_open_trial_released_on_unexpected_errors(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+        client, _ = my_client([RuntimeError("boom"), 200], breaker=breaker)
+        breaker.record_failure()
+        clock.now += 31
+        with pytest.raises(RuntimeError):
+            client.get(TEST_URL)
+        assert breaker.state == HALF_OPEN
+        assert client.get(TEST_URL).status_code == 200
+        assert breaker.state == CLOSED
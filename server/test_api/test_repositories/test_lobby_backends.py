@@ -0,0 +1,232 @@
+import os
+import time
+import pytest
+import fakeredis
+from moto import mock_aws
+from api.repositories.lobby_backends import LOBBY_BACKENDS, create_lobby_repository
+from api.repositories.lobby_repository import LOBBY_NOT_FOUND, Lobby, expiry_from_timestamp
+from api.repositories.redis_lobby_repository import deck_key, lobby_keys
+from api.serialization import loads
+
+TEST_LOBBY_ID = "abcd"
+TEST_HOST = { "session_ID": "host", "nickname": "Host" }
+TEST_GUEST = { "session_ID": "guest", "nickname": "Guest" }
+
+# Every backend has to behave the same through this contract
+@pytest.fixture(params=list(LOBBY_BACKENDS))
+def lr(request):
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-west-1")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_aws():
+        if request.param == "redis":
+            lr = create_lobby_repository("redis", client=fakeredis.FakeRedis())
+        else:
+            lr = create_lobby_repository(request.param)
+        lr.create_tables()
+        lr.add(**vars(Lobby(lobby_ID=TEST_LOBBY_ID, host=TEST_HOST, timestamp=None, votes=[0, 0])))
+        yield lr
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_lobby_repository("sqlite")
+
+class TestLobbyContract:
+    def test_round_trip(self, lr):
+        lobby = lr.get(lobby_ID=TEST_LOBBY_ID)
+        assert (lobby.lobby_ID, lobby.host, lobby.joinable, lobby.phase) == (TEST_LOBBY_ID, TEST_HOST, True, "setup")
+        assert lobby.sessions == [] and lobby.categories == [] and lobby.businesses == [] and lobby.votes == [0, 0]
+        assert lobby.expires_at == expiry_from_timestamp(lobby.timestamp)
+        assert lr.get(lobby_ID="none") is None
+
+    def test_attributes(self, lr):
+        assert lr.get_attribute(lobby_ID=TEST_LOBBY_ID, attribute="host") == TEST_HOST
+        assert lr.get_attribute(lobby_ID="none", attribute="host") is LOBBY_NOT_FOUND
+        assert lr.get_attributes(lobby_ID=TEST_LOBBY_ID, attributes=["phase", "joinable"]) == { "phase": "setup", "joinable": True }
+        assert lr.get_attributes(lobby_ID="none", attributes=["phase"]) is None
+
+    def test_updates(self, lr):
+        assert lr.update_phase(lobby_ID=TEST_LOBBY_ID, phase="swiping", must_exist=True) is None
+        lr.update_joinable(lobby_ID=TEST_LOBBY_ID, joinable=False, must_exist=True)
+        lr.update_host(lobby_ID=TEST_LOBBY_ID, host=TEST_GUEST, must_exist=True)
+        lr.update_timestamp(lobby_ID=TEST_LOBBY_ID, timestamp="2030-01-01T00:00:00Z", must_exist=True)
+        lobby = lr.get(lobby_ID=TEST_LOBBY_ID)
+        assert (lobby.phase, lobby.joinable, lobby.host) == ("swiping", False, TEST_GUEST)
+        assert lobby.expires_at == expiry_from_timestamp("2030-01-01T00:00:00Z")
+
+    def test_preferences(self, lr):
+        preferences = { "priceRange": "$$", "numResults": "10" }
+        assert lr.update_preferences(lobby_ID=TEST_LOBBY_ID, preferences=preferences, must_exist=True) is None
+        lobby = lr.update_preferences(lobby_ID=TEST_LOBBY_ID, preferences=preferences, must_exist=True, return_values="ALL_NEW")
+        assert lobby["preferences"] == preferences and lobby["categories"] == []
+        assert lr.get_attribute(lobby_ID=TEST_LOBBY_ID, attribute="preferences") == preferences
+
+    def test_missing_lobby(self, lr):
+        assert lr.update_phase(lobby_ID="none", phase="swiping", must_exist=True) is LOBBY_NOT_FOUND
+        assert lr.update_votes(lobby_ID="none", votes=[1], must_exist=True) is LOBBY_NOT_FOUND
+        assert lr.update_businesses(lobby_ID="none", businesses=[{ "id": "a" }], must_exist=True) is LOBBY_NOT_FOUND
+        assert lr.add_session(lobby_ID="none", session=TEST_HOST) is LOBBY_NOT_FOUND
+        assert lr.add_category(lobby_ID="none", category="Tacos", session=TEST_HOST) is LOBBY_NOT_FOUND
+        assert lr.delete(lobby_ID="none", must_exist=True) is LOBBY_NOT_FOUND
+        assert lr.get(lobby_ID="none") is None
+
+    def test_delete(self, lr):
+        assert lr.delete(lobby_ID=TEST_LOBBY_ID, must_exist=True) is None
+        assert lr.get(lobby_ID=TEST_LOBBY_ID) is None
+        assert lr.get_votes(lobby_ID=TEST_LOBBY_ID) is None
+
+    def test_callers_get_copies(self, lr):
+        lr.get(lobby_ID=TEST_LOBBY_ID).host["nickname"] = "mutated"
+        lr.get_attribute(lobby_ID=TEST_LOBBY_ID, attribute="host")["nickname"] = "mutated"
+        assert lr.get(lobby_ID=TEST_LOBBY_ID).host == TEST_HOST
+
+
+class TestTransitionContract:
+    def test_transition(self, lr):
+        changes = lr.transition(lobby_ID=TEST_LOBBY_ID, from_phase="setup", to_phase="categories", joinable=False,
+                                timestamp="2030-01-01T00:00:00Z")
+        assert changes == { "phase": "categories", "joinable": False, "timestamp": "2030-01-01T00:00:00Z",
+                            "expires_at": expiry_from_timestamp("2030-01-01T00:00:00Z") }
+        lobby = lr.get(lobby_ID=TEST_LOBBY_ID)
+        assert (lobby.phase, lobby.joinable, lobby.timestamp, lobby.expires_at) == tuple(changes.values())
+        assert lr.get_expiries({ TEST_LOBBY_ID }) == { TEST_LOBBY_ID: changes["expires_at"] }
+
+    def test_only_given_attributes_change(self, lr):
+        timestamp = lr.get(lobby_ID=TEST_LOBBY_ID).timestamp
+        assert lr.transition(lobby_ID=TEST_LOBBY_ID, from_phase="setup", to_phase="categories") == { "phase": "categories" }
+        lobby = lr.get(lobby_ID=TEST_LOBBY_ID)
+        assert (lobby.phase, lobby.joinable, lobby.timestamp) == ("categories", True, timestamp)
+
+    def test_guarded_on_current_phase(self, lr):
+        lr.transition(lobby_ID=TEST_LOBBY_ID, from_phase="setup", to_phase="categories", joinable=False)
+        assert lr.transition(lobby_ID=TEST_LOBBY_ID, from_phase="setup", to_phase="categories", joinable=True) is LOBBY_NOT_FOUND
+        assert lr.get_attributes(lobby_ID=TEST_LOBBY_ID, attributes=["phase", "joinable"]) == { "phase": "categories", "joinable": False }
+        assert lr.transition(lobby_ID="none", from_phase="setup", to_phase="categories") is LOBBY_NOT_FOUND
+        assert lr.get(lobby_ID="none") is None
+
+
+class TestVersionContract:
+    def test_every_write_bumps(self, lr):
+        version = lr.get(lobby_ID=TEST_LOBBY_ID).version
+        lr.update_phase(lobby_ID=TEST_LOBBY_ID, phase="categories", must_exist=True)
+        lr.add_session(lobby_ID=TEST_LOBBY_ID, session=TEST_HOST)
+        lr.add_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=TEST_HOST)
+        lr.transition(lobby_ID=TEST_LOBBY_ID, from_phase="categories", to_phase="swiping")
+        assert lr.get_attributes(lobby_ID=TEST_LOBBY_ID, attributes=["version"]) == { "version": version + 4 }
+
+    def test_failed_writes_dont_bump(self, lr):
+        version = lr.get(lobby_ID=TEST_LOBBY_ID).version
+        lr.transition(lobby_ID=TEST_LOBBY_ID, from_phase="swiping", to_phase="results")
+        lr.remove_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=TEST_HOST)
+        assert lr.get(lobby_ID=TEST_LOBBY_ID, use_cache=False).version == version
+
+    def test_reused_ID_never_repeats_a_version(self, lr):
+        old = lr.get(lobby_ID=TEST_LOBBY_ID)
+        time.sleep(0.002)    # versions start at the creation ms, and real reuse comes 30+ minutes later
+        lr.claim(Lobby(lobby_ID=TEST_LOBBY_ID, host=TEST_GUEST, timestamp=None), now=old.expires_at + 30, grace=60)
+        assert lr.get(lobby_ID=TEST_LOBBY_ID).version > old.version
+
+
+class TestSessionsContract:
+    def test_join_order_and_idempotence(self, lr):
+        lr.add_session(lobby_ID=TEST_LOBBY_ID, session=TEST_HOST)
+        lr.add_session(lobby_ID=TEST_LOBBY_ID, session=TEST_GUEST)
+        lr.add_session(lobby_ID=TEST_LOBBY_ID, session=TEST_HOST)
+        assert [entry["session_info"] for entry in lr.get(lobby_ID=TEST_LOBBY_ID).sessions] == [TEST_HOST, TEST_GUEST]
+
+    def test_joins_after_a_stored_list(self, lr):
+        # Sessions stored as a list and sessions added later share one join-order convention
+        sessions = [{ "session_info": TEST_GUEST, "is_finished": False }, { "session_info": TEST_HOST, "is_finished": False }]
+        lr.add(**vars(Lobby(lobby_ID="efgh", host=TEST_HOST, timestamp=None, sessions=sessions)))
+        lr.add_session(lobby_ID="efgh", session={ "session_ID": "late", "nickname": "Late" })
+        assert [entry["session_info"]["session_ID"] for entry in lr.get(lobby_ID="efgh").sessions] == ["guest", "host", "late"]
+
+    def test_leave(self, lr):
+        lr.add_session(lobby_ID=TEST_LOBBY_ID, session=TEST_HOST)
+        lr.add_session(lobby_ID=TEST_LOBBY_ID, session=TEST_GUEST)
+        assert lr.remove_sessions(lobby_ID=TEST_LOBBY_ID, session=TEST_HOST) is None
+        assert lr.get_attribute(lobby_ID=TEST_LOBBY_ID, attribute="sessions") == [{ "session_info": TEST_GUEST, "is_finished": False }]
+
+    def test_update_session(self, lr):
+        lr.add_session(lobby_ID=TEST_LOBBY_ID, session=TEST_HOST)
+        lr.add_session(lobby_ID=TEST_LOBBY_ID, session=TEST_GUEST)
+        sessions = lr.update_session(lobby_ID=TEST_LOBBY_ID, session=TEST_GUEST, is_finished=True)
+        assert sessions == [{ "session_info": TEST_HOST, "is_finished": False }, { "session_info": TEST_GUEST, "is_finished": True }]
+        assert lr.update_session(lobby_ID=TEST_LOBBY_ID, session={ "session_ID": "stranger" }, is_finished=True) is LOBBY_NOT_FOUND
+        assert lr.update_session(lobby_ID="none", session=TEST_HOST, is_finished=True) is LOBBY_NOT_FOUND
+        assert lr.get(lobby_ID=TEST_LOBBY_ID).sessions == sessions
+
+
+class TestCategoriesContract:
+    def test_add_and_remove(self, lr):
+        lobby, is_new = lr.add_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=TEST_HOST)
+        assert is_new and lobby["categories"] == [{ "category": "Tacos", "sessions": [TEST_HOST] }]
+        lobby, is_new = lr.add_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=TEST_GUEST)
+        assert not is_new and sorted(session["session_ID"] for session in lobby["categories"][0]["sessions"]) == ["guest", "host"]
+        lobby = lr.remove_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=TEST_HOST)
+        assert lobby["categories"] == [{ "category": "Tacos", "sessions": [TEST_GUEST] }]
+        assert lr.remove_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=TEST_GUEST)["categories"] == []
+
+    def test_order(self, lr):
+        for category in ["Tacos", "Sushi", "Pizza"]:
+            lr.add_category(lobby_ID=TEST_LOBBY_ID, category=category, session=TEST_HOST)
+        lr.remove_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=TEST_HOST)
+        lr.add_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=TEST_GUEST)
+        assert [category["category"] for category in lr.get(lobby_ID=TEST_LOBBY_ID).categories] == ["Sushi", "Pizza", "Tacos"]
+
+    def test_not_a_member(self, lr):
+        lr.add_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=TEST_HOST)
+        assert lr.remove_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=TEST_GUEST) is LOBBY_NOT_FOUND
+        assert lr.remove_category(lobby_ID=TEST_LOBBY_ID, category="Sushi", session=TEST_HOST) is LOBBY_NOT_FOUND
+
+    def test_update_categories(self, lr):
+        categories = [{ "category": "Tacos", "sessions": [TEST_HOST] }, { "category": "Sushi", "sessions": [TEST_GUEST] }]
+        lr.update_categories(lobby_ID=TEST_LOBBY_ID, categories=categories, must_exist=True)
+        assert lr.get_attribute(lobby_ID=TEST_LOBBY_ID, attribute="categories") == categories
+
+
+class TestDeckAndVotesContract:
+    BUSINESSES = [{ "id": f"business{i}", "name": f"Business {i}", "rating": 4.5 } for i in range(5)]
+
+    def test_businesses(self, lr):
+        assert lr.update_businesses(lobby_ID=TEST_LOBBY_ID, businesses=self.BUSINESSES, must_exist=True) is None
+        assert lr.get(lobby_ID=TEST_LOBBY_ID).businesses == self.BUSINESSES
+        assert lr.get_attribute(lobby_ID=TEST_LOBBY_ID, attribute="businesses") == self.BUSINESSES
+
+    def test_votes_accumulate(self, lr):
+        lr.update_votes(lobby_ID=TEST_LOBBY_ID, votes=[1, 0, 1], must_exist=True, session_ID="host")
+        lr.update_votes(lobby_ID=TEST_LOBBY_ID, votes=[1, 1, 0], must_exist=True, session_ID="guest")
+        assert lr.get_votes(lobby_ID=TEST_LOBBY_ID) == [2, 1, 1]
+        assert lr.get_votes(lobby_ID="none") is None
+
+
+class TestLifetimeContract:
+    def test_claim(self, lr):
+        assert not lr.claim(Lobby(lobby_ID=TEST_LOBBY_ID, host=TEST_GUEST, timestamp=None))
+        assert lr.claim(Lobby(lobby_ID="free", host=TEST_GUEST, timestamp=None))
+        assert lr.get(lobby_ID="free").host == TEST_GUEST
+        assert lr.get(lobby_ID=TEST_LOBBY_ID).host == TEST_HOST
+
+    def test_claim_reusable_ID(self, lr):
+        expires_at = lr.get(lobby_ID=TEST_LOBBY_ID).expires_at
+        new_lobby = Lobby(lobby_ID=TEST_LOBBY_ID, host=TEST_GUEST, timestamp=None)
+        assert not lr.claim(new_lobby, now=expires_at + 120, grace=60)
+        assert lr.claim(new_lobby, now=expires_at + 30, grace=60)
+        assert lr.get(lobby_ID=TEST_LOBBY_ID).host == TEST_GUEST
+
+    def test_expiries(self, lr):
+        expires_at = lr.get(lobby_ID=TEST_LOBBY_ID).expires_at
+        assert lr.get_expiries({ TEST_LOBBY_ID, "none" }) == { TEST_LOBBY_ID: expires_at }
+
+    def test_delete_expired_keeps_live_lobbies(self, lr):
+        lr.delete_expired()
+        assert lr.get(lobby_ID=TEST_LOBBY_ID) is not None
+        assert lr.get_expiries({ TEST_LOBBY_ID })[TEST_LOBBY_ID] > time.time()
+
+@pytest.mark.parametrize("lr", ["redis"], indirect=True)
+def test_redis_deck_follows_lobby_expiry(lr):
+    lr.update_businesses(lobby_ID=TEST_LOBBY_ID, businesses=[{ "id": "a" }], must_exist=True)
+    ref = lr.redis.hget(lobby_keys(TEST_LOBBY_ID)["lobby"], "businesses_ref")
+    later = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 600))
+    lr.transition(lobby_ID=TEST_LOBBY_ID, from_phase="setup", to_phase="lobby", timestamp=later)
+    assert abs(lr.redis.ttl(deck_key(loads(ref))) - lr.redis.ttl(lobby_keys(TEST_LOBBY_ID)["lobby"])) <= 1
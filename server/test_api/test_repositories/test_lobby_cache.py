@@ -0,0 +1,92 @@
+from threading import Event
+from api.repositories.lobby_cache import LobbyCache
+from .test_single_flight import wait_until, run_concurrently
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class BlockingLoader:
+    """load() blocks until released, so concurrent readers pile up behind the first one"""
+    def __init__(self):
+        self.started = Event()
+        self.release = Event()
+        self.calls = 0
+
+    def __call__(self, lobby_ID):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return { "lobby_ID": lobby_ID, "sessions": [] }
+
+class TestLobbyCache:
+    def test_read_through(self):
+        cache, loads = LobbyCache(), []
+        load = lambda lobby_ID: loads.append(lobby_ID) or { "lobby_ID": lobby_ID }
+        assert cache.get_or_load("abcd", load) == { "lobby_ID": "abcd" }
+        assert cache.get_or_load("abcd", load) == { "lobby_ID": "abcd" }
+        assert loads == ["abcd"]
+        assert cache.stats()["hit_ratio"] == 0.5
+
+    def test_copies_are_isolated(self):
+        cache = LobbyCache()
+        lobby = cache.get_or_load("abcd", lambda lobby_ID: { "sessions": [] })
+        lobby["sessions"].append("mutated by a route")
+        assert cache.get_or_load("abcd", lambda lobby_ID: None) == { "sessions": [] }
+
+    def test_missing_lobbies_not_cached(self):
+        cache, loads = LobbyCache(), []
+        for _ in range(2):
+            assert cache.get_or_load("none", lambda lobby_ID: loads.append(lobby_ID)) is None
+        assert len(loads) == 2
+
+    def test_ttl(self):
+        clock = FakeClock()
+        cache, loads = LobbyCache(ttl=2, clock=clock), []
+        load = lambda lobby_ID: loads.append(lobby_ID) or {}
+        cache.get_or_load("abcd", load)
+        clock.now = 2.5
+        cache.get_or_load("abcd", load)
+        assert len(loads) == 2
+
+    def test_invalidate(self):
+        cache, loads = LobbyCache(), []
+        load = lambda lobby_ID: loads.append(lobby_ID) or { "phase": len(loads) }
+        cache.get_or_load("abcd", load)
+        cache.invalidate("abcd")
+        assert cache.get_or_load("abcd", load) == { "phase": 2 }
+        assert cache.stats()["invalidations"] == 1
+
+    def test_burst_costs_one_load(self):
+        cache, loader = LobbyCache(), BlockingLoader()
+        threads, results = run_concurrently(lambda: cache.get_or_load("abcd", loader), 8)
+        loader.started.wait(5)
+        wait_until(lambda: cache.flight.coalesced == 7)
+        loader.release.set()
+        for thread in threads:
+            thread.join()
+        assert loader.calls == 1
+        assert len(results) == 8 and all(result == { "lobby_ID": "abcd", "sessions": [] } for result in results)
+        assert len({ id(result) for result in results }) == 8
+
+    def test_read_racing_invalidation_not_stored(self):
+        cache, loader = LobbyCache(), BlockingLoader()
+        threads, _ = run_concurrently(lambda: cache.get_or_load("abcd", loader), 1)
+        loader.started.wait(5)
+        cache.invalidate("abcd")    # a write lands while the (now stale) read is in flight
+        loader.release.set()
+        threads[0].join()
+        assert cache.get("abcd") is None
+
+    def test_attributes_invalidated_with_lobby(self):
+        cache, loads = LobbyCache(), []
+        load = lambda lobby_ID: loads.append(lobby_ID) or { "phase": "setup" }
+        cache.get_or_load("abcd", load, attribute="phase")
+        cache.get_or_load("abcd", load, attribute="phase")
+        assert len(loads) == 1
+        cache.invalidate("abcd")
+        cache.get_or_load("abcd", load, attribute="phase")
+        assert len(loads) == 2
@@ -0,0 +1,412 @@
+import os
+import time
+import pytest
+from datetime import datetime, timezone
+from moto import mock_aws
+from api.repositories.lobby_repository import (LOBBY_NOT_FOUND, MAXIMUM_LOBBY_AGE, Lobby, LobbyRepository,
+                                             TIME_FORMAT, expiry_from_timestamp, is_expired, is_reusable,
+                                             vote_update_expressions)
+
+TEST_LOBBY_ID = "abcd"
+TEST_HOST = { "session_ID": "host" }
+
+def iso_timestamp(seconds: float) -> str:
+    return datetime.fromtimestamp(int(seconds), timezone.utc).strftime(TIME_FORMAT)
+
+@pytest.fixture(params=[0])
+def lr(request):
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-west-1")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_aws():
+        lr = LobbyRepository(vote_shards=request.param)
+        lr.create_tables()
+        lr.add(**vars(Lobby(lobby_ID=TEST_LOBBY_ID, host=TEST_HOST, timestamp=None, votes=[0, 0])))
+        yield lr
+
+class TestConditionalUpdates:
+    def test_existing_lobby(self, lr):
+        assert lr.update_phase(lobby_ID=TEST_LOBBY_ID, phase="categories", must_exist=True) is None
+        assert lr.get(lobby_ID=TEST_LOBBY_ID).phase == "categories"
+
+    def test_missing_lobby(self, lr):
+        assert lr.update_phase(lobby_ID="none", phase="categories", must_exist=True) is LOBBY_NOT_FOUND
+        assert lr.update_votes(lobby_ID="none", votes=[1], must_exist=True) is LOBBY_NOT_FOUND
+        assert lr.delete(lobby_ID="none", must_exist=True) is LOBBY_NOT_FOUND
+        assert lr.get(lobby_ID="none") is None   # no partial item upserted
+
+    def test_unconditional_upserts(self, lr):
+        lr.update_phase(lobby_ID="none", phase="categories")
+        assert lr.table.get_item(Key={ "lobby_ID": "none" })["Item"]["phase"] == "categories"
+
+    def test_return_values(self, lr):
+        preferences = { "priceRange": "$$" }
+        lobby = lr.update_preferences(lobby_ID=TEST_LOBBY_ID, preferences=preferences, must_exist=True, return_values="ALL_NEW")
+        assert lobby["preferences"] == preferences
+        assert lobby["host"] == TEST_HOST
+
+    def test_delete(self, lr):
+        assert lr.delete(lobby_ID=TEST_LOBBY_ID, must_exist=True) is None
+        assert lr.get(lobby_ID=TEST_LOBBY_ID) is None
+
+
+class TestVotes:
+    def test_single_expression(self):
+        chunks = vote_update_expressions([1, 0, 1])
+        assert len(chunks) == 1
+        expression, values = chunks[0]
+        assert expression == ("SET votes[0] = if_not_exists(votes[0], :zero) + :v0, "
+                              "votes[1] = if_not_exists(votes[1], :zero) + :v1, "
+                              "votes[2] = if_not_exists(votes[2], :zero) + :v2")
+        assert values == { ":zero": 0, ":v0": 1, ":v1": 0, ":v2": 1 }
+
+    def test_chunked_by_expression_size(self):
+        chunks = vote_update_expressions([1] * 30, max_bytes=200)
+        assert len(chunks) > 1
+        assert all(len(expression) <= 200 for expression, _ in chunks)
+        assert sorted(key for _, values in chunks for key in values if key != ":zero") == sorted(f":v{i}" for i in range(30))
+
+    def test_ballots_accumulate(self, lr):
+        lr.update_votes(lobby_ID=TEST_LOBBY_ID, votes=[1, 0, 1, 1], must_exist=True)
+        lr.update_votes(lobby_ID=TEST_LOBBY_ID, votes=[1, 1, 0, 1], must_exist=True)
+        assert lr.get(lobby_ID=TEST_LOBBY_ID).votes == [2, 1, 1, 2]
+
+    def test_one_round_trip_per_ballot(self, lr):
+        calls = []
+        lr.dynamodb.meta.client.meta.events.register('before-call.dynamodb.UpdateItem', lambda **kwargs: calls.append(1))
+        lr.update_votes(lobby_ID=TEST_LOBBY_ID, votes=[1] * 30, must_exist=True)
+        assert len(calls) == 1
+        assert lr.get(lobby_ID=TEST_LOBBY_ID).votes == [1] * 30
+
+
+class TestShardedVotes:
+    @pytest.mark.parametrize("lr", [4], indirect=True)
+    def test_ballots_spread_across_shards(self, lr):
+        lr.update_businesses(lobby_ID=TEST_LOBBY_ID, businesses=[{ "id": "a" }, { "id": "b" }, { "id": "c" }], must_exist=True)
+        for i in range(8):
+            lr.update_votes(lobby_ID=TEST_LOBBY_ID, votes=[1, 0, i % 2], must_exist=True, session_ID=f"session{i}")
+        assert lr.get_votes(lobby_ID=TEST_LOBBY_ID) == [8, 0, 4]
+        shards = [lr.table.get_item(Key={ "lobby_ID": key })["Item"]["votes"][0] for key in lr.vote_shard_keys(TEST_LOBBY_ID)]
+        assert sum(shards) == 8 and max(shards) < 8
+        assert lr.get(lobby_ID=TEST_LOBBY_ID).votes == [0, 0]     # lobby item isn't rewritten by ballots
+
+    @pytest.mark.parametrize("lr", [4], indirect=True)
+    def test_new_deck_resets_tally(self, lr):
+        lr.update_businesses(lobby_ID=TEST_LOBBY_ID, businesses=[{ "id": "a" }], must_exist=True)
+        lr.update_votes(lobby_ID=TEST_LOBBY_ID, votes=[1], must_exist=True)
+        lr.update_businesses(lobby_ID=TEST_LOBBY_ID, businesses=[{ "id": "b" }, { "id": "c" }], must_exist=True)
+        assert lr.get_votes(lobby_ID=TEST_LOBBY_ID) == [0, 0]
+
+    @pytest.mark.parametrize("lr", [4], indirect=True)
+    def test_missing_lobby(self, lr):
+        assert lr.get_votes(lobby_ID="none") is None
+        assert lr.update_votes(lobby_ID="none", votes=[1], must_exist=True) is LOBBY_NOT_FOUND
+
+    @pytest.mark.parametrize("lr", [4], indirect=True)
+    def test_delete_removes_shards(self, lr):
+        lr.update_businesses(lobby_ID=TEST_LOBBY_ID, businesses=[{ "id": "a" }], must_exist=True)
+        lr.delete(lobby_ID=TEST_LOBBY_ID, must_exist=True)
+        assert all("Item" not in lr.table.get_item(Key={ "lobby_ID": key }) for key in lr.vote_shard_keys(TEST_LOBBY_ID))
+
+    @pytest.mark.parametrize("lr", [2], indirect=True)
+    def test_shards_follow_lobby_expiry(self, lr):
+        lr.update_businesses(lobby_ID=TEST_LOBBY_ID, businesses=[{ "id": "a" }], must_exist=True)
+        expires_at = lr.get(lobby_ID=TEST_LOBBY_ID).expires_at
+        lr.transition(lobby_ID=TEST_LOBBY_ID, from_phase="setup", to_phase="results", timestamp=iso_timestamp(expires_at))
+        shards = [lr.table.get_item(Key={ "lobby_ID": key })["Item"] for key in lr.vote_shard_keys(TEST_LOBBY_ID)]
+        assert [shard["expires_at"] for shard in shards] == [expires_at + MAXIMUM_LOBBY_AGE] * 2
+
+        assert lr.delete_expired(now=expires_at + 120, grace=60) == 0
+        assert lr.update_votes(lobby_ID=TEST_LOBBY_ID, votes=[1], must_exist=True, session_ID="host") is not LOBBY_NOT_FOUND
+        assert lr.get_votes(lobby_ID=TEST_LOBBY_ID)[0] == 1
+
+    def test_unsharded_tally(self, lr):
+        lr.update_votes(lobby_ID=TEST_LOBBY_ID, votes=[1, 1], must_exist=True)
+        assert lr.get_votes(lobby_ID=TEST_LOBBY_ID) == [1, 1]
+        assert lr.get_votes(lobby_ID="none") is None
+
+
+class TestLobbyCache:
+    def count_get_items(self, lr):
+        calls = []
+        lr.dynamodb.meta.client.meta.events.register('before-call.dynamodb.GetItem', lambda **kwargs: calls.append(1))
+        return calls
+
+    def test_repeated_reads_cost_one_get_item(self, lr):
+        calls = self.count_get_items(lr)
+        for _ in range(5):
+            assert lr.get(lobby_ID=TEST_LOBBY_ID).host == TEST_HOST
+        assert len(calls) == 1
+
+    def test_mutations_invalidate(self, lr):
+        lr.get(lobby_ID=TEST_LOBBY_ID)
+        lr.update_phase(lobby_ID=TEST_LOBBY_ID, phase="swiping", must_exist=True)
+        assert lr.get(lobby_ID=TEST_LOBBY_ID).phase == "swiping"
+        lr.add_session(lobby_ID=TEST_LOBBY_ID, session=TEST_HOST)
+        assert len(lr.get(lobby_ID=TEST_LOBBY_ID).sessions) == 1
+        lr.delete(lobby_ID=TEST_LOBBY_ID)
+        assert lr.get(lobby_ID=TEST_LOBBY_ID) is None
+
+    def test_bypass(self, lr):
+        calls = self.count_get_items(lr)
+        lr.get(lobby_ID=TEST_LOBBY_ID)
+        lr.get(lobby_ID=TEST_LOBBY_ID, use_cache=False)
+        assert len(calls) == 2
+
+
+class TestProjectedReads:
+    def count_get_items(self, lr):
+        requests = []
+        lr.dynamodb.meta.client.meta.events.register('before-parameter-build.dynamodb.GetItem', lambda params, **kwargs: requests.append(params))
+        return requests
+
+    def test_get_attribute(self, lr):
+        requests = self.count_get_items(lr)
+        assert lr.get_attribute(lobby_ID=TEST_LOBBY_ID, attribute="host") == TEST_HOST
+        assert lr.get_attribute(lobby_ID=TEST_LOBBY_ID, attribute="joinable") is True
+        assert lr.get_attribute(lobby_ID=TEST_LOBBY_ID, attribute="timestamp") == lr.get(lobby_ID=TEST_LOBBY_ID).timestamp
+        assert lr.get_attribute(lobby_ID="none", attribute="phase") is LOBBY_NOT_FOUND
+        assert all("businesses" not in request["ExpressionAttributeNames"].values() for request in requests[:3])
+
+    def test_get_attributes(self, lr):
+        assert lr.get_attributes(lobby_ID=TEST_LOBBY_ID, attributes=["phase", "votes"]) == { "phase": "setup", "votes": [0, 0] }
+        assert lr.get_attributes(lobby_ID="none", attributes=["phase"]) is None
+
+    def test_cached_and_invalidated(self, lr):
+        requests = self.count_get_items(lr)
+        for _ in range(3):
+            assert lr.get_attribute(lobby_ID=TEST_LOBBY_ID, attribute="phase") == "setup"
+        assert len(requests) == 1
+        lr.update_phase(lobby_ID=TEST_LOBBY_ID, phase="swiping", must_exist=True)
+        assert lr.get_attribute(lobby_ID=TEST_LOBBY_ID, attribute="phase") == "swiping"
+        assert len(requests) == 2
+
+    def test_served_from_cached_lobby(self, lr):
+        lr.get(lobby_ID=TEST_LOBBY_ID)
+        requests = self.count_get_items(lr)
+        assert lr.get_attributes(lobby_ID=TEST_LOBBY_ID, attributes=["host"]) == { "host": TEST_HOST }
+        assert requests == []
+
+    def test_consistent_read(self, lr):
+        requests = self.count_get_items(lr)
+        lr.get_attribute(lobby_ID=TEST_LOBBY_ID, attribute="phase", consistent=True)
+        lr.get_attribute(lobby_ID=TEST_LOBBY_ID, attribute="phase", consistent=True)
+        assert len(requests) == 2 and requests[0]["ConsistentRead"] is True
+
+
+class TestExpiry:
+    def test_ttl_enabled(self, lr):
+        description = lr.dynamodb_client.describe_time_to_live(TableName="LobbyTable")["TimeToLiveDescription"]
+        assert description["TimeToLiveStatus"] == "ENABLED"
+        assert description["AttributeName"] == "expires_at"
+
+    def test_expires_at(self, lr):
+        lobby = lr.get(lobby_ID=TEST_LOBBY_ID)
+        assert lobby.expires_at == expiry_from_timestamp(lobby.timestamp)
+        assert 0 < lobby.expires_at - time.time() <= MAXIMUM_LOBBY_AGE
+        assert lr.table.get_item(Key={ "lobby_ID": TEST_LOBBY_ID })["Item"]["expires_at"] == lobby.expires_at
+
+    def test_refresh(self, lr):
+        lr.update_timestamp(lobby_ID=TEST_LOBBY_ID, timestamp="2030-01-01T00:00:00Z", must_exist=True)
+        assert lr.get(lobby_ID=TEST_LOBBY_ID).expires_at == 1893456000 + MAXIMUM_LOBBY_AGE
+
+    def test_legacy_items(self, lr):
+        lr.table.update_item(Key={ "lobby_ID": TEST_LOBBY_ID }, UpdateExpression="REMOVE expires_at")
+        lr.cache.clear()
+        lobby = lr.get(lobby_ID=TEST_LOBBY_ID)
+        assert lobby.expires_at == expiry_from_timestamp(lobby.timestamp)
+
+    @pytest.mark.parametrize("lr", [2], indirect=True)
+    def test_delete_expired(self, lr):
+        lr.update_businesses(lobby_ID=TEST_LOBBY_ID, businesses=[{ "id": "a" }])
+        lr.add(**vars(Lobby(lobby_ID="live", timestamp=None)))
+        lr.get(lobby_ID=TEST_LOBBY_ID)
+        now = int(time.time()) + MAXIMUM_LOBBY_AGE
+
+        assert lr.delete_expired(now=now, grace=60) == 0     # expired, but still within the grace period
+        assert lr.delete_expired(now=now + 120, grace=60) == 5    # both lobbies + 2 vote shards + the deck
+        assert lr.get(lobby_ID=TEST_LOBBY_ID) is None
+
+    def test_refresh_extends_deck(self, lr):
+        lr.update_businesses(lobby_ID=TEST_LOBBY_ID, businesses=[{ "id": "a" }], must_exist=True)
+        expires_at = lr.get(lobby_ID=TEST_LOBBY_ID).expires_at
+        lr.update_timestamp(lobby_ID=TEST_LOBBY_ID, timestamp=iso_timestamp(expires_at), must_exist=True)
+        ref = lr.table.get_item(Key={ "lobby_ID": TEST_LOBBY_ID })["Item"]["businesses_ref"]
+        assert lr.deck_table.get_item(Key={ "deck_ID": ref })["Item"]["expires_at"] == expires_at + MAXIMUM_LOBBY_AGE
+
+        assert lr.delete_expired(now=expires_at + 120, grace=60) == 0    # past the old expiry, the deck stays
+        lr.decks.clear()
+        assert lr.get(lobby_ID=TEST_LOBBY_ID, use_cache=False).businesses == [{ "id": "a" }]
+
+    def test_deck_expiry_never_moves_in(self, lr):
+        lr.add(**vars(Lobby(lobby_ID="later", timestamp=iso_timestamp(time.time() + 600))))
+        lr.update_businesses(lobby_ID="later", businesses=[{ "id": "a" }])
+        lr.update_businesses(lobby_ID=TEST_LOBBY_ID, businesses=[{ "id": "a" }])    # same deck, shorter-lived lobby
+        assert lr.deck_table.scan()["Items"][0]["expires_at"] == lr.get(lobby_ID="later").expires_at
+
+    def test_delete_expired_pages(self, lr):
+        for i in range(30):
+            lr.add(**vars(Lobby(lobby_ID=f"old{i}", timestamp="2020-01-01T00:00:00Z")))
+        assert lr.delete_expired(grace=0) == 30
+        assert lr.get(lobby_ID=TEST_LOBBY_ID) is not None
+
+    def test_is_expired(self):
+        now = int(time.time())
+        assert is_expired(now - 1)
+        assert not is_expired(now + 60)
+        assert not is_expired(now - 1, grace=60)
+        assert is_reusable(now - 1, grace=60)
+        assert not is_reusable(now - 120, grace=60)   # sweepable, so never handed out again
+        assert not is_reusable(None)
+
+
+class TestSessions:
+    GUEST = { "session_ID": "guest", "nickname": "Guest" }
+
+    def count_writes(self, lr):
+        calls = []
+        lr.dynamodb.meta.client.meta.events.register('before-call.dynamodb', lambda event_name, **kwargs: calls.append(event_name))
+        return calls
+
+    def test_join_and_leave_in_one_write(self, lr):
+        calls = self.count_writes(lr)
+        lr.add_session(lobby_ID=TEST_LOBBY_ID, session=TEST_HOST)
+        lr.add_session(lobby_ID=TEST_LOBBY_ID, session=self.GUEST)
+        lr.remove_sessions(lobby_ID=TEST_LOBBY_ID, session=TEST_HOST)
+        assert calls == ["before-call.dynamodb.UpdateItem"] * 3
+        assert lr.get(lobby_ID=TEST_LOBBY_ID).sessions == [{ "session_info": self.GUEST, "is_finished": False }]
+
+    def test_join_order_and_idempotence(self, lr):
+        lr.add_session(lobby_ID=TEST_LOBBY_ID, session=TEST_HOST)
+        lr.add_session(lobby_ID=TEST_LOBBY_ID, session=self.GUEST)
+        lr.update_session(lobby_ID=TEST_LOBBY_ID, session=TEST_HOST, is_finished=True)
+        lr.add_session(lobby_ID=TEST_LOBBY_ID, session=TEST_HOST)    # rejoining keeps progress
+        assert lr.get_attribute(lobby_ID=TEST_LOBBY_ID, attribute="sessions") == [
+            { "session_info": TEST_HOST, "is_finished": True },
+            { "session_info": self.GUEST, "is_finished": False },
+        ]
+
+    def test_leave_only_removes_that_session(self, lr):
+        lr.add_session(lobby_ID=TEST_LOBBY_ID, session=TEST_HOST)
+        lr.remove_sessions(lobby_ID=TEST_LOBBY_ID, session=self.GUEST)    # never joined
+        assert len(lr.get(lobby_ID=TEST_LOBBY_ID).sessions) == 1
+
+    def test_update_session(self, lr):
+        lr.add_session(lobby_ID=TEST_LOBBY_ID, session=TEST_HOST)
+        sessions = lr.update_session(lobby_ID=TEST_LOBBY_ID, session=TEST_HOST, is_finished=True)
+        assert sessions == [{ "session_info": TEST_HOST, "is_finished": True }]
+        assert lr.update_session(lobby_ID=TEST_LOBBY_ID, session=self.GUEST, is_finished=True) is LOBBY_NOT_FOUND
+        assert lr.get(lobby_ID=TEST_LOBBY_ID).sessions == sessions
+
+    def test_missing_lobby(self, lr):
+        assert lr.add_session(lobby_ID="none", session=TEST_HOST) is LOBBY_NOT_FOUND
+        assert lr.remove_sessions(lobby_ID="none", session=TEST_HOST) is LOBBY_NOT_FOUND
+        assert lr.get(lobby_ID="none") is None
+
+    def test_stored_as_map(self, lr):
+        lr.add(**vars(Lobby(lobby_ID="efgh", timestamp=None, sessions=[{ "session_info": TEST_HOST, "is_finished": False }])))
+        lr.add_session(lobby_ID="efgh", session=self.GUEST)
+        assert set(lr.table.get_item(Key={ "lobby_ID": "efgh" })["Item"]["sessions"]) == { "host", "guest" }
+        assert [entry["session_info"] for entry in lr.get(lobby_ID="efgh").sessions] == [TEST_HOST, self.GUEST]
+
+
+class TestCategories:
+    GUEST = { "session_ID": "guest", "nickname": "Guest" }
+
+    def test_add_and_remove_in_one_write(self, lr):
+        calls = []
+        lr.dynamodb.meta.client.meta.events.register('before-call.dynamodb', lambda event_name, **kwargs: calls.append(event_name))
+        lobby, is_new = lr.add_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=TEST_HOST)
+        assert is_new and lobby["categories"] == [{ "category": "Tacos", "sessions": [TEST_HOST] }]
+        lobby, is_new = lr.add_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=self.GUEST)
+        assert not is_new and len(lobby["categories"][0]["sessions"]) == 2
+        lobby = lr.remove_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=TEST_HOST)
+        assert lobby["categories"] == [{ "category": "Tacos", "sessions": [self.GUEST] }]
+        assert calls == ["before-call.dynamodb.UpdateItem"] * 3
+
+    def test_order_kept(self, lr):
+        for category in ["Tacos", "Sushi", "Pizza"]:
+            lr.add_category(lobby_ID=TEST_LOBBY_ID, category=category, session=TEST_HOST)
+        lr.remove_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=TEST_HOST)
+        lr.add_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=self.GUEST)   # re-chosen, so it goes last
+        assert [category["category"] for category in lr.get(lobby_ID=TEST_LOBBY_ID).categories] == ["Sushi", "Pizza", "Tacos"]
+
+    def test_last_member_removes_category(self, lr):
+        lr.add_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=TEST_HOST)
+        assert lr.remove_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=TEST_HOST)["categories"] == []
+        assert lr.get_attribute(lobby_ID=TEST_LOBBY_ID, attribute="categories") == []
+
+    def test_not_a_member(self, lr):
+        lr.add_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=TEST_HOST)
+        assert lr.remove_category(lobby_ID=TEST_LOBBY_ID, category="Tacos", session=self.GUEST) is LOBBY_NOT_FOUND
+        assert lr.remove_category(lobby_ID=TEST_LOBBY_ID, category="Sushi", session=TEST_HOST) is LOBBY_NOT_FOUND
+        assert lr.add_category(lobby_ID="none", category="Tacos", session=TEST_HOST) is LOBBY_NOT_FOUND
+        assert lr.get(lobby_ID="none") is None
+
+    def test_update_categories(self, lr):
+        categories = [{ "category": "Tacos", "sessions": [TEST_HOST, self.GUEST] }, { "category": "Sushi", "sessions": [] }]
+        lr.update_categories(lobby_ID=TEST_LOBBY_ID, categories=categories, must_exist=True)
+        categories = lr.get(lobby_ID=TEST_LOBBY_ID).categories    # empty categories dropped, members come back sorted
+        assert categories == [{ "category": "Tacos", "sessions": [self.GUEST, TEST_HOST] }]
+
+
+class TestDecks:
+    BUSINESSES = [{ "id": f"business{i}", "name": f"Business {i}", "rating": 4.5 } for i in range(20)]
+
+    def test_stored_out_of_line(self, lr):
+        lr.update_businesses(lobby_ID=TEST_LOBBY_ID, businesses=self.BUSINESSES, must_exist=True)
+        item = lr.table.get_item(Key={ "lobby_ID": TEST_LOBBY_ID })["Item"]
+        assert "businesses" not in item
+        deck = lr.deck_table.get_item(Key={ "deck_ID": item["businesses_ref"] })["Item"]["deck"]
+        assert len(deck.value) < len(str(self.BUSINESSES))    # compressed
+
+    def test_read_back(self, lr):
+        lr.update_businesses(lobby_ID=TEST_LOBBY_ID, businesses=self.BUSINESSES, must_exist=True)
+        lr.decks.clear()
+        assert lr.get(lobby_ID=TEST_LOBBY_ID).businesses == self.BUSINESSES
+        assert lr.get_attribute(lobby_ID=TEST_LOBBY_ID, attribute="businesses") == self.BUSINESSES
+        assert lr.get_attributes(lobby_ID="none", attributes=["businesses"]) is None
+
+    def test_identical_searches_share_a_deck(self, lr):
+        lr.add(**vars(Lobby(lobby_ID="efgh", timestamp=None)))
+        lr.update_businesses(lobby_ID=TEST_LOBBY_ID, businesses=self.BUSINESSES)
+        lr.update_businesses(lobby_ID="efgh", businesses=self.BUSINESSES)
+        assert lr.deck_table.scan()["Count"] == 1
+        assert lr.get(lobby_ID="efgh").businesses == lr.get(lobby_ID=TEST_LOBBY_ID).businesses
+
+    def test_deck_cache(self, lr):
+        lr.update_businesses(lobby_ID=TEST_LOBBY_ID, businesses=self.BUSINESSES)
+        requests = []
+        lr.dynamodb.meta.client.meta.events.register('before-parameter-build.dynamodb.GetItem', lambda params, **kwargs: requests.append(params))
+        lr.get(lobby_ID=TEST_LOBBY_ID).businesses.clear()   # callers get their own copy
+        assert lr.get(lobby_ID=TEST_LOBBY_ID, use_cache=False).businesses == self.BUSINESSES
+        assert [request["TableName"] for request in requests] == ["LobbyTable", "LobbyTable"]
+
+    def test_legacy_inline_businesses(self, lr):
+        lr.table.update_item(Key={ "lobby_ID": TEST_LOBBY_ID }, UpdateExpression="SET businesses = :businesses",
+                             ExpressionAttributeValues={ ":businesses": [{ "id": "a" }] })
+        lr.cache.clear()
+        assert lr.get(lobby_ID=TEST_LOBBY_ID).businesses == [{ "id": "a" }]
+
+
+class TestClaim:
+    def test_free_ID(self, lr):
+        assert lr.claim(Lobby(lobby_ID="free", host=TEST_HOST, timestamp=None))
+        assert lr.get(lobby_ID="free").host == TEST_HOST
+
+    def test_taken_ID(self, lr):
+        assert not lr.claim(Lobby(lobby_ID=TEST_LOBBY_ID, host={ "session_ID": "intruder" }, timestamp=None))
+        assert lr.get(lobby_ID=TEST_LOBBY_ID).host == TEST_HOST
+
+    def test_expired_ID(self, lr):
+        expires_at = lr.get(lobby_ID=TEST_LOBBY_ID).expires_at
+        new_lobby = Lobby(lobby_ID=TEST_LOBBY_ID, host={ "session_ID": "new" }, timestamp=None)
+        assert not lr.claim(new_lobby, now=expires_at + 120, grace=60)     # may be swept at any moment
+        assert lr.claim(new_lobby, now=expires_at + 30, grace=60)
+        assert lr.get(lobby_ID=TEST_LOBBY_ID).host == { "session_ID": "new" }
+
+    def test_one_round_trip(self, lr):
+        calls = []
+        lr.dynamodb.meta.client.meta.events.register('before-call.dynamodb', lambda **kwargs: calls.append(1))
+        lr.claim(Lobby(lobby_ID=TEST_LOBBY_ID, host=TEST_HOST, timestamp=None))
+        assert len(calls) == 1
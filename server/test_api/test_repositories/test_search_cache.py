@@ -0,0 +1,101 @@
+import pytest
+from api.repositories.search_cache import SearchCache, make_search_key
+from api.repositories.fusion_repository import FusionRepository
+
+SAL_GEOLOCATION = {
+    'latitude': '34.02116',
+    'longitude': '-118.287132'
+}
+NEARBY_GEOLOCATION = {
+    'latitude': '34.02124',
+    'longitude': '-118.28708'
+}
+TEST_CATEGORIES = ['burgers', 'hotdogs']
+TEST_PRICE = "1%2C2"
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class CountingFusionRepository(FusionRepository):
+    def __init__(self, cache: SearchCache):
+        super().__init__(cache=cache)
+        self.calls = 0
+
+    def search(self, geolocation, categories, price, num_results, radius):
+        self.calls += 1
+        return ["business"] * num_results
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+@pytest.fixture
+def my_cache(clock) -> SearchCache:
+    return SearchCache(ttl=60, max_entries=2, max_bytes=1024 * 1024, clock=clock)
+
+class TestSearchKey:
+    def test_nearby_coordinates_share_bucket(self):
+        key = make_search_key(SAL_GEOLOCATION, TEST_CATEGORIES, TEST_PRICE, 10, 8047)
+        nearby_key = make_search_key(NEARBY_GEOLOCATION, TEST_CATEGORIES, TEST_PRICE, 10, 8047)
+        assert key == nearby_key
+
+    def test_categories_normalized(self):
+        key = make_search_key(SAL_GEOLOCATION, ['Hotdogs ', 'burgers', 'burgers'], TEST_PRICE, 10, 8047)
+        assert key == make_search_key(SAL_GEOLOCATION, TEST_CATEGORIES, TEST_PRICE, 10, 8047)
+
+    def test_preferences_distinguish_keys(self):
+        key = make_search_key(SAL_GEOLOCATION, TEST_CATEGORIES, TEST_PRICE, 10, 8047)
+        assert key != make_search_key(SAL_GEOLOCATION, TEST_CATEGORIES, TEST_PRICE, 20, 8047)
+        assert key != make_search_key(SAL_GEOLOCATION, TEST_CATEGORIES, "1", 10, 8047)
+        assert key != make_search_key(SAL_GEOLOCATION, TEST_CATEGORIES, TEST_PRICE, 10, 16093)
+
+
+class TestSearchCache:
+    def test_hit_and_miss(self, my_cache):
+        assert my_cache.get("a") is None
+        my_cache.put("a", [1, 2, 3])
+        assert my_cache.get("a") == [1, 2, 3]
+        assert my_cache.stats()["hits"] == 1
+        assert my_cache.stats()["misses"] == 1
+
+    def test_ttl_expiry(self, my_cache, clock):
+        my_cache.put("a", [1])
+        clock.now += 61
+        assert my_cache.get("a") is None
+        assert my_cache.stats()["expirations"] == 1
+        assert len(my_cache) == 0
+
+    def test_lru_eviction(self, my_cache):
+        my_cache.put("a", [1])
+        my_cache.put("b", [2])
+        my_cache.get("a")           # "b" is now least recently used
+        my_cache.put("c", [3])
+        assert my_cache.get("b") is None
+        assert my_cache.get("a") == [1]
+        assert my_cache.stats()["evictions"] == 1
+
+    def test_memory_cap(self, clock):
+        cache = SearchCache(ttl=60, max_entries=100, max_bytes=2048, clock=clock)
+        for i in range(10):
+            cache.put(i, "x" * 500)
+        assert cache.stats()["bytes"] <= 2048
+        assert cache.stats()["evictions"] > 0
+
+    def test_oversized_value_skipped(self, clock):
+        cache = SearchCache(ttl=60, max_entries=100, max_bytes=128, clock=clock)
+        cache.put("a", "x" * 1024)
+        assert len(cache) == 0
+
+
+class TestFusionRepositoryCache:
+    def test_repeat_search_served_from_cache(self, my_cache):
+        repository = CountingFusionRepository(cache=my_cache)
+        first = repository.get_all(geolocation=SAL_GEOLOCATION, categories=TEST_CATEGORIES, price=TEST_PRICE, num_results=10, radius=8047)
+        second = repository.get_all(geolocation=NEARBY_GEOLOCATION, categories=TEST_CATEGORIES[::-1], price=TEST_PRICE, num_results=10, radius=8047)
+        assert first == second
+        assert repository.calls == 1
+        assert repository.stats()["cache"]["hits"] == 1
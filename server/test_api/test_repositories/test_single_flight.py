@@ -0,0 +1,106 @@
+import time
+from threading import Event, Thread
+from api.repositories.single_flight import SingleFlight
+from api.repositories.search_cache import SearchCache
+from api.repositories.fusion_repository import FusionRepository
+
+SAL_GEOLOCATION = {
+    'latitude': '34.02116',
+    'longitude': '-118.287132'
+}
+
+class BlockingFusionRepository(FusionRepository):
+    """search() blocks until released, so concurrent callers pile up behind the first one"""
+    def __init__(self):
+        super().__init__(cache=SearchCache())
+        self.started = Event()
+        self.release = Event()
+        self.calls = 0
+
+    def search(self, geolocation, categories, price, num_results, radius):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return ["business"] * num_results
+
+def wait_until(predicate, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+def run_concurrently(fn, n: int) -> tuple[list[Thread], list]:
+    results = []
+    threads = [Thread(target=lambda: results.append(fn())) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+class TestSingleFlight:
+    def test_sequential_calls_not_coalesced(self):
+        flight = SingleFlight()
+        assert flight.do("a", lambda: 1) == 1
+        assert flight.do("a", lambda: 2) == 2
+        assert flight.stats()["coalesced"] == 0
+        assert flight.stats()["in_flight"] == 0
+
+    def test_concurrent_calls_share_result(self):
+        flight, release = SingleFlight(), Event()
+        executions = []
+        def slow():
+            executions.append(1)
+            release.wait(5)
+            return "result"
+
+        leader, leader_results = run_concurrently(lambda: flight.do("a", slow), 1)
+        wait_until(lambda: flight.in_flight() == 1)
+        followers, follower_results = run_concurrently(lambda: flight.do("a", slow), 4)
+        wait_until(lambda: flight.stats()["coalesced"] == 4)
+        release.set()
+        for thread in leader + followers:
+            thread.join()
+
+        assert len(executions) == 1
+        assert leader_results + follower_results == ["result"] * 5
+        assert flight.stats()["coalesced"] == 4
+
+    def test_error_shared_with_waiters(self):
+        flight, release = SingleFlight(), Event()
+        error = ValueError("upstream failed")
+        def failing():
+            release.wait(5)
+            raise error
+        def call():
+            try:
+                return flight.do("a", failing)
+            except ValueError as raised:
+                return raised
+
+        leader, leader_results = run_concurrently(call, 1)
+        wait_until(lambda: flight.in_flight() == 1)
+        followers, follower_results = run_concurrently(call, 3)
+        wait_until(lambda: flight.stats()["coalesced"] == 3)
+        release.set()
+        for thread in leader + followers:
+            thread.join()
+
+        assert all(result is error for result in leader_results + follower_results)
+        assert len(leader_results + follower_results) == 4
+        assert flight.stats()["executions"] == 1
+        assert flight.in_flight() == 0
+
+
+class TestFusionRepositoryCoalescing:
+    def test_identical_searches_issue_one_upstream_call(self):
+        repository = BlockingFusionRepository()
+        search = lambda: repository.get_all(geolocation=SAL_GEOLOCATION, categories=['burgers'], price="1", num_results=10, radius=8047)
+
+        threads, results = run_concurrently(search, 1)
+        repository.started.wait(5)
+        more_threads, _ = run_concurrently(search, 5)
+        wait_until(lambda: repository.flight.stats()["coalesced"] == 5)
+        repository.release.set()
+        for thread in threads + more_threads:
+            thread.join()
+
+        assert repository.calls == 1
+        assert repository.stats()["single_flight"]["coalesced"] == 5
@@ -0,0 +1,42 @@
+import os
+import re
+import pytest
+from api.selection.category_catalog import CATALOG, CategoryCatalog
+from api.selection.search_params import build_search_params
+
+CLIENT_CATEGORY_MAP = os.path.join(os.path.dirname(__file__), "..", "..", "..", "client", "src", "utils", "CategoryMap.js")
+SAL_ADDRESS = { "latitude": 34.02116, "longitude": -118.287132 }
+
+def search_categories(*names):
+    params, error = build_search_params(SAL_ADDRESS, [{ "category": name } for name in names], "$$", 10, 5)
+    return params["categories"] if params else error
+
+class TestCategoryCatalog:
+    def test_resolves_names_and_aliases(self):
+        assert CATALOG.resolve("Fast Food") == "hotdogs"
+        assert CATALOG.resolve("  fast   FOOD ") == "hotdogs"
+        assert CATALOG.resolve("Breakfast & brunch") == "breakfast_brunch"
+        assert CATALOG.resolve("hotdogs") == "hotdogs"
+        assert CATALOG.resolve("fried") is None
+        assert CATALOG.resolve(None) is None
+        assert "Tacos" in CATALOG
+
+    def test_canonicalize(self):
+        catalog = CategoryCatalog({ "US": { "Tacos": "tacos", "Burgers": "burgers" } })
+        assert catalog.canonicalize(["tacos", "Burgers", "TACOS"]) == (["burgers", "tacos"], [])
+        assert catalog.canonicalize(["Tacos", "pizza"]) == (["tacos"], ["pizza"])
+
+    def test_equivalent_selections_share_a_query(self):
+        assert search_categories("Tacos", "Fast Food") == search_categories("fast food", "tacos", "TACOS") == ["hotdogs", "tacos"]
+
+    def test_unknown_category_rejected(self):
+        assert search_categories("Tacos", "fried") == "Invalid category requested"
+
+    def test_matches_client_category_map(self):
+        if not os.path.exists(CLIENT_CATEGORY_MAP):
+            pytest.skip("client sources not available")
+        with open(CLIENT_CATEGORY_MAP, encoding="utf-8") as f:
+            source = f.read()
+        countries = re.split(r'\[\s*"([A-Z]{2})",\s*new Map', source)[1:]
+        client = { country: dict(re.findall(r'"([^"]+)":\s*"([^"]+)"', body)) for country, body in zip(countries[::2], countries[1::2]) }
+        assert client == CATALOG.countries
@@ -0,0 +1,86 @@
+import time
+import pytest
+from threading import Event
+from api.selection.prefetcher import Prefetcher
+
+TEST_PREFERENCES = {
+    "coordinates": {
+        "latitude": 34.02116,
+        "longitude": -118.287132,
+        "name": "USC"
+    },
+    "numResults": "10",
+    "driveRadius": "5",
+    "priceRange": "$$"
+}
+UNSET_PREFERENCES = {
+    "coordinates": {
+        "latitude": 91,
+        "longitude": 181,
+        "name": ""
+    },
+    "numResults": "10",
+    "driveRadius": "5",
+    "priceRange": "$"
+}
+TEST_CATEGORIES = [{ "category": "Burgers", "sessions": [] }]
+
+class RecordingFusionRepository:
+    def __init__(self):
+        self.searches = []
+        self.searched = Event()
+
+    def get_all(self, geolocation, categories, price, num_results, radius):
+        self.searches.append((categories, price, num_results, radius))
+        self.searched.set()
+        return []
+
+@pytest.fixture
+def my_repository() -> RecordingFusionRepository:
+    return RecordingFusionRepository()
+
+class TestPrefetcher:
+    def test_prefetch_runs_after_delay(self, my_repository):
+        prefetcher = Prefetcher(my_repository, delay=0.01)
+        assert prefetcher.schedule("ABCD", TEST_PREFERENCES, TEST_CATEGORIES, "categories")
+        assert my_repository.searched.wait(2)
+        assert my_repository.searches == [(["burgers"], "1%2C2", 10, 8047)]
+
+    def test_changes_are_debounced(self, my_repository):
+        prefetcher = Prefetcher(my_repository, delay=0.1)
+        prefetcher.schedule("ABCD", TEST_PREFERENCES, TEST_CATEGORIES, "categories")
+        prefetcher.schedule("ABCD", TEST_PREFERENCES, TEST_CATEGORIES + [{ "category": "Tacos", "sessions": [] }], "categories")
+        assert my_repository.searched.wait(2)
+        time.sleep(0.2)
+        assert my_repository.searches == [(["burgers", "tacos"], "1%2C2", 10, 8047)]
+        assert prefetcher.stats()["cancelled"] == 1
+
+    def test_cancel(self, my_repository):
+        prefetcher = Prefetcher(my_repository, delay=0.05)
+        prefetcher.schedule("ABCD", TEST_PREFERENCES, TEST_CATEGORIES, "categories")
+        prefetcher.cancel("ABCD")
+        time.sleep(0.1)
+        assert my_repository.searches == []
+        assert prefetcher.pending() == 0
+
+    def test_invalid_preferences_skipped(self, my_repository):
+        prefetcher = Prefetcher(my_repository, delay=0.01)
+        assert not prefetcher.schedule("ABCD", UNSET_PREFERENCES, TEST_CATEGORIES, "categories")
+        assert prefetcher.stats()["skipped"] == 1
+        assert prefetcher.pending() == 0
+
+    def test_no_categories_skipped(self, my_repository):
+        prefetcher = Prefetcher(my_repository, delay=0.01)
+        assert not prefetcher.schedule("ABCD", TEST_PREFERENCES, [], "categories")
+        time.sleep(0.05)
+        assert my_repository.searches == []
+        assert prefetcher.stats()["skipped"] == 1
+
+    def test_other_phases_skipped(self, my_repository):
+        prefetcher = Prefetcher(my_repository, delay=0.05)
+        prefetcher.schedule("ABCD", TEST_PREFERENCES, TEST_CATEGORIES, "categories")
+        assert not prefetcher.schedule("ABCD", TEST_PREFERENCES, TEST_CATEGORIES, "setup")    # also drops the pending one
+        time.sleep(0.1)
+        assert my_repository.searches == []
+        assert prefetcher.stats()["skipped"] == 1
+        assert prefetcher.pending() == 0
@@ -1,6 +1,6 @@
 import json
 from api.api import create_app
-from ..mock_repositories.mock_user_repository import MockUserRepository
+from api.repositories.memory_lobby_repository import MemoryLobbyRepository
 from ..mock_repositories.mock_fusion_repository import MockFusionRepository
 
 SAL_ADDRESS = {
@@ -8,13 +8,15 @@ SAL_ADDRESS = {
     "longitude": -118.287132
 }
 
-TEST_CATEGORIES = ["fried", "meat"]
-TEST_CATEGORIES_SPACE = ["fast food"]
-TEST_PRICE = 4
+TEST_CATEGORIES = [{ "category": "Burgers" }, { "category": "Steakhouses" }]
+TEST_CATEGORIES_SPACE = [{ "category": "fast food" }]
+TEST_CATEGORIES_UNKNOWN = [{ "category": "fried" }]
+TEST_PRICE = "$$$$"
 TEST_NUM_RESULTS = 10
+TEST_RADIUS = 10
 
 def my_client():
-    app = create_app(ur=MockUserRepository(), fr=MockFusionRepository())
+    app = create_app(lr=MemoryLobbyRepository(), fr=MockFusionRepository())
     app.config.update({
         "TESTING": True,
     })
@@ -27,7 +29,8 @@ class TestSelectionRoutes:
             "geolocation": SAL_ADDRESS,
             "categories": TEST_CATEGORIES,
             "price": TEST_PRICE,
-            "num_results": TEST_NUM_RESULTS
+            "num_results": TEST_NUM_RESULTS,
+            "radius": TEST_RADIUS
         })
 
         data = json.loads(response.get_data(as_text=True))
@@ -45,7 +48,8 @@ class TestSelectionRoutes:
             },
             "categories": TEST_CATEGORIES,
             "price": TEST_PRICE,
-            "num_results": TEST_NUM_RESULTS
+            "num_results": TEST_NUM_RESULTS,
+            "radius": TEST_RADIUS
         })
 
         data = json.loads(response.get_data(as_text=True))
@@ -61,8 +65,9 @@ class TestSelectionRoutes:
             response = client.post("/selection/get-businesses", json={
                 "geolocation": SAL_ADDRESS,
                 "categories": TEST_CATEGORIES,
-                "price": 5,
-                "num_results": TEST_NUM_RESULTS
+                "price": "$$$$$",
+                "num_results": TEST_NUM_RESULTS,
+                "radius": TEST_RADIUS
             })
 
             data = json.loads(response.get_data(as_text=True))
@@ -78,8 +83,9 @@ class TestSelectionRoutes:
             response = client.post("/selection/get-businesses", json={
                 "geolocation": SAL_ADDRESS,
                 "categories": TEST_CATEGORIES,
-            "price": TEST_PRICE,
-                "num_results": num
+                "price": TEST_PRICE,
+                "num_results": num,
+                "radius": TEST_RADIUS
             })
 
             data = json.loads(response.get_data(as_text=True))
@@ -95,7 +101,8 @@ class TestSelectionRoutes:
             "geolocation": SAL_ADDRESS,
             "categories": TEST_CATEGORIES_SPACE,
             "price": TEST_PRICE,
-            "num_results": TEST_NUM_RESULTS
+            "num_results": TEST_NUM_RESULTS,
+            "radius": TEST_RADIUS
         })
 
         data = json.loads(response.get_data(as_text=True))
@@ -104,13 +111,31 @@ class TestSelectionRoutes:
         assert len(data["selections"]) > 0
         assert status_code == 200
         
+    def test_get_businesses_unknown_category(self):
+        client = my_client()
+        response = client.post("/selection/get-businesses", json={
+            "geolocation": SAL_ADDRESS,
+            "categories": TEST_CATEGORIES_UNKNOWN,
+            "price": TEST_PRICE,
+            "num_results": TEST_NUM_RESULTS,
+            "radius": TEST_RADIUS
+        })
+
+        data = json.loads(response.get_data(as_text=True))
+        status_code = response.status_code
+
+        assert data["status"] == "ERROR"
+        assert data["error"] == "Invalid category requested"
+        assert status_code == 400
+
     def test_get_businesses_no_matches(self):
         client = my_client()
         response = client.post("/selection/get-businesses", json={
             "geolocation": SAL_ADDRESS,
             "categories": [],
             "price": TEST_PRICE,
-            "num_results": TEST_NUM_RESULTS
+            "num_results": TEST_NUM_RESULTS,
+            "radius": TEST_RADIUS
         })
 
         data = json.loads(response.get_data(as_text=True))
@@ -120,3 +145,18 @@ class TestSelectionRoutes:
         assert data["error"] == "No results available"
         assert status_code == 400
 
+    def test_get_businesses_missing_field(self):
+        client = my_client()
+        response = client.post("/selection/get-businesses", json={
+            "geolocation": SAL_ADDRESS,
+            "categories": TEST_CATEGORIES,
+            "price": TEST_PRICE,
+            "num_results": TEST_NUM_RESULTS
+        })
+
+        data = json.loads(response.get_data(as_text=True))
+        status_code = response.status_code
+
+        assert data["status"] == "ERROR"
+        assert data["error"] == "Missing search fields: radius"
+        assert status_code == 400